@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'resources.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,19 +65,158 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # Compile each template once per process. (Django already wraps the
+    # default loaders this way; spelling it out keeps it on if custom
+    # loaders are ever added.)
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'campus_resource.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# DB_PROFILE selects the database setup:
+#   development (default) - plain SQLite file, a fresh connection per request
+#   production            - SQLite tuned for several gunicorn workers: WAL
+#                           journal, busy timeout, synchronous=NORMAL,
+#                           IMMEDIATE write transactions, persistent connections
+#   postgres              - PostgreSQL from the POSTGRES_* variables. For local
+#                           testing a container stands in, e.g.
+#                           docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:16
+#                           (needs the psycopg package)
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development')
+
+# Seconds a persistent connection is reused before being reopened
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+SQLITE_PRODUCTION_OPTIONS = {
+    # Seconds a writer waits for the lock before "database is locked"
+    'timeout': 20,
+    # Take the write lock at BEGIN so transactions that read then write
+    # cannot deadlock into an immediate "database is locked"
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA temp_store=MEMORY;'
+        'PRAGMA cache_size=-20000;'
+    ),
+}
 
-DATABASES = {
-    'default': {
+# The SQLite profiles; benchmark_db_concurrency compares them as configured here
+SQLITE_PROFILES = {
+    'development': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    'production': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
 }
 
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'campus_resource'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': dict(SQLITE_PROFILES.get(DB_PROFILE, SQLITE_PROFILES['development'])),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Cached pages are invalidated by bumping version keys in the cache itself,
+# so every worker process must share one backend. Set REDIS_URL to use Redis;
+# otherwise the production profile keeps the cache in files next to its
+# single-host SQLite database, and the postgres profile in a database table
+# (run "python manage.py createcachetable" once). Only the development
+# profile, served by a single runserver process, uses per-process memory.
+# The resources.E002 check refuses a per-process cache on the other profiles.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif DB_PROFILE == 'production':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        }
+    }
+elif DB_PROFILE == 'postgres':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'resources_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'campus-resource',
+        }
+    }
+
+# Seconds an unread-notification count may be served from the cache.
+# Counters are dropped from the shared cache on every change, so every
+# worker re-reads the row; this only bounds how long idle entries linger.
+NOTIFICATION_COUNT_CACHE_TIMEOUT = int(os.environ.get('NOTIFICATION_COUNT_CACHE_TIMEOUT', 300))
+
+# Seconds catalog results, resource cards and resource detail data stay
+# cached. Entries are versioned and invalidated on every change through the
+# shared cache, so this only bounds how long unreachable entries linger.
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 600))
+
+# Seconds rendered admin dashboard fragments stay cached. They are keyed by
+# the booking and catalog versions, so this too only bounds storage.
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 600))
+
+# Live notification stream (server-sent events). Events go through an
+# in-process broker unless EVENT_BROKER_URL (default: REDIS_URL) names a
+# Redis server, which is required to reach clients of other processes.
+# The stream needs ASGI (e.g. uvicorn campus_resource.asgi:application);
+# under WSGI the view answers 204 and pages do not open it.
+EVENT_BROKER_URL = os.environ.get('EVENT_BROKER_URL', os.environ.get('REDIS_URL', ''))
+
+# Days read notifications are kept before expire_pending_bookings prunes them.
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+
+# Seconds between keep-alive comments on an idle notification stream.
+NOTIFICATION_STREAM_KEEPALIVE = int(os.environ.get('NOTIFICATION_STREAM_KEEPALIVE', 15))
+
+# Bookable hours of the day, (opens, closes). The slot finder only offers
+# slots inside them and dashboard occupancy percentages are relative to them.
+OPENING_HOURS = (8, 20)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -124,3 +264,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Query budgets
+# QueryBudgetMiddleware records SQL query count and time per request when
+# enabled, and flags GET/HEAD requests to views that exceed their budget
+# (keyed by URL name), whether served over WSGI or ASGI.
+# The test suite turns on QUERY_BUDGET_ENFORCE so regressions fail loudly.
+QUERY_BUDGET_ENABLED = os.environ.get('QUERY_BUDGET_ENABLED', str(DEBUG)) == 'True'
+QUERY_BUDGET_ENFORCE = False
+QUERY_BUDGETS = {
+    'catalog': 5,
+    'resource_detail': 6,
+    'booking_detail': 5,
+    'my_bookings': 5,
+    'notifications': 4,
+    'admin_dashboard': 8,
+    'admin:resources_booking_changelist': 8,
+    'admin:resources_notification_changelist': 6,
+}
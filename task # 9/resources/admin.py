@@ -1,37 +1,102 @@
-from django.contrib import admin
+import codecs
+
+from django.contrib import admin, messages
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Resource, Booking, Notification
+from django.core.exceptions import PermissionDenied, ValidationError
+from .cache import BOOKINGS, bump_version, resource_namespace
+from .exports import stream_csv
+from .forms import ResourceImportForm
+from .imports import import_resources
+from .pagination import EstimatedCountPaginator
+from .models import (
+    Resource, Booking, BookingEvent, BookingSeries, Notification, NotificationCounter, UsageRollup, WaitlistEntry
+)
 
 
 @admin.register(Resource)
 class ResourceAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'capacity', 'created_at']
+    list_display = ['name', 'code', 'category', 'capacity', 'created_at']
     list_filter = ['category', 'created_at']
-    search_fields = ['name', 'description']
+    search_fields = ['name', 'code', 'description']
     readonly_fields = ['created_at', 'updated_at']
+    change_list_template = 'admin/resources/resource/change_list.html'
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'category', 'description', 'capacity')
+            'fields': ('name', 'code', 'category', 'description', 'capacity')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_csv), name='resources_resource_import'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_csv(self, request):
+        """Upload a CSV of resources and upsert it in batches, streaming the file."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = ResourceImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            lines = codecs.iterdecode(form.cleaned_data['file'], 'utf-8-sig')
+            try:
+                result = import_resources(lines, dry_run=form.cleaned_data['dry_run'])
+            except ValueError as e:  # also raised for files that are not UTF-8
+                form.add_error('file', str(e))
+            else:
+                prefix = 'Dry run: ' if form.cleaned_data['dry_run'] else ''
+                level = messages.WARNING if result.error_count else messages.SUCCESS
+                self.message_user(request, f'{prefix}{result}.', level)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import resources from CSV',
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/resources/resource/import_csv.html', context)
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows.
+    
+    Counts are estimated or capped (see ``EstimatedCountPaginator``), the
+    unfiltered total and filter facets are never counted, and foreign keys
+    are edited by id, since a <select> of every row would never render.
+    Date filtering goes through ``list_filter``'s range choices, which the
+    date indexes serve, rather than ``date_hierarchy``, whose DISTINCT over
+    dates scans the whole table.
+    """
+    
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'resource', 'resource_capacity', 'start_time', 'end_time', 'status', 'created_at', 'status_colored']
     list_filter = ['status', 'resource__category', 'start_time', 'created_at']
     search_fields = ['user__username', 'resource__name']
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'start_time'
+    list_select_related = ['user', 'resource']
+    raw_id_fields = ['user']
     
     fieldsets = (
         ('Booking Details', {
-            'fields': ('user', 'resource', 'start_time', 'end_time', 'status')
+            'fields': ('user', 'resource', 'start_time', 'end_time', 'quantity', 'status')
         }),
         ('Additional Information', {
             'fields': ('rejection_reason',),
@@ -55,6 +120,8 @@ class BookingAdmin(admin.ModelAdmin):
             'Pending': 'orange',
             'Approved': 'green',
             'Rejected': 'red',
+            'Expired': 'gray',
+            'Cancelled': 'gray',
         }
         color = colors.get(obj.status, 'gray')
         return format_html(
@@ -64,12 +131,12 @@ class BookingAdmin(admin.ModelAdmin):
         )
     status_colored.short_description = 'Status'
     
-    actions = ['approve_bookings', 'reject_bookings']
+    actions = ['approve_bookings', 'reject_bookings', 'export_csv']
     
     def approve_bookings(self, request, queryset):
         """Bulk approve selected bookings."""
         count = 0
-        for booking in queryset:
+        for booking in queryset.select_related('user', 'resource'):
             if booking.status == 'Pending':
                 # Check for overlaps before approving
                 try:
@@ -93,27 +160,123 @@ class BookingAdmin(admin.ModelAdmin):
     approve_bookings.short_description = 'Approve selected bookings'
     
     def reject_bookings(self, request, queryset):
-        """Bulk reject selected bookings."""
-        count = queryset.update(status='Rejected')
-        # Create notifications for rejected bookings
-        for booking in queryset.filter(status='Rejected'):
-            Notification.objects.create(
-                user=booking.user,
-                booking=booking,
-                message=f'Your booking for {booking.resource.name} has been rejected.'
+        """Bulk reject the selected bookings that are still pending or approved."""
+        with transaction.atomic():
+            # Only these change and are notified; rows already rejected,
+            # cancelled or expired are left alone
+            rejectable = list(
+                queryset.filter(status__in=['Pending', 'Approved']).select_for_update(of=('self',))
+                .values_list(
+                    'pk', 'user_id', 'resource_id', 'resource__name', 'status',
+                    'start_time', 'end_time', 'quantity', named=True,
+                )
             )
+            pks = [row.pk for row in rejectable]
+            freed = [
+                (row.resource_id, row.start_time, row.end_time, row.quantity)
+                for row in rejectable if row.status == 'Approved'
+            ]
+            UsageRollup.record(freed, -1)
+            # QuerySet.update() skips auto_now, so updated_at is set here
+            count = Booking.objects.filter(pk__in=pks).update(status='Rejected', updated_at=timezone.now())
+            Notification.create_many([
+                Notification(
+                    user_id=row.user_id,
+                    booking_id=row.pk,
+                    message=f'Your booking for {row.resource__name} has been rejected.',
+                )
+                for row in rejectable
+            ])
+            for resource_id, start_time, end_time, _ in freed:
+                WaitlistEntry.promote(resource_id, start_time, end_time)
+        bump_version(BOOKINGS, *{resource_namespace(row.resource_id) for row in rejectable})
         self.message_user(request, f'{count} booking(s) rejected.')
     reject_bookings.short_description = 'Reject selected bookings'
+    
+    def export_csv(self, request, queryset):
+        """Stream the selected bookings as CSV."""
+        return stream_csv(request, queryset, 'bookings.csv')
+    export_csv.short_description = 'Export selected bookings as CSV'
+
+
+@admin.register(BookingEvent)
+class BookingEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """The audit trail is written by database triggers; the admin only reads it."""
+    list_display = ['id', 'booking_id', 'resource', 'previous', 'code', 'note', 'created_at']
+    list_select_related = ['resource']
+    list_filter = ['code']
+    search_fields = ['=booking__id']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BookingSeries)
+class BookingSeriesAdmin(admin.ModelAdmin):
+    list_display = ['user', 'resource', 'start_time', 'frequency', 'interval', 'count', 'until', 'created_at']
+    list_filter = ['frequency', 'resource__category']
+    search_fields = ['user__username', 'resource__name']
+    list_select_related = ['user', 'resource']
+    readonly_fields = ['created_at']
+    
+    actions = ['approve_series', 'reject_series']
+    
+    def approve_series(self, request, queryset):
+        """Approve all pending occurrences of the selected series."""
+        count = 0
+        for series in queryset.select_related('resource'):
+            try:
+                count += series.approve()
+            except ValidationError as e:
+                self.message_user(
+                    request,
+                    f'Could not approve series {series.id}: {" ".join(e.messages)}',
+                    level='ERROR'
+                )
+        self.message_user(request, f'{count} booking(s) approved successfully.')
+    approve_series.short_description = 'Approve selected series'
+    
+    def reject_series(self, request, queryset):
+        """Reject all pending occurrences of the selected series."""
+        count = sum(series.reject() for series in queryset.select_related('resource'))
+        self.message_user(request, f'{count} booking(s) rejected.')
+    reject_series.short_description = 'Reject selected series'
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'resource', 'start_time', 'end_time', 'quantity', 'status', 'created_at']
+    list_filter = ['status', 'resource__category']
+    search_fields = ['user__username', 'resource__name']
+    list_select_related = ['user', 'resource']
+    readonly_fields = ['booking', 'created_at']
+    date_hierarchy = 'start_time'
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'booking', 'message_short', 'is_read', 'created_at']
+    list_select_related = ['user', 'booking__user', 'booking__resource']
     list_filter = ['is_read', 'created_at']
     search_fields = ['user__username', 'message']
     readonly_fields = ['created_at']
+    raw_id_fields = ['user', 'booking']
     
     def message_short(self, obj):
         """Display shortened message."""
         return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
     message_short.short_description = 'Message'
+
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread_count', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['user__username']
+    readonly_fields = ['user', 'unread_count', 'updated_at']
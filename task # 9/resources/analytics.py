@@ -0,0 +1,77 @@
+"""
+Resource utilization reports, read from the ``UsageRollup`` table.
+
+Each report is a handful of grouped queries over at most
+``resources x days x 24`` rollup rows, independent of how many bookings
+those days hold. Occupancy is booked minutes over the minutes that were
+bookable: ``OPENING_HOURS`` per day, times the number of units
+(1, or the capacity of an equipment pool).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Resource, UsageRollup
+
+
+WINDOWS = [7, 30, 90, 365]
+DEFAULT_WINDOW = 30
+
+
+def _occupancy(minutes, available):
+    percent = 100 * minutes / available if available else 0
+    return {'hours': minutes / 60, 'occupancy': percent, 'bar': min(percent, 100)}
+
+
+def utilization(days=DEFAULT_WINDOW, top=10):
+    """Occupancy per resource (busiest ``top``), per category and per hour of day over the last ``days`` days."""
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    opens, closes = settings.OPENING_HOURS
+    open_minutes = days * (closes - opens) * 60
+    rollups = UsageRollup.objects.filter(day__range=(start, end))
+
+    minutes_by_resource = dict(
+        rollups.values('resource').annotate(minutes=Sum('booked_minutes')).values_list('resource', 'minutes')
+    )
+    minutes_by_hour = dict(
+        rollups.values('hour').annotate(minutes=Sum('booked_minutes')).values_list('hour', 'minutes')
+    )
+    resources = list(Resource.objects.only('name', 'category', 'capacity').order_by())
+
+    rows = []
+    categories = {}
+    for resource in resources:
+        units = resource.capacity if resource.is_pooled else 1
+        minutes = minutes_by_resource.get(resource.pk, 0)
+        rows.append({'resource': resource, **_occupancy(minutes, open_minutes * units)})
+        totals = categories.setdefault(resource.category, [0, 0])
+        totals[0] += minutes
+        totals[1] += units
+    rows.sort(key=lambda row: row['occupancy'], reverse=True)
+
+    total_units = sum(units for _, units in categories.values())
+    hours = [
+        {'hour': hour, **_occupancy(minutes_by_hour.get(hour, 0), days * 60 * total_units)}
+        for hour in range(24)
+        if opens <= hour < closes or minutes_by_hour.get(hour)
+    ]
+
+    return {
+        'days': days,
+        'start': start,
+        'end': end,
+        'total_hours': sum(minutes_by_resource.values()) / 60,
+        'resources': rows[:top],
+        'categories': sorted(
+            (
+                {'category': category, **_occupancy(minutes, open_minutes * units)}
+                for category, (minutes, units) in categories.items()
+            ),
+            key=lambda row: row['occupancy'],
+            reverse=True,
+        ),
+        'hours': hours,
+    }
@@ -0,0 +1,127 @@
+"""
+Interval arithmetic for availability checks.
+
+Intervals are half-open ``(start, end)`` pairs: two bookings that merely
+touch (one ends when the next starts) do not overlap, matching the
+``start_time__lt=end, end_time__gt=start`` filter used by the models.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+def merge_intervals(intervals):
+    """Return the union of ``intervals`` as a sorted list of disjoint intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def find_conflicts(requested, busy):
+    """
+    Match each requested interval against ``busy`` (as returned by ``merge_intervals``).
+
+    Returns ``(requested_interval, busy_interval)`` pairs for every requested
+    interval that overlaps, in O(n log m) without touching the database.
+    """
+    busy_ends = [end for _, end in busy]
+    conflicts = []
+    for start, end in requested:
+        index = bisect_right(busy_ends, start)
+        if index < len(busy) and busy[index][0] < end:
+            conflicts.append(((start, end), busy[index]))
+    return conflicts
+
+
+class UsageProfile:
+    """
+    Step function of concurrent booked quantity over time, built by a sweep line.
+    
+    ``bookings`` are ``(start, end, quantity)`` triples. Deltas at the same
+    instant are netted before the level is recorded, so a booking ending
+    exactly when another starts never counts twice.
+    """
+    
+    def __init__(self, bookings):
+        deltas = {}
+        for start, end, quantity in bookings:
+            deltas[start] = deltas.get(start, 0) + quantity
+            deltas[end] = deltas.get(end, 0) - quantity
+        self.times = sorted(deltas)
+        self.levels = []
+        level = 0
+        for time in self.times:
+            level += deltas[time]
+            self.levels.append(level)
+    
+    def peak(self, start, end):
+        """Highest concurrent quantity at any instant in ``[start, end)``."""
+        index = bisect_right(self.times, start) - 1
+        peak = self.levels[index] if index >= 0 else 0
+        index += 1
+        while index < len(self.times) and self.times[index] < end:
+            peak = max(peak, self.levels[index])
+            index += 1
+        return peak
+    
+    def busy_intervals(self, limit=0):
+        """Intervals during which more than ``limit`` is in use, merged and sorted."""
+        busy = []
+        start = None
+        for time, level in zip(self.times, self.levels):
+            if level > limit and start is None:
+                start = time
+            elif level <= limit and start is not None:
+                busy.append((start, time))
+                start = None
+        return busy
+
+
+def peak_usage(bookings, start, end):
+    """Peak concurrent quantity of ``(start, end, quantity)`` bookings over ``[start, end)``."""
+    return UsageProfile(bookings).peak(start, end)
+
+
+def split_by_hour(start, end):
+    """
+    Yield ``(local_date, hour, minutes)`` for each local clock hour ``[start, end)`` touches.
+
+    Boundaries are found from the local minute, not by wall-clock addition,
+    so DST changes and half-hour UTC offsets split correctly.
+    """
+    cursor = start
+    while cursor < end:
+        local = timezone.localtime(cursor)
+        boundary = cursor + timedelta(
+            minutes=60 - local.minute, seconds=-local.second, microseconds=-local.microsecond
+        )
+        segment_end = min(boundary, end)
+        yield local.date(), local.hour, round((segment_end - cursor).total_seconds() / 60)
+        cursor = segment_end
+
+
+def free_gaps(busy, start, end, duration):
+    """
+    Free stretches of ``[start, end)`` at least ``duration`` long.
+
+    ``busy`` must be sorted and disjoint, as ``merge_intervals`` returns.
+    """
+    gaps = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_end <= cursor:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start - cursor >= duration:
+            gaps.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if end - cursor >= duration:
+        gaps.append((cursor, end))
+    return gaps
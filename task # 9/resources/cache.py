@@ -0,0 +1,140 @@
+"""
+Versioned cache keys for the catalog and resource pages.
+
+Every cached entry embeds the current version of the data it was built
+from. Changing that data bumps the version, which makes all the old entries
+unreachable at once (they simply age out), so invalidation is exact without
+having to know every filter combination that was cached.
+
+Versions are bumped immediately and again when the surrounding transaction
+commits, so a concurrent reader cannot re-cache pre-commit data under the
+new version.
+
+A bump only reaches processes that read the same cache backend, so profiles
+served by several workers must not use a per-process one (check E002).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+
+CATALOG = 'catalog'
+# Any booking change; keys the admin dashboard fragments
+BOOKINGS = 'bookings'
+
+
+# DB_PROFILEs served by more than one worker process
+MULTI_PROCESS_PROFILES = ('production', 'postgres')
+
+
+def is_shared(alias='default'):
+    """Whether every worker process reads the same entries from cache ``alias``."""
+    return not isinstance(caches[alias], LocMemCache)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    if settings.DB_PROFILE not in MULTI_PROCESS_PROFILES or is_shared():
+        return []
+    return [checks.Error(
+        f"The '{settings.DB_PROFILE}' profile is served by several worker processes, but the "
+        "default cache is local to each one, so version bumps and unread counts would not "
+        "reach the other workers and they would serve stale pages.",
+        hint='Set REDIS_URL, or configure a file-based or database cache.',
+        id='resources.E002',
+    )]
+
+
+def resource_namespace(resource_id):
+    return f'resource:{resource_id}'
+
+
+def _version_key(namespace):
+    return f'resources:version:{namespace}'
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never restarts at a
+        # version whose entries may still be cached
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(namespace):
+    key = _version_key(namespace)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(namespace):
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _bump_many(namespaces):
+    if len(namespaces) == 1:
+        _bump(namespaces[0])
+    else:
+        # One round trip instead of an incr per namespace; a deleted counter
+        # is re-seeded from the clock, past every version it ever had
+        cache.delete_many([_version_key(namespace) for namespace in namespaces])
+
+
+def bump_version(*namespaces):
+    """Invalidate everything cached under ``namespaces``."""
+    if not namespaces:
+        return
+    _bump_many(namespaces)
+    transaction.on_commit(lambda: _bump_many(namespaces))
+
+
+def make_key(namespace, *parts):
+    """Build a key for ``parts`` under the current version of ``namespace``."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'resources:{namespace}:v{get_version(namespace)}:{digest}'
+
+
+async def amake_key(namespace, *parts):
+    """Async version of ``make_key``."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'resources:{namespace}:v{await aget_version(namespace)}:{digest}'
+
+
+def render_fragments(template_name, name, objects, version, timeout):
+    """
+    Render ``template_name`` once per object (as ``name``), reusing cached renders.
+
+    Each fragment is cached under ``version(obj)``, so only objects that
+    changed are rendered again. All fragments are fetched with one
+    ``get_many`` and new ones stored with one ``set_many``.
+    """
+    keys = [f'resources:fragment:{template_name}:{version(obj)}' for obj in objects]
+    cached = cache.get_many(keys)
+    template = get_template(template_name)
+    rendered = {}
+    fragments = []
+    for key, obj in zip(keys, objects):
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = rendered[key] = template.render({name: obj})
+        fragments.append(mark_safe(fragment))
+    if rendered:
+        cache.set_many(rendered, timeout)
+    return fragments
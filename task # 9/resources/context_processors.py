@@ -1,13 +1,17 @@
-from .models import Notification
+from django.core.handlers.asgi import ASGIRequest
+
+from .models import NotificationCounter
 
 
 def notification_count(request):
     """Context processor to add unread notification count to all templates."""
     if request.user.is_authenticated:
-        unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+        unread_count = NotificationCounter.unread_for(request.user)
     else:
         unread_count = 0
     
     return {
-        'unread_notification_count': unread_count
+        'unread_notification_count': unread_count,
+        # The live stream only works under ASGI; see views.notification_stream
+        'notification_stream_enabled': isinstance(request, ASGIRequest),
     }
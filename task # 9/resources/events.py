@@ -0,0 +1,138 @@
+"""
+Publish/subscribe for live notification updates.
+
+Sync code (models, views, admin actions) publishes small JSON-serializable
+dicts once its transaction commits; the async server-sent-events view
+subscribes per user and forwards them to the browser.
+
+The default broker lives in-process, so it only reaches clients connected to
+the same server process. Set ``EVENT_BROKER_URL`` (it defaults to
+``REDIS_URL``) to fan events out through Redis pub/sub instead.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+
+def user_channel(user_id):
+    return f'resources:user:{user_id}'
+
+
+class InProcessSubscription:
+    """Async context manager whose ``await .get()`` returns the next message on ``channel``."""
+
+    def __init__(self, broker, channel):
+        self._broker = broker
+        self._channel = channel
+        self._subscriber = None
+
+    async def __aenter__(self):
+        self._subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        self._broker._add(self._channel, self._subscriber)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._broker._discard(self._channel, self._subscriber)
+
+    async def get(self):
+        return await self._subscriber[1].get()
+
+
+class InProcessBroker:
+    """Deliver messages to subscribers' ``asyncio.Queue``s, from any thread."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def _add(self, channel, subscriber):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+
+    def _discard(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes on its way out
+                pass
+
+    def subscribe(self, channel):
+        return InProcessSubscription(self, channel)
+
+
+class RedisSubscription:
+    def __init__(self, url, channel):
+        self._url = url
+        self._channel = channel
+
+    async def __aenter__(self):
+        import redis.asyncio
+
+        self._client = redis.asyncio.Redis.from_url(self._url)
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(self._channel)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._pubsub.unsubscribe(self._channel)
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+    async def get(self):
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return json.loads(message['data'])
+
+
+class RedisBroker:
+    """Same interface as ``InProcessBroker``, shared by every process using ``url``."""
+
+    def __init__(self, url):
+        import redis
+
+        self._url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self._client.publish(channel, json.dumps(message))
+
+    def subscribe(self, channel):
+        return RedisSubscription(self._url, channel)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = getattr(settings, 'EVENT_BROKER_URL', '')
+                _broker = RedisBroker(url) if url else InProcessBroker()
+    return _broker
+
+
+def publish_on_commit(channel, message):
+    """Publish ``message`` once the current transaction commits (or now, outside one)."""
+    transaction.on_commit(lambda: get_broker().publish(channel, message))
+
+
+def subscribe(channel):
+    """Async context manager yielding an object whose ``await .get()`` returns the next message."""
+    return get_broker().subscribe(channel)
@@ -0,0 +1,167 @@
+"""
+Streaming CSV and iCalendar exports of bookings.
+
+Rows are read in chunks and written out one at a time through
+``StreamingHttpResponse``, so memory use does not grow with the number of
+bookings exported. Each export has a sync and an async generator: under
+ASGI Django reads a sync iterator to the end before sending anything (and
+under WSGI it does the same to an async one), so the response gets the kind
+the server in front of it streams.
+"""
+import csv
+from datetime import timezone
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+CHUNK_SIZE = 2000
+
+CSV_HEADER = [
+    'id', 'user', 'resource', 'category', 'start_time', 'end_time', 'quantity',
+    'status', 'rejection_reason', 'created_at',
+]
+
+ICAL_STATUS = {
+    'Pending': 'TENTATIVE',
+    'Approved': 'CONFIRMED',
+    'Rejected': 'CANCELLED',
+    'Expired': 'CANCELLED',
+    'Cancelled': 'CANCELLED',
+}
+
+
+def _ordered(queryset):
+    return queryset.select_related('user', 'resource').order_by('start_time', 'pk')
+
+
+def _streaming_response(request, generators, args, content_type, filename):
+    """Stream ``generators``' async half to ASGI requests and the sync half to the rest."""
+    sync_generator, async_generator = generators
+    generator = async_generator if isinstance(request, ASGIRequest) else sync_generator
+    response = StreamingHttpResponse(generator(*args), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back to ``csv.writer``'s caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_fields(booking):
+    return [
+        booking.pk,
+        booking.user.username,
+        booking.resource.name,
+        booking.resource.category,
+        booking.start_time.isoformat(),
+        booking.end_time.isoformat(),
+        booking.quantity,
+        booking.status,
+        booking.rejection_reason,
+        booking.created_at.isoformat(),
+    ]
+
+
+def booking_csv_rows(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for booking in _ordered(queryset).iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(_csv_fields(booking))
+
+
+async def abooking_csv_rows(queryset):
+    """Async version of ``booking_csv_rows``."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    async for booking in _ordered(queryset).aiterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(_csv_fields(booking))
+
+
+def stream_csv(request, queryset, filename):
+    return _streaming_response(
+        request, (booking_csv_rows, abooking_csv_rows), (queryset,), 'text/csv', filename
+    )
+
+
+def _ical_text(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _ical_time(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74
+        # Never cut a multi-byte character in half
+        while limit < len(encoded) and (encoded[limit] & 0xC0) == 0x80:
+            limit -= 1
+        pieces.append(encoded[:limit].decode())
+        encoded = encoded[limit:]
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def _ical_header(calendar_name):
+    return ''.join([
+        _fold('BEGIN:VCALENDAR'),
+        _fold('VERSION:2.0'),
+        _fold('PRODID:-//Campus Resource Management//Bookings//EN'),
+        _fold('CALSCALE:GREGORIAN'),
+        _fold(f'X-WR-CALNAME:{_ical_text(calendar_name)}'),
+    ])
+
+
+def _ical_event(booking, domain, show_user):
+    summary = booking.resource.name
+    if show_user:
+        summary = f'{summary} ({booking.user.username})'
+    if booking.quantity > 1:
+        summary = f'{summary} x{booking.quantity}'
+    return ''.join([
+        _fold('BEGIN:VEVENT'),
+        _fold(f'UID:booking-{booking.pk}@{domain}'),
+        _fold(f'DTSTAMP:{_ical_time(booking.updated_at)}'),
+        _fold(f'DTSTART:{_ical_time(booking.start_time)}'),
+        _fold(f'DTEND:{_ical_time(booking.end_time)}'),
+        _fold(f'SUMMARY:{_ical_text(summary)}'),
+        _fold(f'LOCATION:{_ical_text(booking.resource.name)}'),
+        _fold(f'STATUS:{ICAL_STATUS.get(booking.status, "TENTATIVE")}'),
+        _fold('END:VEVENT'),
+    ])
+
+
+def booking_ical_lines(queryset, calendar_name, domain, show_user=False):
+    yield _ical_header(calendar_name)
+    for booking in _ordered(queryset).iterator(chunk_size=CHUNK_SIZE):
+        yield _ical_event(booking, domain, show_user)
+    yield _fold('END:VCALENDAR')
+
+
+async def abooking_ical_lines(queryset, calendar_name, domain, show_user=False):
+    """Async version of ``booking_ical_lines``."""
+    yield _ical_header(calendar_name)
+    async for booking in _ordered(queryset).aiterator(chunk_size=CHUNK_SIZE):
+        yield _ical_event(booking, domain, show_user)
+    yield _fold('END:VCALENDAR')
+
+
+def stream_ical(request, queryset, filename, calendar_name, show_user=False):
+    return _streaming_response(
+        request,
+        (booking_ical_lines, abooking_ical_lines),
+        (queryset, calendar_name, request.get_host(), show_user),
+        'text/calendar; charset=utf-8',
+        filename,
+    )
@@ -1,7 +1,15 @@
+from datetime import timedelta
+
 from django import forms
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
-from .models import Resource, Booking
+from . import slots
+from .models import Resource, Booking, BookingSeries, WaitlistEntry
+
+
+# Tailwind classes shared by every text, select and number widget
+INPUT_CLASS = 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
 
 
 class BookingForm(forms.ModelForm):
@@ -9,33 +17,45 @@ class BookingForm(forms.ModelForm):
     
     resource = forms.ModelChoiceField(
         queryset=Resource.objects.all(),
-        widget=forms.Select(attrs={
-            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
-        }),
+        widget=forms.Select(attrs={'class': INPUT_CLASS}),
         empty_label="Select a resource..."
     )
     
     start_time = forms.DateTimeField(
         widget=forms.DateTimeInput(attrs={
             'type': 'datetime-local',
-            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
+            'class': INPUT_CLASS,
         })
     )
     
     end_time = forms.DateTimeField(
         widget=forms.DateTimeInput(attrs={
             'type': 'datetime-local',
-            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
+            'class': INPUT_CLASS,
         })
     )
     
+    quantity = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        required=False,
+        help_text='Equipment only: how many items you need',
+        widget=forms.NumberInput(attrs={'class': INPUT_CLASS})
+    )
+    
     class Meta:
         model = Booking
-        fields = ['resource', 'start_time', 'end_time']
+        fields = ['resource', 'start_time', 'end_time', 'quantity']
     
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        # Set when the request only failed because the slot is taken, so the
+        # template can offer the waitlist instead
+        self.slot_taken = False
+    
+    def clean_quantity(self):
+        return self.cleaned_data.get('quantity') or 1
     
     def clean(self):
         cleaned_data = super().clean()
@@ -52,23 +72,15 @@ class BookingForm(forms.ModelForm):
             if start_time < timezone.now():
                 raise forms.ValidationError('Cannot book resources in the past.')
             
-            # Check for overlapping approved bookings
+            # Check for overlapping approved bookings (or pool capacity for equipment)
             if resource:
-                overlapping = Booking.objects.filter(
-                    resource=resource,
-                    status='Approved',
-                    start_time__lt=end_time,
-                    end_time__gt=start_time
-                )
-                
-                if overlapping.exists():
-                    overlapping_booking = overlapping.first()
-                    raise forms.ValidationError(
-                        f'This resource is already booked from '
-                        f'{overlapping_booking.start_time.strftime("%Y-%m-%d %H:%M")} '
-                        f'to {overlapping_booking.end_time.strftime("%Y-%m-%d %H:%M")}. '
-                        f'Please choose a different time slot.'
+                try:
+                    resource.check_availability(
+                        start_time, end_time, quantity=cleaned_data.get('quantity') or 1
                     )
+                except forms.ValidationError as e:
+                    self.slot_taken = not hasattr(e, 'error_dict')
+                    raise
         
         return cleaned_data
     
@@ -82,21 +94,336 @@ class BookingForm(forms.ModelForm):
         return booking
 
 
+class WaitlistForm(forms.ModelForm):
+    """Joins the waitlist for a slot; posted from a booking form whose slot is taken."""
+    
+    quantity = forms.IntegerField(min_value=1, required=False)
+    
+    class Meta:
+        model = WaitlistEntry
+        fields = ['resource', 'start_time', 'end_time', 'quantity']
+    
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+    
+    def clean_quantity(self):
+        return self.cleaned_data.get('quantity') or 1
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        resource = cleaned_data.get('resource')
+        quantity = cleaned_data.get('quantity')
+        
+        if start_time and end_time and resource and quantity:
+            if end_time <= start_time:
+                raise forms.ValidationError('End time must be after start time.')
+            if start_time < timezone.now():
+                raise forms.ValidationError('Cannot book resources in the past.')
+            if quantity > (resource.capacity if resource.is_pooled else 1):
+                raise forms.ValidationError('This request could never fit, so it cannot be waitlisted.')
+            if resource.is_available(start_time, end_time, quantity=quantity):
+                raise forms.ValidationError('This slot is free. Please book it directly.')
+            if self.user and WaitlistEntry.objects.filter(
+                user=self.user, resource=resource, start_time=start_time, end_time=end_time, status='Waiting'
+            ).exists():
+                raise forms.ValidationError('You are already on the waitlist for this slot.')
+        
+        return cleaned_data
+    
+    def save(self, commit=True):
+        entry = super().save(commit=False)
+        if self.user:
+            entry.user = self.user
+        entry.status = 'Waiting'
+        if commit:
+            entry.save()
+        return entry
+
+
+class BookingSeriesForm(forms.ModelForm):
+    """Form for requesting a recurring booking."""
+    
+    resource = forms.ModelChoiceField(
+        queryset=Resource.objects.all(),
+        widget=forms.Select(attrs={'class': INPUT_CLASS}),
+        empty_label="Select a resource..."
+    )
+    
+    start_time = forms.DateTimeField(
+        label='First occurrence starts',
+        widget=forms.DateTimeInput(attrs={
+            'type': 'datetime-local',
+            'class': INPUT_CLASS,
+        })
+    )
+    
+    end_time = forms.DateTimeField(
+        label='First occurrence ends',
+        widget=forms.DateTimeInput(attrs={
+            'type': 'datetime-local',
+            'class': INPUT_CLASS,
+        })
+    )
+    
+    frequency = forms.ChoiceField(
+        choices=BookingSeries.FREQUENCY_CHOICES,
+        initial='WEEKLY',
+        widget=forms.Select(attrs={'class': INPUT_CLASS})
+    )
+    
+    interval = forms.IntegerField(
+        min_value=1,
+        max_value=12,
+        initial=1,
+        label='Repeat every',
+        widget=forms.NumberInput(attrs={'class': INPUT_CLASS})
+    )
+    
+    count = forms.IntegerField(
+        min_value=1,
+        max_value=BookingSeries.MAX_OCCURRENCES,
+        required=False,
+        label='Number of occurrences',
+        widget=forms.NumberInput(attrs={
+            'placeholder': 'e.g. 15',
+            'class': INPUT_CLASS,
+        })
+    )
+    
+    quantity = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        required=False,
+        help_text='Equipment only: how many items you need each time',
+        widget=forms.NumberInput(attrs={'class': INPUT_CLASS})
+    )
+    
+    until = forms.DateField(
+        required=False,
+        label='Repeat until',
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': INPUT_CLASS,
+        })
+    )
+    
+    class Meta:
+        model = BookingSeries
+        fields = ['resource', 'start_time', 'end_time', 'quantity', 'frequency', 'interval', 'count', 'until']
+    
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+    
+    def clean_quantity(self):
+        return self.cleaned_data.get('quantity') or 1
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        resource = cleaned_data.get('resource')
+        
+        if not cleaned_data.get('count') and not cleaned_data.get('until'):
+            raise forms.ValidationError('Give either a number of occurrences or an end date.')
+        
+        if start_time and end_time and resource and not self.errors:
+            if end_time <= start_time:
+                raise forms.ValidationError('End time must be after start time.')
+            
+            if start_time < timezone.now():
+                raise forms.ValidationError('Cannot book resources in the past.')
+            
+            quantity = cleaned_data.get('quantity') or 1
+            if not resource.is_pooled and quantity != 1:
+                raise forms.ValidationError({'quantity': 'Only equipment can be booked in quantity.'})
+            if quantity > resource.capacity:
+                raise forms.ValidationError({'quantity': f'There are only {resource.capacity} items in this pool.'})
+            
+            series = BookingSeries(
+                resource=resource,
+                start_time=start_time,
+                end_time=end_time,
+                quantity=quantity,
+                frequency=cleaned_data['frequency'],
+                interval=cleaned_data['interval'],
+                count=cleaned_data.get('count'),
+                until=cleaned_data.get('until'),
+            )
+            if end_time - start_time > series.step:
+                raise forms.ValidationError('Each occurrence must end before the next one starts.')
+            
+            # occurrences() stops at MAX_OCCURRENCES, which must not silently
+            # cut short a series given only an end date
+            until = cleaned_data.get('until')
+            if until and not series.count:
+                first_day = timezone.localtime(start_time).date()
+                total = (until - first_day).days // series.step.days + 1
+                if total > BookingSeries.MAX_OCCURRENCES:
+                    raise forms.ValidationError({'until': (
+                        f'A series can have at most {BookingSeries.MAX_OCCURRENCES} occurrences, but this '
+                        f'one would have {total}. Choose an earlier date or give a number of occurrences.'
+                    )})
+            
+            occurrences = series.occurrences()
+            if not occurrences:
+                raise forms.ValidationError('The repeat-until date is before the first occurrence.')
+            
+            # One range query for the whole series instead of one per occurrence
+            conflicts = series.find_conflicts(occurrences)
+            if conflicts:
+                raise series.conflict_error(conflicts)
+        
+        return cleaned_data
+    
+    def save(self, commit=True):
+        series = super().save(commit=False)
+        if self.user:
+            series.user = self.user
+        if commit:
+            with transaction.atomic():
+                series.save()
+                series.create_bookings()
+        return series
+
+
 class ResourceFilterForm(forms.Form):
     """Form for filtering resources in the catalog."""
     
     category = forms.ChoiceField(
         choices=[('', 'All Categories')] + Resource.CATEGORY_CHOICES,
         required=False,
-        widget=forms.Select(attrs={
-            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
-        })
+        widget=forms.Select(attrs={'class': INPUT_CLASS})
     )
     
     search = forms.CharField(
         required=False,
         widget=forms.TextInput(attrs={
             'placeholder': 'Search resources...',
-            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
+            'class': INPUT_CLASS,
+        })
+    )
+
+
+class SlotFinderForm(forms.Form):
+    """Form for finding free slots across all resources of a category."""
+    
+    DURATION_CHOICES = [
+        (30, '30 minutes'),
+        (60, '1 hour'),
+        (90, '1.5 hours'),
+        (120, '2 hours'),
+        (180, '3 hours'),
+        (240, '4 hours'),
+    ]
+    
+    ORDER_CHOICES = [
+        (slots.EARLIEST, 'Earliest slot first'),
+        (slots.BEST_FIT, 'Closest capacity first'),
+    ]
+    
+    MAX_WINDOW = timedelta(days=31)
+    
+    category = forms.ChoiceField(
+        choices=Resource.CATEGORY_CHOICES,
+        widget=forms.Select(attrs={'class': INPUT_CLASS})
+    )
+    
+    min_capacity = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        label='Minimum capacity',
+        help_text='Seats needed, or number of items for equipment',
+        widget=forms.NumberInput(attrs={'class': INPUT_CLASS})
+    )
+    
+    window_start = forms.DateTimeField(
+        label='Earliest start',
+        widget=forms.DateTimeInput(attrs={
+            'type': 'datetime-local',
+            'class': INPUT_CLASS,
         })
     )
+    
+    window_end = forms.DateTimeField(
+        label='Latest end',
+        widget=forms.DateTimeInput(attrs={
+            'type': 'datetime-local',
+            'class': INPUT_CLASS,
+        })
+    )
+    
+    duration = forms.TypedChoiceField(
+        choices=DURATION_CHOICES,
+        coerce=int,
+        initial=60,
+        widget=forms.Select(attrs={'class': INPUT_CLASS})
+    )
+    
+    order = forms.ChoiceField(
+        choices=ORDER_CHOICES,
+        initial=slots.EARLIEST,
+        label='Sort by',
+        widget=forms.Select(attrs={'class': INPUT_CLASS})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        window_start = cleaned_data.get('window_start')
+        window_end = cleaned_data.get('window_end')
+        duration = cleaned_data.get('duration')
+        
+        if window_start and window_end and duration:
+            if window_end <= timezone.now():
+                raise forms.ValidationError('The search window is already over.')
+            if window_end - window_start < timedelta(minutes=duration):
+                raise forms.ValidationError('The search window is shorter than the duration.')
+            if window_end - window_start > self.MAX_WINDOW:
+                raise forms.ValidationError('Please search at most 31 days at a time.')
+            cleaned_data['duration'] = timedelta(minutes=duration)
+        
+        return cleaned_data
+
+
+class CategoryField(forms.CharField):
+    """Accepts a resource category by value or label, in any case."""
+    
+    CATEGORIES = {
+        label.lower(): value
+        for value, display in Resource.CATEGORY_CHOICES
+        for label in (value, display)
+    }
+    
+    def clean(self, value):
+        value = super().clean(value)
+        category = self.CATEGORIES.get(value.lower())
+        if category is None:
+            choices = ', '.join(value for value, _ in Resource.CATEGORY_CHOICES)
+            raise forms.ValidationError(f'Unknown category; use one of {choices}.')
+        return category
+
+
+class ResourceImportRowForm(forms.Form):
+    """
+    Validates one CSV row of a resource import; uniqueness is left to the upsert.
+    
+    All validation lives in the fields, so a bulk import can clean rows with
+    ``base_fields`` directly instead of building (and deep-copying) a form
+    per row.
+    """
+    
+    code = forms.CharField(max_length=50)
+    name = forms.CharField(max_length=200)
+    category = CategoryField()
+    description = forms.CharField(required=False)
+    capacity = forms.IntegerField(min_value=1)
+
+
+class ResourceImportForm(forms.Form):
+    """Upload form for the admin CSV import."""
+    
+    file = forms.FileField(help_text='Columns: code, name, category, description, capacity')
+    dry_run = forms.BooleanField(required=False, help_text='Validate the file without saving anything')
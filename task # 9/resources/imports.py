@@ -0,0 +1,109 @@
+"""
+Bulk resource import from CSV.
+
+Rows are read lazily, validated with the fields of ``ResourceImportRowForm``
+and upserted a batch at a time with ``bulk_create(update_conflicts=True)``
+keyed on ``Resource.code``, so memory use does not grow with the file.
+bulk_create skips signals, so each batch also refreshes the search index and
+bumps the cache versions itself.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import search
+from .cache import CATALOG, bump_version, resource_namespace
+from .forms import ResourceImportRowForm
+from .models import Resource
+
+
+COLUMNS = ['code', 'name', 'category', 'description', 'capacity']
+UPDATE_FIELDS = ['name', 'category', 'description', 'capacity', 'updated_at']
+DEFAULT_BATCH_SIZE = 1000
+
+# Only this many row errors are kept for the report; the rest are counted.
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def __str__(self):
+        return f'{self.created} created, {self.updated} updated, {self.error_count} row(s) rejected'
+
+
+def clean_row(row, fields=ResourceImportRowForm.base_fields):
+    """Return ``(cleaned_data, errors)`` for one CSV row dict."""
+    cleaned_data = {}
+    errors = {}
+    for name, field in fields.items():
+        try:
+            cleaned_data[name] = field.clean((row.get(name) or '').strip())
+        except ValidationError as e:
+            errors[name] = e.messages
+    return cleaned_data, errors
+
+
+def import_resources(lines, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Import resources from an iterable of CSV text lines with a header row.
+
+    Rows are matched on ``code``: existing resources are updated, others
+    created. A code repeated within a batch keeps its last row. Returns an
+    ``ImportResult``; with ``dry_run`` rows are validated but not saved.
+    """
+    reader = csv.DictReader(lines)
+    missing = set(COLUMNS) - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f'Missing CSV column(s): {", ".join(sorted(missing))}.')
+
+    result = ImportResult()
+    batch = {}
+    for line, row in enumerate(reader, start=2):
+        cleaned_data, errors = clean_row(row)
+        if errors:
+            result.add_error(line, '; '.join(
+                f'{field}: {" ".join(messages)}' for field, messages in errors.items()
+            ))
+            continue
+        batch[cleaned_data['code']] = Resource(**cleaned_data)
+        if len(batch) >= batch_size:
+            _upsert(batch, result, dry_run)
+            batch = {}
+    if batch:
+        _upsert(batch, result, dry_run)
+    return result
+
+
+def _upsert(batch, result, dry_run):
+    existing = dict(Resource.objects.filter(code__in=batch).values_list('code', 'pk'))
+    result.updated += len(existing)
+    result.created += len(batch) - len(existing)
+    if dry_run:
+        return
+
+    resources = list(batch.values())
+    with transaction.atomic():
+        Resource.objects.bulk_create(
+            resources,
+            update_conflicts=True,
+            unique_fields=['code'],
+            update_fields=UPDATE_FIELDS,
+        )
+        if any(resource.pk is None for resource in resources):
+            # Backends that cannot return upserted ids
+            pks = dict(Resource.objects.filter(code__in=batch).values_list('code', 'pk'))
+            for resource in resources:
+                resource.pk = pks[resource.code]
+        search.index_resources(resources)
+        bump_version(CATALOG, *[resource_namespace(pk) for pk in existing.values()])
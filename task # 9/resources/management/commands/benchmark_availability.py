@@ -0,0 +1,154 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from resources.models import Booking, Resource
+
+
+STATUSES = ['Approved'] * 6 + ['Pending', 'Rejected', 'Expired', 'Cancelled']
+POOL_CAPACITY = 5
+STEP = timedelta(minutes=15)
+
+
+def overlaps(booking, start, end):
+    """The overlap rule, spelt out independently of the ORM filter."""
+    return booking[2] == 'Approved' and booking[0] < end and start < booking[1]
+
+
+def oracle_peak(bookings, start, end):
+    """Peak approved quantity in ``[start, end)``, probing every grid step."""
+    bookings = [b for b in bookings if overlaps(b, start, end)]
+    peak = 0
+    moment = start
+    while moment < end:
+        peak = max(peak, sum(b[3] for b in bookings if overlaps(b, moment, moment + STEP)))
+        moment += STEP
+    return peak
+
+
+class Command(BaseCommand):
+    help = (
+        'Time Resource.check_availability in two series: "history", where a resource keeps '
+        '--upcoming bookings ahead and only its past grows with --sizes, and "schedule", where '
+        'every booking is upcoming so the schedule the checks scan grows with --sizes. Every '
+        'answer is checked against a brute-force oracle. Bookings are written inside a '
+        'transaction that is rolled back, so the database is left untouched. Exits non-zero '
+        'on a wrong answer or when, in either series, the median check at the largest size is '
+        'more than --max-growth times the one at the smallest.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000, 100000],
+            help='Bookings per resource to measure at (default: 10 100 1000 10000 100000).',
+        )
+        parser.add_argument('--checks', type=int, default=100, help='Checks per resource and size (default: 100).')
+        parser.add_argument(
+            '--upcoming', type=int, default=10,
+            help='Bookings per resource from now on in the history series, at most the smallest '
+                 'size; the rest is past history (default: 10).',
+        )
+        parser.add_argument('--max-growth', type=float, default=3.0, help='Allowed slowdown factor (default: 3).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0).')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        upcoming = min(options['upcoming'], sizes[0])
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{'series':<9} {'bookings':>9} {'resource':<10} {'median ms':>10} {'p95 ms':>8}")
+        medians = {}
+        mismatches = []
+        with transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            now = timezone.now().replace(second=0, microsecond=0)
+            # None: every booking is upcoming
+            for series, series_upcoming in (('history', upcoming), ('schedule', None)):
+                resources = [
+                    Resource.objects.create(name=f'Benchmark {series} Lab', category='Lab', capacity=20),
+                    Resource.objects.create(
+                        name=f'Benchmark {series} Pool', category='Equipment', capacity=POOL_CAPACITY
+                    ),
+                ]
+                history = {resource.pk: [] for resource in resources}
+                for size in sizes:
+                    span = size if series_upcoming is None else series_upcoming
+                    for resource in resources:
+                        self.grow(user, resource, history[resource.pk], size, series_upcoming, now, rng)
+                        timings = []
+                        for _ in range(options['checks']):
+                            start = now + STEP * rng.randrange(0, 8 * span)
+                            end = start + STEP * rng.randrange(1, 9)
+                            quantity = rng.randint(1, POOL_CAPACITY) if resource.is_pooled else 1
+                            started = time.perf_counter()
+                            try:
+                                resource.check_availability(start, end, quantity=quantity)
+                                available = True
+                            except ValidationError:
+                                available = False
+                            timings.append((time.perf_counter() - started) * 1000)
+
+                            if resource.is_pooled:
+                                expected = oracle_peak(history[resource.pk], start, end) + quantity <= POOL_CAPACITY
+                            else:
+                                expected = not any(overlaps(b, start, end) for b in history[resource.pk])
+                            if available != expected:
+                                mismatches.append((series, size, resource.category, start, end, quantity, available))
+                        median = statistics.median(timings)
+                        medians[series, size, resource.category] = median
+                        p95 = statistics.quantiles(timings, n=20)[18] if len(timings) > 1 else median
+                        self.stdout.write(
+                            f'{series:<9} {size:>9} {resource.category:<10} {median:>10.3f} {p95:>8.3f}'
+                        )
+            transaction.set_rollback(True)
+
+        if mismatches:
+            series, size, category, start, end, quantity, available = mismatches[0]
+            raise CommandError(
+                f'{len(mismatches)} check(s) disagree with the oracle, e.g. {category} with {size} bookings '
+                f'({series}), {start:%Y-%m-%d %H:%M}-{end:%H:%M} x{quantity}: got available={available}.'
+            )
+        for series, size, category in medians:
+            if size != sizes[-1]:
+                continue
+            growth = medians[series, size, category] / medians[series, sizes[0], category]
+            if growth > options['max_growth']:
+                raise CommandError(
+                    f'{category} checks ({series}) are {growth:.1f}x slower at {size} bookings than at '
+                    f'{sizes[0]} (allowed: {options["max_growth"]}x).'
+                )
+
+    def grow(self, user, resource, history, size, upcoming, now, rng):
+        """
+        Add bookings until ``resource`` has ``size``.
+
+        The first ``upcoming`` bookings start from ``now`` on, one per two
+        hours; later ones go ever further into the past, as a resource's
+        history grows in real use, so the upcoming schedule stays the same.
+        With ``upcoming=None`` every booking is upcoming and later ones go
+        ever further into the future instead. Bookings are 15 minutes to 3
+        hours on a 15-minute grid, often touching or overlapping their
+        neighbours.
+        """
+        rows = []
+        for index in range(len(history), size):
+            position = index if upcoming is None else upcoming - 1 - index
+            start = now + STEP * (8 * position + rng.randrange(0, 8))
+            booking = (
+                start,
+                start + STEP * rng.randrange(1, 13),
+                rng.choice(STATUSES),
+                rng.randint(1, 2) if resource.is_pooled else 1,
+            )
+            history.append(booking)
+            rows.append(Booking(
+                user=user, resource=resource, start_time=booking[0], end_time=booking[1],
+                status=booking[2], quantity=booking[3],
+            ))
+        Booking.objects.bulk_create(rows, batch_size=2000)
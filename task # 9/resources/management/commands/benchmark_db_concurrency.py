@@ -0,0 +1,163 @@
+import copy
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.utils import load_backend
+
+
+# Alias the benchmark connection is registered under in each process
+ALIAS = 'benchmark'
+
+SCHEMA = [
+    'CREATE TABLE session (key TEXT PRIMARY KEY, data TEXT)',
+    'CREATE TABLE booking (id INTEGER PRIMARY KEY, resource_id INTEGER, start REAL, end REAL)',
+    'CREATE INDEX booking_resource ON booking (resource_id, end, start)',
+    'CREATE TABLE counter (user_id INTEGER PRIMARY KEY, unread INTEGER)',
+]
+
+
+def open_database(profile, path):
+    """
+    Register and return a Django connection to ``path`` set up as DB_PROFILE ``profile`` ships.
+
+    The settings are ``SQLITE_PROFILES[profile]`` with only the file swapped,
+    so OPTIONS (PRAGMAs, timeout, IMMEDIATE transactions) and CONN_MAX_AGE
+    take effect through Django's own sqlite backend.
+    """
+    database = copy.deepcopy(settings.SQLITE_PROFILES[profile])
+    database['NAME'] = path
+    # Fills in the defaults Django gives every DATABASES entry
+    database = connections.configure_settings({DEFAULT_DB_ALIAS: database})[DEFAULT_DB_ALIAS]
+    connections[ALIAS] = load_backend(database['ENGINE']).DatabaseWrapper(database, ALIAS)
+    return connections[ALIAS]
+
+
+def run_worker(profile, path, requests, write_ratio, seed, results):
+    """Serve ``requests`` simulated page views; report latencies and lock errors."""
+    rng = random.Random(seed)
+    latencies = []
+    locked = 0
+    connection = open_database(profile, path)
+
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                # Every page: session lookup and a count, like the auth and context processors
+                cursor.execute('SELECT data FROM session WHERE key = %s', [f's{rng.randrange(1000)}'])
+                cursor.fetchone()
+                cursor.execute('SELECT unread FROM counter WHERE user_id = %s', [rng.randrange(100)])
+                cursor.fetchone()
+            if rng.random() < write_ratio:
+                # A booking request: overlap check, insert, counter bump in one transaction
+                resource_id = rng.randrange(50)
+                start = rng.uniform(0, 10000)
+                with transaction.atomic(using=ALIAS), connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT 1 FROM booking WHERE resource_id = %s AND end > %s AND start < %s LIMIT 1',
+                        [resource_id, start, start + 1],
+                    )
+                    cursor.fetchone()
+                    cursor.execute(
+                        'INSERT INTO booking (resource_id, start, end) VALUES (%s, %s, %s)',
+                        [resource_id, start, start + 1],
+                    )
+                    cursor.execute(
+                        'UPDATE counter SET unread = unread + 1 WHERE user_id = %s', [rng.randrange(100)]
+                    )
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            locked += 1
+        finally:
+            # What Django does at the end of every request: drop the
+            # connection unless CONN_MAX_AGE keeps it open
+            connection.close_if_unusable_or_obsolete()
+
+    connection.close()
+    results.put((latencies, locked))
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent workers against SQLite under the development and production '
+        'DB profiles and report throughput, latency and "database is locked" errors. Workers '
+        'connect through Django with each profile\'s SQLITE_PROFILES settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent worker processes (default: 8).')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per worker (default: 500).')
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.3, help='Fraction of requests that write (default: 0.3).'
+        )
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            default=['development', 'production'],
+            choices=['development', 'production'],
+            help='Profiles to compare.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['workers']} workers x {options['requests']} requests, "
+            f"{options['write_ratio']:.0%} writes\n"
+        )
+        self.stdout.write(f"{'profile':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'locked':>7}")
+        for name in options['profiles']:
+            row = self.run_profile(name, options)
+            self.stdout.write(
+                f"{name:<12} {row['throughput']:>8.0f} {row['p50']:>8.2f} "
+                f"{row['p95']:>8.2f} {row['p99']:>8.2f} {row['locked']:>7}"
+            )
+
+    def run_profile(self, name, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            setup = open_database(name, path)
+            with transaction.atomic(using=ALIAS), setup.cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                cursor.executemany(
+                    'INSERT INTO session VALUES (%s, %s)', [(f's{i}', 'x' * 200) for i in range(1000)]
+                )
+                cursor.executemany('INSERT INTO counter VALUES (%s, 0)', [(i,) for i in range(100)])
+            # Workers open their own connections; none may be inherited
+            setup.close()
+
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(
+                    target=run_worker,
+                    args=(name, path, options['requests'], options['write_ratio'], seed, results),
+                )
+                for seed in range(options['workers'])
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            collected = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(ms for worker_latencies, _ in collected for ms in worker_latencies)
+        if len(latencies) < 2:
+            latencies = (latencies or [0.0]) * 2
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': percentiles[49],
+            'p95': percentiles[94],
+            'p99': percentiles[98],
+            'locked': sum(locked for _, locked in collected),
+        }
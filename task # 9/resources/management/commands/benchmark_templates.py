@@ -0,0 +1,121 @@
+import statistics
+import time
+
+from django import forms
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from resources import analytics
+from resources.cache import render_fragments
+from resources.forms import BookingForm, BookingSeriesForm, ResourceFilterForm, SlotFinderForm
+from resources.models import Booking, BookingEvent, Notification, Resource
+
+
+class Command(BaseCommand):
+    help = (
+        'Render every resources template against the current database and report render '
+        'times: the first (cold) render, and the mean and p95 of repeated warm renders. '
+        'Data is loaded once up front, so the numbers are template cost only. Run '
+        'seed_campus first for a realistic dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=50, help='Warm renders per template (default: 50).')
+        parser.add_argument('--cards', type=int, default=200, help='Resource cards in the catalog (default: 200).')
+        parser.add_argument('--templates', nargs='+', help='Only these templates (names relative to resources/).')
+        parser.add_argument('--staff-user', default='seed_admin', help='Staff account the pages render for.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['staff_user'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"No staff user {options['staff_user']!r}; run seed_campus first.")
+        request = RequestFactory(HTTP_HOST='localhost').get('/')
+        request.user = user
+
+        contexts = self.contexts(user, request, options['cards'])
+        if options['templates']:
+            contexts = {name: contexts[name] for name in options['templates'] if name in contexts}
+        cache.clear()
+
+        self.stdout.write(f"{'template':<40} {'cold ms':>9} {'mean ms':>9} {'p95 ms':>9} {'KiB':>7}")
+        for name, context in contexts.items():
+            template_name = f'resources/{name}'
+            started = time.perf_counter()
+            html = context() if callable(context) else render_to_string(template_name, context, request)
+            cold = (time.perf_counter() - started) * 1000
+
+            timings = []
+            for _ in range(options['renders']):
+                started = time.perf_counter()
+                context() if callable(context) else render_to_string(template_name, context, request)
+                timings.append((time.perf_counter() - started) * 1000)
+            p95 = statistics.quantiles(timings, n=20)[18] if len(timings) > 1 else cold
+            self.stdout.write(
+                f'{name:<40} {cold:>9.2f} {statistics.mean(timings or [cold]):>9.2f} '
+                f'{p95:>9.2f} {len(html) / 1024:>7.1f}'
+            )
+
+    def contexts(self, user, request, cards):
+        """A representative context per template, loaded from the database once."""
+        resources = list(Resource.objects.all()[:cards])
+        bookings = list(Booking.objects.select_related('user', 'resource').order_by('-created_at')[:25])
+        notifications = list(
+            Notification.objects.filter(user=user).select_related('booking__resource').order_by('-created_at')[:25]
+        )
+        if not resources or not bookings:
+            raise CommandError('No resources or bookings; run seed_campus first.')
+        booking = bookings[0]
+        utilization = analytics.utilization()
+        # As resource_detail builds it: the resource is fixed, not a <select>
+        detail_form = BookingForm(user=user)
+        detail_form.fields['resource'].initial = booking.resource
+        detail_form.fields['resource'].widget = forms.HiddenInput()
+
+        def catalog_cards():
+            # What the catalog view renders on a results-cache miss
+            fragments = render_fragments(
+                'resources/includes/resource_card.html',
+                'resource',
+                resources,
+                version=lambda resource: f'{resource.pk}:{resource.updated_at.timestamp()}',
+                timeout=settings.CATALOG_CACHE_TIMEOUT,
+            )
+            return render_to_string('resources/includes/resource_cards.html', {'cards': fragments})
+
+        return {
+            'includes/resource_card.html': {'resource': resources[0]},
+            'includes/resource_cards.html (fragments)': catalog_cards,
+            'catalog.html': {'form': ResourceFilterForm(), 'resource_cards': catalog_cards()},
+            'resource_detail.html': {
+                'resource': booking.resource,
+                'form': detail_form,
+                'upcoming_bookings': bookings[:10],
+                'total_bookings': len(bookings),
+            },
+            'booking_detail.html': {
+                'booking': booking,
+                'history': BookingEvent.timeline(booking=booking, limit=20)[0],
+            },
+            'create_booking.html': {'form': BookingForm(user=user)},
+            'create_series.html': {'form': BookingSeriesForm(user=user)},
+            'find_slots.html': {'form': SlotFinderForm(), 'results': None},
+            'my_bookings.html': {'bookings': bookings, 'waitlist': []},
+            'notifications.html': {'notifications': notifications, 'unread_count': len(notifications)},
+            'reject_booking.html': {'booking': booking},
+            'admin_dashboard.html': {
+                'pending_bookings': bookings,
+                'recent_bookings': bookings[:20],
+                'utilization': utilization,
+                'window': utilization['days'],
+                'windows': analytics.WINDOWS,
+                'fragment_version': 'benchmark',
+                'fragment_timeout': settings.DASHBOARD_CACHE_TIMEOUT,
+                'today': timezone.localdate(),
+            },
+        }
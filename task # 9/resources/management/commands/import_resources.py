@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from resources.imports import DEFAULT_BATCH_SIZE, import_resources
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or update resources from a CSV file with the columns '
+        'code, name, category, description, capacity. Rows are matched on code.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, or - for standard input.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows validated and upserted per batch (default: {DEFAULT_BATCH_SIZE}).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without saving anything.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                result = import_resources(sys.stdin, options['batch_size'], options['dry_run'])
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as csv_file:
+                    result = import_resources(csv_file, options['batch_size'], options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, message in result.errors:
+            self.stderr.write(f'Line {line}: {message}')
+        if result.error_count > len(result.errors):
+            self.stderr.write(f'... and {result.error_count - len(result.errors)} more rejected row(s).')
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{result} in {time.perf_counter() - started:.1f}s.'
+        ))
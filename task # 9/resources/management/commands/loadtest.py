@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from resources.models import Booking, Resource
+
+
+ENDPOINTS = ['catalog', 'catalog_search', 'resource_detail', 'admin_dashboard', 'approve_booking']
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main booking pages through the Django test client against the current '
+        'database and report latency percentiles, query counts and throughput per endpoint. '
+        'Run seed_campus first for a realistic dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint (default: 200).')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint (default: 5).')
+        parser.add_argument(
+            '--endpoints', nargs='+', default=ENDPOINTS, choices=ENDPOINTS, help='Endpoints to exercise.'
+        )
+        parser.add_argument('--staff-user', default='seed_admin', help='Staff account used for the dashboard.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            staff = User.objects.get(username=options['staff_user'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f"No staff user {options['staff_user']!r}; run seed_campus first.")
+        resource_ids = list(Resource.objects.values_list('pk', flat=True))
+        if not resource_ids:
+            raise CommandError('No resources; run seed_campus first.')
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(staff)
+        pending = list(
+            Booking.objects.filter(status='Pending').order_by('?').values_list('pk', flat=True)
+        )
+        words = list(Resource.objects.values_list('category', flat=True).distinct()) + ['lab', 'proj', 'hall']
+
+        paths = {
+            'catalog': lambda: reverse('catalog'),
+            'catalog_search': lambda: f"{reverse('catalog')}?search={rng.choice(words)}",
+            'resource_detail': lambda: reverse('resource_detail', args=[rng.choice(resource_ids)]),
+            'admin_dashboard': lambda: reverse('admin_dashboard'),
+            # Each approval consumes a pending booking, so this one mutates the database
+            'approve_booking': lambda: reverse('approve_booking', args=[pending.pop()]) if pending else None,
+        }
+
+        self.stdout.write(
+            f"{'endpoint':<16} {'reqs':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>8} {'errors':>7}"
+        )
+        for name in options['endpoints']:
+            for _ in range(options['warmup']):
+                path = paths[name]()
+                if path:
+                    client.get(path)
+            row = self.run_endpoint(client, paths[name], options['requests'])
+            self.stdout.write(
+                f"{name:<16} {row['requests']:>6} {row['throughput']:>8.0f} {row['p50']:>8.2f} "
+                f"{row['p95']:>8.2f} {row['p99']:>8.2f} {row['queries']:>8.1f} {row['errors']:>7}"
+            )
+
+    def run_endpoint(self, client, next_path, requests):
+        latencies = []
+        query_counts = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            path = next_path()
+            if path is None:
+                break
+            request_started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(path)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            query_counts.append(len(queries.captured_queries))
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        if len(latencies) < 2:
+            latencies = (latencies or [0.0]) * 2
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            'requests': len(query_counts),
+            'throughput': len(query_counts) / elapsed if elapsed else 0.0,
+            'p50': percentiles[49],
+            'p95': percentiles[94],
+            'p99': percentiles[98],
+            'queries': statistics.mean(query_counts) if query_counts else 0.0,
+            'errors': errors,
+        }
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from resources import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the resource full-text search index from the Resource table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Database alias to rebuild (default: "default").',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        vendor = connections[using].vendor
+        if vendor != 'sqlite':
+            self.stdout.write(f'Nothing to rebuild: {vendor} keeps its search index up to date itself.')
+            return
+        with transaction.atomic(using=using):
+            search.rebuild_index(using=using)
+        self.stdout.write(self.style.SUCCESS('Resource search index rebuilt.'))
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from resources.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized unread-notification counters and repair any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users to reconcile per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted counters without writing them.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        checked = repaired = 0
+
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+            repaired += self.reconcile_batch(batch, dry_run)
+
+        verb = 'would be repaired' if dry_run else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} user(s); {repaired} counter(s) {verb}.'
+        ))
+
+    def reconcile_batch(self, user_ids, dry_run):
+        actual = dict(
+            User.objects.filter(pk__in=user_ids)
+            .annotate(unread=Count('notifications', filter=Q(notifications__is_read=False)))
+            .values_list('pk', 'unread')
+        )
+        stored = dict(
+            NotificationCounter.objects.filter(user_id__in=user_ids)
+            .values_list('user_id', 'unread_count')
+        )
+        drifted = {
+            user_id: unread
+            for user_id, unread in actual.items()
+            if stored.get(user_id, 0 if unread == 0 else None) != unread
+        }
+        if dry_run or not drifted:
+            return len(drifted)
+
+        with transaction.atomic():
+            existing = NotificationCounter.objects.select_for_update().filter(user_id__in=drifted)
+            counters = {counter.user_id: counter for counter in existing}
+            for user_id, unread in drifted.items():
+                counters.setdefault(user_id, NotificationCounter(user_id=user_id)).unread_count = unread
+            NotificationCounter.objects.bulk_update(
+                [c for c in counters.values() if c.pk], ['unread_count'], batch_size=500
+            )
+            NotificationCounter.objects.bulk_create(
+                [c for c in counters.values() if not c.pk], batch_size=500
+            )
+        cache.delete_many([NotificationCounter.cache_key(user_id) for user_id in drifted])
+        return len(drifted)
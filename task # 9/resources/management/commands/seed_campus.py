@@ -0,0 +1,136 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from resources import search
+from resources.cache import BOOKINGS, CATALOG, bump_version
+from resources.models import Booking, Notification, Resource
+
+
+BUILDINGS = ['Science', 'Engineering', 'Humanities', 'Library', 'Arts', 'Medical', 'Business']
+KINDS = {
+    'Lab': (['Chemistry', 'Physics', 'Biology', 'Robotics', 'Electronics', 'Computer'], (15, 40)),
+    'Hall': (['Seminar', 'Lecture', 'Conference', 'Auditorium'], (40, 400)),
+    'Equipment': (['Projector', 'Laptop', 'Camera', 'Microphone', 'Oscilloscope', 'VR Headset'], (5, 40)),
+}
+
+
+class Command(BaseCommand):
+    help = 'Seed users, resources and bookings with realistic overlap distributions for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Number of users (default: 500).')
+        parser.add_argument('--resources', type=int, default=200, help='Number of resources (default: 200).')
+        parser.add_argument('--bookings', type=int, default=20000, help='Number of bookings (default: 20000).')
+        parser.add_argument('--days', type=int, default=90, help='Spread bookings over +/- this many days (default: 90).')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42).')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT (default: 2000).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            users = self.seed_users(options['users'], batch_size)
+            resources = self.seed_resources(rng, options['resources'], batch_size)
+            bookings = self.seed_bookings(rng, users, resources, options['bookings'], options['days'], batch_size)
+            notifications = self.seed_notifications(bookings, batch_size)
+            bump_version(CATALOG, BOOKINGS)
+
+        call_command('reconcile_notification_counts', stdout=self.stdout)
+        call_command('rebuild_usage_rollups', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users, {len(resources)} resources, '
+            f'{len(bookings)} bookings and {notifications} notifications. '
+            f'All seeded users have the password "password"; "seed_admin" is staff.'
+        ))
+
+    def seed_users(self, count, batch_size):
+        password = make_password('password')
+        prefix = f'seed_{timezone.now():%Y%m%d%H%M%S}'
+        users = [User(username=f'{prefix}_{i}', password=password) for i in range(count)]
+        User.objects.bulk_create(users, batch_size=batch_size)
+        User.objects.get_or_create(
+            username='seed_admin',
+            defaults={'password': password, 'is_staff': True, 'is_superuser': True},
+        )
+        return list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True))
+
+    def seed_resources(self, rng, count, batch_size):
+        resources = []
+        for i in range(count):
+            category = rng.choices(['Lab', 'Hall', 'Equipment'], weights=[4, 2, 3])[0]
+            names, (low, high) = KINDS[category]
+            building = rng.choice(BUILDINGS)
+            kind = rng.choice(names)
+            resources.append(Resource(
+                name=f'{building} {kind} {category if category != "Equipment" else "Pool"} {i + 1}',
+                category=category,
+                description=f'{kind} {category.lower()} in the {building} building, room {rng.randint(100, 499)}.',
+                capacity=rng.randint(low, high),
+            ))
+        created = Resource.objects.bulk_create(resources, batch_size=batch_size)
+        # bulk_create skips post_save, so index for search here
+        search.index_resources(created)
+        return created
+
+    def seed_bookings(self, rng, users, resources, count, days, batch_size):
+        """
+        Place bookings on whole-hour slots during the working day.
+
+        Popularity follows a Zipf-like curve so a few resources are heavily
+        contended. Roughly 60% are approved (never overbooking a resource),
+        25% pending (free to overlap, as real requests do) and 15% rejected.
+        """
+        weights = [1 / (rank + 1) for rank in range(len(resources))]
+        today = timezone.now().replace(minute=0, second=0, microsecond=0)
+        usage = {}
+        bookings = []
+
+        for _ in range(count):
+            resource = rng.choices(resources, weights=weights)[0]
+            start = today.replace(hour=rng.randint(8, 17)) + timedelta(days=rng.randint(-days, days))
+            hours = rng.choices([1, 2, 3, 4], weights=[5, 3, 1, 1])[0]
+            quantity = rng.randint(1, max(1, resource.capacity // 5)) if resource.is_pooled else 1
+            slots = [(resource.pk, start + timedelta(hours=h)) for h in range(hours)]
+
+            status = rng.choices(['Approved', 'Pending', 'Rejected'], weights=[60, 25, 15])[0]
+            if status == 'Approved':
+                limit = resource.capacity if resource.is_pooled else 1
+                if any(usage.get(slot, 0) + quantity > limit for slot in slots):
+                    status = 'Pending'
+                else:
+                    for slot in slots:
+                        usage[slot] = usage.get(slot, 0) + quantity
+
+            bookings.append(Booking(
+                user_id=rng.choice(users),
+                resource=resource,
+                start_time=start,
+                end_time=start + timedelta(hours=hours),
+                quantity=quantity,
+                status=status,
+                rejection_reason='Resource unavailable' if status == 'Rejected' else '',
+            ))
+
+        return Booking.objects.bulk_create(bookings, batch_size=batch_size)
+
+    def seed_notifications(self, bookings, batch_size):
+        notifications = [
+            Notification(
+                user_id=booking.user_id,
+                booking=booking,
+                message=f'Your booking for {booking.resource.name} has been {booking.status.lower()}.',
+                is_read=index % 3 == 0,
+            )
+            for index, booking in enumerate(bookings)
+            if booking.status != 'Pending'
+        ]
+        Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        return len(notifications)
@@ -0,0 +1,98 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+logger = logging.getLogger(__name__)
+
+# Budgets describe page renders; writes vary with what is submitted
+BUDGETED_METHODS = ('GET', 'HEAD')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view runs more SQL queries than its configured budget."""
+
+
+def _stop_capture(queries):
+    queries.__exit__(None, None, None)
+    return queries.captured_queries
+
+
+class QueryBudgetMiddleware:
+    """
+    Record the number of SQL queries and the time spent in them per request.
+
+    Active when ``QUERY_BUDGET_ENABLED`` is set (defaults to ``DEBUG``). The
+    totals are exposed as ``X-Query-Count``/``X-Query-Time-Ms`` response
+    headers and on ``response.query_count``/``response.query_time_ms``.
+    GET and HEAD requests to views listed in ``QUERY_BUDGETS`` (keyed by URL
+    name) that go over budget are logged, or raise ``QueryBudgetExceeded``
+    when ``QUERY_BUDGET_ENFORCE`` is on, as it is in the test suite. Form
+    posts and admin actions are measured but have no budget.
+
+    Under ASGI the ORM runs queries on the request's thread-sensitive worker
+    thread, so requests served asynchronously are measured there.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_response(request)
+        return self.record(request, response, queries.captured_queries, started)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        # The connection is per thread, so capture on the thread the ORM uses
+        queries = CaptureQueriesContext(connection)
+        await sync_to_async(queries.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            captured = await sync_to_async(_stop_capture)(queries)
+        return self.record(request, response, captured, started)
+
+    def record(self, request, response, captured_queries, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        query_count = len(captured_queries)
+        query_time_ms = sum(float(query['time']) for query in captured_queries) * 1000
+        response.query_count = query_count
+        response.query_time_ms = query_time_ms
+        response['X-Query-Count'] = str(query_count)
+        response['X-Query-Time-Ms'] = f'{query_time_ms:.1f}'
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        logger.debug(
+            '%s %s (%s): %d queries, %.1fms SQL, %.1fms total',
+            request.method, request.path, view_name, query_count, query_time_ms, elapsed_ms,
+        )
+
+        if request.method not in BUDGETED_METHODS:
+            return response
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+        if budget is not None and query_count > budget:
+            message = f'{view_name} ran {query_count} queries (budget {budget}) for {request.path}'
+            if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
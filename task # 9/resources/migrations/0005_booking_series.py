@@ -0,0 +1,45 @@
+# Generated by Django 5.2.10 on 2026-10-18 23:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0004_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField(help_text='Start of the first occurrence')),
+                ('end_time', models.DateTimeField(help_text='End of the first occurrence')),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly')], default='WEEKLY', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days or weeks')),
+                ('count', models.PositiveSmallIntegerField(blank=True, help_text='Number of occurrences', null=True)),
+                ('until', models.DateField(blank=True, help_text='Last date an occurrence may start on', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to='resources.resource')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Booking Series',
+                'verbose_name_plural': 'Booking Series',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='series',
+            field=models.ForeignKey(blank=True, help_text='Recurring series this booking is an occurrence of (if any)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='resources.bookingseries'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['resource', 'status', 'start_time', 'end_time'], name='booking_overlap_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-18 23:54
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0005_booking_series'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_overlap_idx',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1, help_text='Number of items requested (equipment pools only)', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='bookingseries',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1, help_text='Number of items requested per occurrence (equipment pools only)', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['resource', 'status', 'end_time', 'start_time', 'quantity'], name='booking_overlap_idx'),
+        ),
+    ]
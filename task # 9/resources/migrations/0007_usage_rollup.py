@@ -0,0 +1,51 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from resources.availability import split_by_hour
+
+
+def backfill_rollups(apps, schema_editor):
+    Booking = apps.get_model('resources', 'Booking')
+    UsageRollup = apps.get_model('resources', 'UsageRollup')
+    buckets = {}
+    approved = Booking.objects.filter(status='Approved').values_list('resource_id', 'start_time', 'end_time', 'quantity')
+    for resource_id, start, end, quantity in approved.iterator(chunk_size=2000):
+        for day, hour, minutes in split_by_hour(start, end):
+            key = (resource_id, day, hour)
+            buckets[key] = buckets.get(key, 0) + minutes * quantity
+    UsageRollup.objects.bulk_create(
+        [
+            UsageRollup(resource_id=resource_id, day=day, hour=hour, booked_minutes=minutes)
+            for (resource_id, day, hour), minutes in buckets.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0006_booking_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('booked_minutes', models.PositiveIntegerField(default=0)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to='resources.resource')),
+            ],
+            options={
+                'verbose_name': 'Usage Rollup',
+                'verbose_name_plural': 'Usage Rollups',
+                'indexes': [models.Index(fields=['day', 'resource', 'hour', 'booked_minutes'], name='usage_rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resource', 'day', 'hour'), name='usage_rollup_unique_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0008_booking_expired_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='code',
+            field=models.CharField(blank=True, help_text='Inventory code, e.g. ENG-201; matches rows on CSV import', max_length=50, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:22
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0009_resource_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected'), ('Expired', 'Expired'), ('Cancelled', 'Cancelled')], default='Pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=1, help_text='Number of items requested (equipment pools only)', validators=[django.core.validators.MinValueValidator(1)])),
+                ('status', models.CharField(choices=[('Waiting', 'Waiting'), ('Promoted', 'Promoted'), ('Withdrawn', 'Withdrawn'), ('Expired', 'Expired')], default='Waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.OneToOneField(blank=True, help_text='Booking created when the entry was promoted', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='resources.booking')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='resources.resource')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Waitlist Entry',
+                'verbose_name_plural': 'Waitlist Entries',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['resource', 'status', 'end_time', 'start_time', 'created_at'], name='waitlist_overlap_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from resources.triggers import backfill_sql, install_triggers, uninstall_triggers
+
+
+# The trigger SQL is generated from BookingEvent.STATUS_CODES; see resources.triggers
+def forward(apps, schema_editor):
+    install_triggers(apps, schema_editor)
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(backfill_sql())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0012_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.PositiveSmallIntegerField(choices=[(1, 'Requested'), (2, 'Approved'), (3, 'Rejected'), (4, 'Expired'), (5, 'Cancelled'), (6, 'Deleted')])),
+                ('previous', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Requested'), (2, 'Approved'), (3, 'Rejected'), (4, 'Expired'), (5, 'Cancelled'), (6, 'Deleted')], null=True)),
+                ('note', models.TextField(blank=True, help_text='Rejection reason, for rejections')),
+                ('created_at', models.DateTimeField()),
+                ('booking', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='resources.booking')),
+                ('resource', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='booking_events', to='resources.resource')),
+            ],
+            options={
+                'verbose_name': 'Booking Event',
+                'verbose_name_plural': 'Booking Events',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['booking', 'id'], name='booking_event_booking_idx'), models.Index(fields=['resource', 'id'], name='booking_event_resource_idx')],
+            },
+        ),
+        migrations.RunPython(forward, uninstall_triggers),
+    ]
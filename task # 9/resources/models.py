@@ -1,8 +1,18 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+from .cache import BOOKINGS, bump_version, resource_namespace
+from .events import publish_on_commit, user_channel
+from .availability import UsageProfile, find_conflicts, merge_intervals, peak_usage, split_by_hour
+
 
 class Resource(models.Model):
     """Model representing a campus resource (Lab, Hall, or Equipment)."""
@@ -13,6 +23,13 @@ class Resource(models.Model):
         ('Equipment', 'Equipment'),
     ]
     
+    code = models.CharField(
+        max_length=50,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Inventory code, e.g. ENG-201; matches rows on CSV import"
+    )
     name = models.CharField(max_length=200)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     description = models.TextField(blank=True)
@@ -28,11 +45,13 @@ class Resource(models.Model):
     def __str__(self):
         return f"{self.name} ({self.category})"
     
-    def is_available(self, start_time, end_time, exclude_booking=None):
-        """
-        Check if resource is available for the given time slot.
-        Excludes the booking specified (useful for updates).
-        """
+    @property
+    def is_pooled(self):
+        """Equipment is a pool of interchangeable items; labs and halls are booked exclusively."""
+        return self.category == 'Equipment'
+    
+    def approved_overlapping(self, start_time, end_time, exclude_booking=None):
+        """Approved bookings of this resource overlapping ``[start_time, end_time)``."""
         overlapping = Booking.objects.filter(
             resource=self,
             status='Approved',
@@ -43,7 +62,48 @@ class Resource(models.Model):
         if exclude_booking:
             overlapping = overlapping.exclude(pk=exclude_booking.pk)
         
-        return not overlapping.exists()
+        return overlapping
+    
+    def peak_usage(self, start_time, end_time, exclude_booking=None):
+        """Highest quantity booked at any one instant within the window."""
+        # No ORDER BY, so the covering booking_overlap_idx answers the query alone
+        rows = self.approved_overlapping(start_time, end_time, exclude_booking).order_by().values_list(
+            'start_time', 'end_time', 'quantity'
+        )
+        return peak_usage(rows, start_time, end_time)
+    
+    def is_available(self, start_time, end_time, exclude_booking=None, quantity=1):
+        """
+        Check if resource is available for the given time slot.
+        Excludes the booking specified (useful for updates).
+        """
+        if self.is_pooled:
+            return self.peak_usage(start_time, end_time, exclude_booking) + quantity <= self.capacity
+        return not self.approved_overlapping(start_time, end_time, exclude_booking).exists()
+    
+    def check_availability(self, start_time, end_time, quantity=1, exclude_booking=None):
+        """Raise ValidationError unless ``quantity`` can be booked for the whole window."""
+        if not self.is_pooled:
+            if quantity != 1:
+                raise ValidationError({'quantity': 'Only equipment can be booked in quantity.'})
+            overlapping_booking = self.approved_overlapping(start_time, end_time, exclude_booking).first()
+            if overlapping_booking:
+                raise ValidationError(
+                    f'This resource is already booked from '
+                    f'{overlapping_booking.start_time.strftime("%Y-%m-%d %H:%M")} '
+                    f'to {overlapping_booking.end_time.strftime("%Y-%m-%d %H:%M")}. '
+                    f'Please choose a different time slot.'
+                )
+            return
+        
+        if quantity > self.capacity:
+            raise ValidationError({'quantity': f'There are only {self.capacity} items in this pool.'})
+        free = self.capacity - self.peak_usage(start_time, end_time, exclude_booking)
+        if quantity > free:
+            raise ValidationError(
+                f'Only {max(free, 0)} of {self.capacity} are free for the whole of this slot. '
+                f'Please request fewer or choose a different time slot.'
+            )
 
 
 class Booking(models.Model):
@@ -53,12 +113,27 @@ class Booking(models.Model):
         ('Pending', 'Pending'),
         ('Approved', 'Approved'),
         ('Rejected', 'Rejected'),
+        ('Expired', 'Expired'),
+        ('Cancelled', 'Cancelled'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='bookings')
+    series = models.ForeignKey(
+        'BookingSeries',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='bookings',
+        help_text="Recurring series this booking is an occurrence of (if any)"
+    )
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    quantity = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="Number of items requested (equipment pools only)"
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -68,10 +143,41 @@ class Booking(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
+        indexes = [
+            # Keyset pagination: a user's bookings, and the pending queue
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='booking_status_created_idx'),
+            # Admin changelist: default ordering and the start/created date filters
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            models.Index(fields=['start_time', 'id'], name='booking_start_idx'),
+            # Overlap checks and peak-usage sweeps. Leading on end_time bounds the
+            # range scan to bookings that have not ended yet; start_time and
+            # quantity make it covering, so the sweep never touches the table.
+            models.Index(
+                fields=['resource', 'status', 'end_time', 'start_time', 'quantity'],
+                name='booking_overlap_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.resource.name} ({self.start_time.date()})"
     
+    USAGE_FIELDS = ('resource_id', 'start_time', 'end_time', 'quantity')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the usage rollups currently count for this booking
+        if all(field in instance.__dict__ for field in ('status',) + cls.USAGE_FIELDS):
+            instance._counted_usage = instance.approved_usage()
+        return instance
+    
+    def approved_usage(self):
+        """``(resource_id, start_time, end_time, quantity)`` while approved, else None."""
+        if self.status != 'Approved':
+            return None
+        return (self.resource_id, self.start_time, self.end_time, self.quantity)
+    
     def clean(self):
         """Validate booking to prevent overlapping bookings."""
         # Ensure end_time is after start_time
@@ -89,29 +195,415 @@ class Booking(models.Model):
         # Check for overlapping bookings only if status is Approved or will be Approved
         # For new bookings, we check if the resource would be available
         if self.status == 'Approved' or self.pk is None:
-            # Get existing approved bookings that overlap
-            overlapping = Booking.objects.filter(
-                resource=self.resource,
-                status='Approved',
-                start_time__lt=self.end_time,
-                end_time__gt=self.start_time
-            )
-            
             # Exclude self if updating
-            if self.pk:
-                overlapping = overlapping.exclude(pk=self.pk)
-            
-            if overlapping.exists():
-                overlapping_booking = overlapping.first()
-                raise ValidationError(
-                    f'This resource is already booked from {overlapping_booking.start_time} '
-                    f'to {overlapping_booking.end_time}. Please choose a different time slot.'
-                )
+            self.resource.check_availability(
+                self.start_time,
+                self.end_time,
+                quantity=self.quantity,
+                exclude_booking=self if self.pk else None
+            )
+    
+    @property
+    def is_cancellable(self):
+        return self.status in ('Pending', 'Approved') and self.start_time > timezone.now()
     
     def save(self, *args, **kwargs):
-        """Override save to call clean validation."""
+        """
+        Override save to call clean validation and keep usage rollups in step.
+        
+        When an approved slot is given up (rejected, cancelled or moved), the
+        waitlist for it is promoted in the same transaction.
+        """
         self.full_clean()
+        if self._state.adding:
+            counted = None
+        elif hasattr(self, '_counted_usage'):
+            counted = self._counted_usage
+        else:
+            row = Booking.objects.filter(pk=self.pk).values_list('status', *self.USAGE_FIELDS).first()
+            counted = row[1:] if row and row[0] == 'Approved' else None
+        usage = self.approved_usage()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if usage != counted:
+                if counted:
+                    UsageRollup.record([counted], -1)
+                if usage:
+                    UsageRollup.record([usage])
+                if counted:
+                    WaitlistEntry.promote(*counted[:3])
+        self._counted_usage = usage
+
+
+class BookingEvent(models.Model):
+    """
+    Append-only history of booking status changes.
+    
+    Rows are written by database triggers (``resources.triggers``) on every booking
+    INSERT, status UPDATE and DELETE, inside the statement that makes the
+    change. An approval costs no extra round trip, and bulk UPDATEs (series
+    approval, the admin reject action, the expiry sweep) log every row they
+    touch. Bookings and resources are referenced without constraints, so
+    the history outlives them.
+    """
+    
+    class Code(models.IntegerChoices):
+        PENDING = 1, 'Requested'
+        APPROVED = 2, 'Approved'
+        REJECTED = 3, 'Rejected'
+        EXPIRED = 4, 'Expired'
+        CANCELLED = 5, 'Cancelled'
+        DELETED = 6, 'Deleted'
+    
+    # Booking.status -> event code; resources.triggers builds the trigger SQL from it
+    STATUS_CODES = {
+        'Pending': Code.PENDING,
+        'Approved': Code.APPROVED,
+        'Rejected': Code.REJECTED,
+        'Expired': Code.EXPIRED,
+        'Cancelled': Code.CANCELLED,
+    }
+    
+    booking = models.ForeignKey(
+        Booking, on_delete=models.DO_NOTHING, db_constraint=False, related_name='events'
+    )
+    resource = models.ForeignKey(
+        Resource, on_delete=models.DO_NOTHING, db_constraint=False, related_name='booking_events'
+    )
+    code = models.PositiveSmallIntegerField(choices=Code.choices)
+    previous = models.PositiveSmallIntegerField(choices=Code.choices, null=True, blank=True)
+    note = models.TextField(blank=True, help_text="Rejection reason, for rejections")
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Booking Event'
+        verbose_name_plural = 'Booking Events'
+        indexes = [
+            # Timelines, newest first, paged by id
+            models.Index(fields=['booking', 'id'], name='booking_event_booking_idx'),
+            models.Index(fields=['resource', 'id'], name='booking_event_resource_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Booking {self.booking_id}: {self.get_code_display()} at {self.created_at:%Y-%m-%d %H:%M}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Booking events are append-only.')
         super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('Booking events are append-only.')
+    
+    @classmethod
+    def timeline(cls, booking=None, resource=None, before=None, limit=50):
+        """
+        Up to ``limit`` events of a booking or a resource, newest first.
+        
+        Pass the smallest id of the previous page as ``before`` for the next
+        one; each page is a single range scan of the ``(booking, id)`` or
+        ``(resource, id)`` index. Returns ``(events, next_before)``, where
+        ``next_before`` is None on the last page.
+        """
+        events = cls.objects.all()
+        if booking is not None:
+            events = events.filter(booking=booking)
+        if resource is not None:
+            events = events.filter(resource=resource)
+        if before is not None:
+            events = events.filter(id__lt=before)
+        events = list(events.order_by('-id')[:limit + 1])
+        if len(events) > limit:
+            return events[:limit], events[limit - 1].id
+        return events, None
+
+
+class BookingSeries(models.Model):
+    """
+    A recurring booking request, e.g. a lab every Monday for a semester.
+    
+    The pattern is a subset of the iCalendar RRULE (FREQ, INTERVAL, COUNT,
+    UNTIL). Each occurrence is stored as an ordinary Booking linked back to
+    the series, so the existing views and overlap checks keep working.
+    """
+    
+    FREQUENCY_CHOICES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+    ]
+    
+    MAX_OCCURRENCES = 52
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_series')
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='booking_series')
+    start_time = models.DateTimeField(help_text="Start of the first occurrence")
+    end_time = models.DateTimeField(help_text="End of the first occurrence")
+    quantity = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="Number of items requested per occurrence (equipment pools only)"
+    )
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='WEEKLY')
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Repeat every N days or weeks")
+    count = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Number of occurrences")
+    until = models.DateField(null=True, blank=True, help_text="Last date an occurrence may start on")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Booking Series'
+        verbose_name_plural = 'Booking Series'
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.resource.name} ({self.rrule})"
+    
+    @property
+    def rrule(self):
+        parts = [f'FREQ={self.frequency}', f'INTERVAL={self.interval}']
+        if self.count:
+            parts.append(f'COUNT={self.count}')
+        if self.until:
+            parts.append(f'UNTIL={self.until:%Y%m%d}')
+        return ';'.join(parts)
+    
+    @property
+    def step(self):
+        return timedelta(days=self.interval * (7 if self.frequency == 'WEEKLY' else 1))
+    
+    def occurrences(self):
+        """
+        Expand the pattern into sorted ``(start, end)`` pairs.
+        
+        Occurrences keep the first one's wall-clock time across DST changes.
+        """
+        duration = self.end_time - self.start_time
+        first = timezone.localtime(self.start_time).replace(tzinfo=None)
+        limit = min(self.count or self.MAX_OCCURRENCES, self.MAX_OCCURRENCES)
+        occurrences = []
+        for i in range(limit):
+            local_start = first + self.step * i
+            if self.until and local_start.date() > self.until:
+                break
+            start = timezone.make_aware(local_start)
+            occurrences.append((start, start + duration))
+        return occurrences
+    
+    def find_conflicts(self, occurrences=None):
+        """
+        Check every occurrence against approved bookings in one pass.
+        
+        A single range query fetches the approved bookings spanning the whole
+        series. For exclusive resources they are merged into disjoint busy
+        intervals; for equipment pools they are swept into a usage profile.
+        Each occurrence is then matched in memory. Returns the clashing
+        ``(start, end)`` occurrences.
+        """
+        if occurrences is None:
+            occurrences = self.occurrences()
+        if not occurrences:
+            return []
+        approved = Booking.objects.filter(
+            resource_id=self.resource_id,
+            status='Approved',
+            start_time__lt=occurrences[-1][1],
+            end_time__gt=occurrences[0][0]
+        )
+        if self.pk:
+            approved = approved.exclude(series=self)
+        approved = approved.order_by()
+        
+        if self.resource.is_pooled:
+            profile = UsageProfile(approved.values_list('start_time', 'end_time', 'quantity'))
+            free = self.resource.capacity - self.quantity
+            return [(start, end) for start, end in occurrences if profile.peak(start, end) > free]
+        
+        busy = merge_intervals(approved.values_list('start_time', 'end_time'))
+        return [occurrence for occurrence, _ in find_conflicts(occurrences, busy)]
+    
+    def conflict_error(self, conflicts):
+        start, _ = conflicts[0]
+        return ValidationError(
+            f'{len(conflicts)} occurrence(s) clash with approved bookings, the first on '
+            f'{start.strftime("%Y-%m-%d %H:%M")}. Please choose a different time slot.'
+        )
+    
+    def create_bookings(self):
+        """Create a pending Booking for every occurrence with a single INSERT."""
+        # bulk_create skips post_save, so invalidate the resource's cache here
+        bump_version(BOOKINGS, resource_namespace(self.resource_id))
+        return Booking.objects.bulk_create([
+            Booking(
+                user_id=self.user_id,
+                resource_id=self.resource_id,
+                series=self,
+                start_time=start,
+                end_time=end,
+                quantity=self.quantity,
+                status='Pending',
+            )
+            for start, end in self.occurrences()
+        ])
+    
+    def approve(self):
+        """
+        Approve all pending occurrences with a single UPDATE.
+        
+        Raises ValidationError, approving nothing, if any occurrence clashes
+        with an approved booking. Returns the number of bookings approved.
+        """
+        with transaction.atomic():
+            pending = self.bookings.filter(status='Pending')
+            rows = list(pending.order_by('start_time').values_list('pk', 'start_time', 'end_time', 'quantity'))
+            if not rows:
+                return 0
+            conflicts = self.find_conflicts([(start, end) for _, start, end, _ in rows])
+            if conflicts:
+                raise self.conflict_error(conflicts)
+            approved = pending.update(status='Approved', updated_at=timezone.now())
+            UsageRollup.record((self.resource_id, start, end, quantity) for _, start, end, quantity in rows)
+            bump_version(BOOKINGS, resource_namespace(self.resource_id))
+            Notification.objects.create(
+                user_id=self.user_id,
+                booking_id=rows[0][0],
+                message=f'Your recurring booking for {self.resource.name} has been approved '
+                        f'({approved} occurrence(s)).'
+            )
+        return approved
+    
+    def reject(self, reason=''):
+        """Reject all pending occurrences with a single UPDATE. Returns the number rejected."""
+        with transaction.atomic():
+            pending = self.bookings.filter(status='Pending')
+            first_pk = pending.order_by('start_time').values_list('pk', flat=True).first()
+            if first_pk is None:
+                return 0
+            rejected = pending.update(status='Rejected', rejection_reason=reason, updated_at=timezone.now())
+            bump_version(BOOKINGS, resource_namespace(self.resource_id))
+            Notification.objects.create(
+                user_id=self.user_id,
+                booking_id=first_pk,
+                message=f'Your recurring booking for {self.resource.name} has been rejected '
+                        f'({rejected} occurrence(s)). Reason: {reason if reason else "No reason provided."}'
+            )
+        return rejected
+
+
+class WaitlistEntry(models.Model):
+    """
+    A request for a slot that was taken, queued first come, first served.
+    
+    When an approved booking overlapping the slot is rejected, cancelled or
+    deleted, ``promote`` turns the oldest entries that now fit into pending
+    bookings and notifies their owners.
+    """
+    
+    STATUS_CHOICES = [
+        ('Waiting', 'Waiting'),
+        ('Promoted', 'Promoted'),
+        ('Withdrawn', 'Withdrawn'),
+        ('Expired', 'Expired'),
+    ]
+    
+    # Promotion looks at no more than this many waiting entries per freed slot
+    MAX_CANDIDATES = 50
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='waitlist_entries')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    quantity = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="Number of items requested (equipment pools only)"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Waiting')
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='waitlist_entry',
+        help_text="Booking created when the entry was promoted"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        verbose_name = 'Waitlist Entry'
+        verbose_name_plural = 'Waitlist Entries'
+        indexes = [
+            # Waiting entries overlapping a freed slot, bounded like booking_overlap_idx
+            models.Index(
+                fields=['resource', 'status', 'end_time', 'start_time', 'created_at'],
+                name='waitlist_overlap_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.resource.name} ({self.start_time.date()})"
+    
+    @classmethod
+    def promote(cls, resource_id, start_time, end_time):
+        """
+        Promote waiting entries that fit now that ``[start_time, end_time)`` is free.
+        
+        One interval query finds the waiting entries overlapping the slot,
+        oldest first, and one more fetches the approved bookings around
+        them; entries are then fitted in memory, each promoted one counting
+        against the next. Returns the new pending bookings.
+        """
+        with transaction.atomic():
+            candidates = list(
+                cls.objects.select_for_update()
+                .filter(
+                    resource_id=resource_id,
+                    status='Waiting',
+                    start_time__lt=end_time,
+                    end_time__gt=start_time,
+                    start_time__gt=timezone.now(),
+                )
+                .select_related('resource')
+                .order_by('created_at', 'id')[:cls.MAX_CANDIDATES]
+            )
+            if not candidates:
+                return []
+            resource = candidates[0].resource
+            units = resource.capacity if resource.is_pooled else 1
+            taken = list(
+                Booking.objects.filter(
+                    resource_id=resource_id,
+                    status='Approved',
+                    start_time__lt=max(entry.end_time for entry in candidates),
+                    end_time__gt=min(entry.start_time for entry in candidates),
+                ).order_by().values_list('start_time', 'end_time', 'quantity')
+            )
+            
+            promoted = []
+            for entry in candidates:
+                if peak_usage(taken, entry.start_time, entry.end_time) + entry.quantity > units:
+                    continue
+                booking = Booking.objects.create(
+                    user_id=entry.user_id,
+                    resource=resource,
+                    start_time=entry.start_time,
+                    end_time=entry.end_time,
+                    quantity=entry.quantity,
+                    status='Pending',
+                )
+                entry.status = 'Promoted'
+                entry.booking = booking
+                entry.save(update_fields=['status', 'booking'])
+                Notification.objects.create(
+                    user_id=entry.user_id,
+                    booking=booking,
+                    message=f'A slot opened up for {resource.name} on '
+                            f'{timezone.localtime(entry.start_time):%b %d, %Y %H:%M}. Your waitlisted '
+                            f'request is now a booking pending approval.'
+                )
+                taken.append((entry.start_time, entry.end_time, entry.quantity))
+                promoted.append(booking)
+        return promoted
 
 
 class Notification(models.Model):
@@ -127,6 +619,266 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+        indexes = [
+            # Keyset pagination of a user's notifications, all or unread only
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_created_idx'),
+            models.Index(fields=['user', 'is_read', 'created_at', 'id'], name='notification_user_unread_idx'),
+            # Admin changelist: default ordering and the created date filter
+            models.Index(fields=['created_at', 'id'], name='notification_created_idx'),
+        ]
     
     def __str__(self):
         return f"Notification for {self.user.username} - {self.message[:50]}"
+    
+    def save(self, *args, **kwargs):
+        """
+        Save the notification and adjust the unread counters in the same transaction.
+        
+        Edits of an existing row (e.g. flipping ``is_read`` in the admin) are
+        compared against the stored owner and ``is_read``, so the counters
+        move by exactly the change.
+        """
+        created = self._state.adding
+        with transaction.atomic():
+            previous = None
+            if not created:
+                previous = (
+                    Notification.objects.select_for_update().filter(pk=self.pk)
+                    .values_list('user_id', 'is_read').first()
+                )
+            super().save(*args, **kwargs)
+            if previous != (self.user_id, self.is_read):
+                if previous is not None and not previous[1]:
+                    NotificationCounter.adjust(previous[0], -1)
+                if not self.is_read:
+                    NotificationCounter.adjust(self.user_id, 1)
+            if created:
+                publish_on_commit(user_channel(self.user_id), {
+                    'type': 'notification',
+                    'id': self.pk,
+                    'message': self.message,
+                    'booking_id': self.booking_id,
+                })
+    
+    def mark_read(self):
+        """Mark this notification as read, decrementing the unread counter once."""
+        with transaction.atomic():
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
+            if updated:
+                NotificationCounter.adjust(self.user_id, -updated)
+        self.is_read = True
+    
+    @classmethod
+    def mark_read_for(cls, user_id, up_to_id=None, pks=None):
+        """
+        Mark a user's unread notifications read with one UPDATE; returns how many changed.
+        
+        ``up_to_id`` stops at the newest notification the user has seen, so
+        ones that arrived after the page was rendered stay unread; ``pks``
+        limits the update to the given notifications. The unread counter is
+        adjusted in the same transaction.
+        """
+        unread = cls.objects.filter(user_id=user_id, is_read=False)
+        if up_to_id is not None:
+            unread = unread.filter(pk__lte=up_to_id)
+        if pks is not None:
+            unread = unread.filter(pk__in=pks)
+        with transaction.atomic():
+            updated = unread.update(is_read=True)
+            NotificationCounter.adjust(user_id, -updated)
+        return updated
+    
+    @classmethod
+    def delete_read_for(cls, user_id):
+        """Delete all of a user's read notifications; the unread counter is unaffected."""
+        deleted, _ = cls.objects.filter(user_id=user_id, is_read=True).delete()
+        return deleted
+    
+    @classmethod
+    def create_many(cls, notifications, batch_size=1000):
+        """
+        Insert ``notifications`` with batched INSERTs instead of one ``save()`` each.
+        
+        Unread counters and live streams are updated per user, as ``save()``
+        would, but with one UPDATE per distinct count rather than per row.
+        """
+        with transaction.atomic():
+            created = cls.objects.bulk_create(notifications, batch_size=batch_size)
+            unread = {}
+            for notification in created:
+                if not notification.is_read:
+                    unread[notification.user_id] = unread.get(notification.user_id, 0) + 1
+            NotificationCounter.adjust_many(unread)
+            for notification in created:
+                publish_on_commit(user_channel(notification.user_id), {
+                    'type': 'notification',
+                    'id': notification.pk,
+                    'message': notification.message,
+                    'booking_id': notification.booking_id,
+                })
+        return created
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread-notification count per user.
+    
+    The value is served from the cache framework on every page render and
+    falls back to this row on a cache miss, so templates never run COUNT(*).
+    """
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Notification Counter'
+        verbose_name_plural = 'Notification Counters'
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.unread_count} unread"
+    
+    @staticmethod
+    def cache_key(user_id):
+        return f'resources:unread-notifications:{user_id}'
+    
+    @classmethod
+    def unread_for(cls, user):
+        """Return the unread count for a user, reading the database only on a cache miss."""
+        key = cls.cache_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = cls.objects.filter(user=user).values_list('unread_count', flat=True).first() or 0
+            cache.set(key, count, settings.NOTIFICATION_COUNT_CACHE_TIMEOUT)
+        return count
+    
+    @classmethod
+    async def aunread_for(cls, user):
+        """Async version of ``unread_for``."""
+        key = cls.cache_key(user.pk)
+        count = await cache.aget(key)
+        if count is None:
+            count = await cls.objects.filter(user=user).values_list('unread_count', flat=True).afirst() or 0
+            await cache.aset(key, count, settings.NOTIFICATION_COUNT_CACHE_TIMEOUT)
+        return count
+    
+    @classmethod
+    def adjust(cls, user_id, delta):
+        """
+        Atomically add ``delta`` to a user's unread count.
+        
+        Must be called inside the transaction that creates or reads the
+        notifications. The cached value is dropped now and again once that
+        transaction commits, so no reader can re-cache the old total.
+        """
+        if not delta:
+            return
+        counters = cls.objects.filter(user_id=user_id)
+        new_value = models.Case(
+            models.When(unread_count__lt=-delta, then=0),
+            default=F('unread_count') + delta,
+        )
+        with transaction.atomic():
+            if not counters.update(unread_count=new_value):
+                _, created = cls.objects.get_or_create(
+                    user_id=user_id, defaults={'unread_count': max(delta, 0)}
+                )
+                if not created:
+                    counters.update(unread_count=new_value)
+        key = cls.cache_key(user_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+        # Live clients re-read the count, after the cache entry is gone
+        publish_on_commit(user_channel(user_id), {'type': 'unread'})
+    
+    @classmethod
+    def adjust_many(cls, deltas):
+        """``adjust()`` for a ``{user_id: delta}`` map, with one UPDATE per distinct delta."""
+        by_delta = {}
+        for user_id, delta in deltas.items():
+            if delta:
+                by_delta.setdefault(delta, []).append(user_id)
+        with transaction.atomic():
+            for delta, user_ids in by_delta.items():
+                new_value = models.Case(
+                    models.When(unread_count__lt=-delta, then=0),
+                    default=F('unread_count') + delta,
+                )
+                existing = set(cls.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+                cls.objects.filter(user_id__in=existing).update(unread_count=new_value)
+                # Users without a counter row yet take the careful path
+                for user_id in set(user_ids) - existing:
+                    cls.adjust(user_id, delta)
+        keys = [cls.cache_key(user_id) for user_id in deltas]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        for user_id in deltas:
+            publish_on_commit(user_channel(user_id), {'type': 'unread'})
+
+
+class UsageRollup(models.Model):
+    """
+    Approved booking minutes per resource, local day and hour of day.
+    
+    Minutes are weighted by quantity, so a pool lending 3 projectors for an
+    hour records 180. Rows are adjusted whenever a booking enters or leaves
+    the Approved state and can be rebuilt from scratch with the
+    ``rebuild_usage_rollups`` command; utilization reports read only this
+    table, never the bookings.
+    """
+    
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='usage_rollups')
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    booked_minutes = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Usage Rollup'
+        verbose_name_plural = 'Usage Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['resource', 'day', 'hour'], name='usage_rollup_unique_bucket'),
+        ]
+        indexes = [
+            # Date-range reports grouped by resource or hour, from the index alone
+            models.Index(fields=['day', 'resource', 'hour', 'booked_minutes'], name='usage_rollup_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.resource_id} {self.day} {self.hour:02d}:00 - {self.booked_minutes} min"
+    
+    @staticmethod
+    def buckets(usages, sign=1):
+        """Sum ``(resource_id, start, end, quantity)`` usages into ``{(resource_id, day, hour): minutes}``."""
+        buckets = {}
+        for resource_id, start, end, quantity in usages:
+            for day, hour, minutes in split_by_hour(start, end):
+                key = (resource_id, day, hour)
+                buckets[key] = buckets.get(key, 0) + sign * minutes * quantity
+        return buckets
+    
+    @classmethod
+    def record(cls, usages, sign=1):
+        """
+        Add (``sign=1``) or remove (``sign=-1``) approved usages from the rollups.
+        
+        Must be called in the transaction that changes the bookings. Buckets
+        are updated in key order so concurrent approvals cannot deadlock.
+        """
+        if not usages:
+            return
+        with transaction.atomic():
+            for (resource_id, day, hour), delta in sorted(cls.buckets(usages, sign).items()):
+                if not delta:
+                    continue
+                rows = cls.objects.filter(resource_id=resource_id, day=day, hour=hour)
+                new_value = models.Case(
+                    models.When(booked_minutes__lt=-delta, then=0),
+                    default=F('booked_minutes') + delta,
+                )
+                if rows.update(booked_minutes=new_value) or delta < 0:
+                    continue
+                _, created = cls.objects.get_or_create(
+                    resource_id=resource_id, day=day, hour=hour, defaults={'booked_minutes': delta}
+                )
+                if not created:
+                    rows.update(booked_minutes=new_value)
@@ -0,0 +1,216 @@
+"""
+Keyset (cursor) pagination on ``(created_at, id)``.
+
+Each page is fetched with a range condition on the composite key instead of
+an OFFSET, so the cost of a page stays the same however deep the history is.
+Cursors are opaque, URL-safe tokens naming the row a page starts after (or
+ends before).
+
+``EstimatedCountPaginator`` is the admin changelist counterpart: numbered
+pages, but without an exact COUNT(*) over very large tables.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+DEFAULT_PAGE_SIZE = 25
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj):
+    raw = f'{direction}|{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(direction, created_at, pk)`` or ``None`` for a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, created_at, pk = raw.split('|')
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """One page of results plus the URLs and labels of its neighbours."""
+
+    def __init__(self, object_list, request, cursor_param, next_cursor=None, previous_cursor=None,
+                 descending=True):
+        self.object_list = object_list
+        self.descending = descending
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._request = request
+        self._cursor_param = cursor_param
+        self._params = {}
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def keep_params(self, **params):
+        """Carry ``params`` into the neighbours' URLs, e.g. state set on the first page."""
+        self._params.update(params)
+
+    def _url(self, cursor):
+        params = self._request.GET.copy()
+        for name, value in self._params.items():
+            params[name] = value
+        params[self._cursor_param] = cursor
+        return f'?{params.urlencode()}'
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self.has_next else None
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor) if self.has_previous else None
+
+    @property
+    def next_label(self):
+        return 'Older' if self.descending else 'Newer'
+
+    @property
+    def previous_label(self):
+        return 'Newer' if self.descending else 'Older'
+
+
+def _keyset_query(queryset, request, per_page, descending, cursor_param):
+    cursor = decode_cursor(request.GET.get(cursor_param, ''))
+    direction = cursor[0] if cursor else NEXT
+    # Walking backwards means scanning the index the other way round
+    forward = descending == (direction == NEXT)
+
+    if forward:
+        ordering = ('-created_at', '-pk')
+        lookups = ('created_at__lt', 'pk__lt')
+    else:
+        ordering = ('created_at', 'pk')
+        lookups = ('created_at__gt', 'pk__gt')
+
+    if cursor:
+        _, created_at, pk = cursor
+        queryset = queryset.filter(
+            Q(**{lookups[0]: created_at}) | Q(created_at=created_at, **{lookups[1]: pk})
+        )
+    return cursor, queryset.order_by(*ordering)[:per_page + 1]
+
+
+def _keyset_page(rows, cursor, request, per_page, descending, cursor_param):
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if cursor and cursor[0] == PREVIOUS:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, cursor is not None
+
+    if not rows:
+        return KeysetPage(rows, request, cursor_param, descending=descending)
+    return KeysetPage(
+        rows,
+        request,
+        cursor_param,
+        next_cursor=encode_cursor(NEXT, rows[-1]) if has_next else None,
+        previous_cursor=encode_cursor(PREVIOUS, rows[0]) if has_previous else None,
+        descending=descending,
+    )
+
+
+def paginate_keyset(queryset, request, per_page=DEFAULT_PAGE_SIZE, descending=True, cursor_param='cursor'):
+    """
+    Return a ``KeysetPage`` of ``queryset`` ordered by ``(created_at, id)``.
+
+    ``descending=True`` lists newest first. The queryset should be backed by an
+    index whose trailing columns are ``(created_at, id)``.
+    """
+    cursor, page_query = _keyset_query(queryset, request, per_page, descending, cursor_param)
+    return _keyset_page(list(page_query), cursor, request, per_page, descending, cursor_param)
+
+
+async def apaginate_keyset(queryset, request, per_page=DEFAULT_PAGE_SIZE, descending=True, cursor_param='cursor'):
+    """Async version of ``paginate_keyset`` for async views."""
+    cursor, page_query = _keyset_query(queryset, request, per_page, descending, cursor_param)
+    return _keyset_page([obj async for obj in page_query], cursor, request, per_page, descending, cursor_param)
+
+
+def estimate_rows(model, using='default'):
+    """
+    Approximate row count of ``model``'s table from planner statistics, or None.
+
+    PostgreSQL and MySQL keep an estimate that ANALYZE refreshes; on SQLite
+    the largest rowid is an upper bound found with a single index probe.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been analyzed
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an exact COUNT(*) over a huge table.
+
+    Unfiltered lists take their size from ``estimate_rows`` once the table
+    holds more than ``exact_below`` rows. Filtered lists are counted only up
+    to ``max_count`` rows, so pages beyond that are not offered; narrow the
+    filters instead.
+    """
+
+    exact_below = 10000
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_below:
+                return estimate
+        return queryset.order_by().values('pk')[:self.max_count].count()
@@ -0,0 +1,136 @@
+"""
+Full-text search for the resource catalog.
+
+On SQLite resources are mirrored into an FTS5 table (created by migration
+0003 and kept in sync by the signals in ``resources.signals``). On
+PostgreSQL the same migration adds a generated ``tsvector`` column with a
+GIN index instead. Any other backend falls back to ``icontains`` filtering.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, Case, FloatField, Q, When
+from django.db.models.expressions import RawSQL
+
+from .models import Resource
+
+
+FTS_TABLE = 'resources_resource_fts'
+
+# Default cap on ranked search results. The catalog asks for one more to
+# tell whether there were more matches than it shows.
+SEARCH_RESULT_LIMIT = 200
+
+# Name matches weigh more than description matches when ranking.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TOKENS = 10
+
+
+def tokenize(text):
+    """Split a search string into lower-cased word tokens safe to embed in a query."""
+    return TOKEN_RE.findall(text.lower())[:MAX_TOKENS]
+
+
+def search_resources(text, category=None, limit=SEARCH_RESULT_LIMIT, using='default'):
+    """
+    Return up to ``limit`` resources matching every word of ``text`` by prefix,
+    best match first.
+
+    The result is a queryset so callers can keep chaining filters.
+    """
+    tokens = tokenize(text)
+    resources = Resource.objects.using(using)
+    if not tokens:
+        return resources.none()
+
+    vendor = connections[using].vendor
+    if vendor == 'sqlite':
+        return _search_sqlite(resources, tokens, category, limit, using)
+    if vendor == 'postgresql':
+        return _search_postgresql(resources, tokens, category, limit)
+
+    if category:
+        resources = resources.filter(category=category)
+    return resources.filter(Q(name__icontains=text) | Q(description__icontains=text)).order_by('name')[:limit]
+
+
+def _search_sqlite(resources, tokens, category, limit, using):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    params = [match]
+    if category:
+        sql += ' AND category = %s'
+        params.append(category)
+    sql += f' ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) LIMIT %s'
+    params.append(limit)
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked_ids = [row[0] for row in cursor.fetchall()]
+
+    if not ranked_ids:
+        return resources.none()
+    relevance = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ranked_ids)])
+    return resources.filter(pk__in=ranked_ids).order_by(relevance)
+
+
+def _search_postgresql(resources, tokens, category, limit):
+    tsquery = ' & '.join(f'{token}:*' for token in tokens)
+    resources = resources.alias(
+        search_match=RawSQL(
+            "\"resources_resource\".\"search_vector\" @@ to_tsquery('english', %s)",
+            [tsquery],
+            output_field=BooleanField(),
+        ),
+    ).annotate(
+        search_rank=RawSQL(
+            "ts_rank(\"resources_resource\".\"search_vector\", to_tsquery('english', %s))",
+            [tsquery],
+            output_field=FloatField(),
+        ),
+    ).filter(search_match=True)
+    if category:
+        resources = resources.filter(category=category)
+    return resources.order_by('-search_rank', 'name')[:limit]
+
+
+def index_resources(resources, using='default'):
+    """Insert or refresh the FTS rows for the given resources (SQLite only)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    rows = [(r.pk, r.name, r.description, r.category) for r in resources]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def unindex_resources(pks, using='default'):
+    """Drop the FTS rows for the given resource ids (SQLite only)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in pks])
+
+
+def rebuild_index(using='default'):
+    """Repopulate the FTS table from scratch (SQLite only)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) '
+            f'SELECT id, name, description, category FROM resources_resource'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
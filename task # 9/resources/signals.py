@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import BOOKINGS, CATALOG, bump_version, resource_namespace
+from .models import Resource, Booking, Notification, NotificationCounter, UsageRollup, WaitlistEntry
+from . import search
+
+
+@receiver(post_delete, sender=Notification)
+def release_unread_notification(sender, instance, **kwargs):
+    """Keep the unread counter in step when unread notifications are deleted (incl. cascades)."""
+    if not instance.is_read:
+        NotificationCounter.adjust(instance.user_id, -1)
+
+
+@receiver(post_delete, sender=Booking)
+def release_booking_usage(sender, instance, **kwargs):
+    """Take deleted approved bookings (incl. cascades) out of the usage rollups and offer the slot on."""
+    usage = instance.approved_usage()
+    if usage:
+        UsageRollup.record([usage], -1)
+        WaitlistEntry.promote(*usage[:3])
+
+
+@receiver(post_save, sender=Resource)
+def index_resource(sender, instance, using, raw=False, **kwargs):
+    """Mirror resource text into the full-text index."""
+    if not raw:
+        search.index_resources([instance], using=using)
+
+
+@receiver(post_delete, sender=Resource)
+def unindex_resource(sender, instance, using, **kwargs):
+    search.unindex_resources([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidate_resource_pages(sender, instance, **kwargs):
+    """Drop cached catalog results/cards and the resource's detail page."""
+    bump_version(CATALOG, resource_namespace(instance.pk))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_resource_bookings(sender, instance, **kwargs):
+    """Drop the cached upcoming bookings and totals of the booking's resource."""
+    bump_version(BOOKINGS, resource_namespace(instance.resource_id))
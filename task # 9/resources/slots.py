@@ -0,0 +1,90 @@
+"""
+Find free slots across every resource of a category.
+
+All approved bookings of the candidate resources inside the window are read
+in one query; free time is then worked out per resource in memory with the
+interval helpers in ``availability``. Hours outside ``OPENING_HOURS`` count
+as busy, so slots never start at 3am.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .availability import UsageProfile, free_gaps, merge_intervals
+from .models import Booking, Resource
+
+
+SLOT_STEP = timedelta(minutes=15)
+
+EARLIEST = 'earliest'
+BEST_FIT = 'best_fit'
+
+
+def _round_up(moment, step=SLOT_STEP):
+    """Round ``moment`` up to the next multiple of ``step`` past the hour."""
+    local = timezone.localtime(moment)
+    into_hour = timedelta(minutes=local.minute, seconds=local.second, microseconds=local.microsecond)
+    return moment + (math.ceil(into_hour / step) * step - into_hour)
+
+
+def closed_intervals(start, end):
+    """The hours outside ``OPENING_HOURS`` on every local day ``[start, end)`` touches."""
+    opens, closes = settings.OPENING_HOURS
+    closed = []
+    day = timezone.localtime(start).date()
+    while True:
+        midnight = timezone.make_aware(datetime.combine(day, time()))
+        if midnight >= end:
+            break
+        next_midnight = timezone.make_aware(datetime.combine(day + timedelta(days=1), time()))
+        closed.append((midnight, timezone.make_aware(datetime.combine(day, time(opens)))))
+        if closes < 24:
+            closed.append((timezone.make_aware(datetime.combine(day, time(closes))), next_midnight))
+        day += timedelta(days=1)
+    return closed
+
+
+def find_slots(category, min_capacity, start, end, duration, order=EARLIEST, per_resource=3):
+    """
+    Return ``[{'resource', 'slots', 'surplus'}]`` for resources with a free slot, ranked.
+
+    For exclusive resources ``min_capacity`` is the number of seats needed;
+    for equipment pools it is the number of items, and a slot is free while
+    at least that many are not lent out. ``slots`` holds up to
+    ``per_resource`` ``(start, end)`` pairs, the earliest of each free gap.
+    ``order`` is ``EARLIEST`` (soonest slot first) or ``BEST_FIT`` (least
+    spare capacity first, so large halls stay free for large groups).
+    """
+    start = _round_up(max(start, timezone.now()))
+    resources = list(Resource.objects.filter(category=category, capacity__gte=min_capacity).order_by('capacity', 'name'))
+    usage = {resource.pk: [] for resource in resources}
+    bookings = Booking.objects.filter(
+        resource__in=resources, status='Approved', end_time__gt=start, start_time__lt=end
+    ).order_by().values_list('resource_id', 'start_time', 'end_time', 'quantity')
+    for resource_id, booking_start, booking_end, quantity in bookings:
+        usage[resource_id].append((booking_start, booking_end, quantity))
+    closed = closed_intervals(start, end)
+
+    results = []
+    for resource in resources:
+        if resource.is_pooled:
+            taken = UsageProfile(usage[resource.pk]).busy_intervals(resource.capacity - min_capacity)
+        else:
+            taken = [(booking_start, booking_end) for booking_start, booking_end, _ in usage[resource.pk]]
+        slots = []
+        for gap_start, gap_end in free_gaps(merge_intervals(taken + closed), start, end, duration):
+            slot_start = _round_up(gap_start)
+            if slot_start + duration <= gap_end:
+                slots.append((slot_start, slot_start + duration))
+            if len(slots) == per_resource:
+                break
+        if slots:
+            results.append({'resource': resource, 'slots': slots, 'surplus': resource.capacity - min_capacity})
+
+    if order == BEST_FIT:
+        results.sort(key=lambda result: (result['surplus'], result['slots'][0][0]))
+    else:
+        results.sort(key=lambda result: (result['slots'][0][0], result['surplus']))
+    return results
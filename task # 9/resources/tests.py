@@ -0,0 +1,1523 @@
+import base64
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .admin import BookingAdmin
+from .availability import UsageProfile, find_conflicts, free_gaps, merge_intervals
+from .cache import check_shared_cache
+from .imports import import_resources
+from .management.commands.benchmark_db_concurrency import open_database
+from .middleware import QueryBudgetExceeded
+from .models import (
+    Resource, Booking, BookingEvent, BookingSeries, Notification, NotificationCounter, UsageRollup, WaitlistEntry
+)
+from .pagination import (
+    NEXT, PREVIOUS, EstimatedCountPaginator, decode_cursor, encode_cursor, estimate_rows, paginate_keyset
+)
+from .search import SEARCH_RESULT_LIMIT, rebuild_index, search_resources
+from .triggers import check_triggers
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTests(TestCase):
+    """Each page must stay within its QUERY_BUDGETS entry however many rows it lists."""
+
+    ROWS = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', is_staff=True, is_superuser=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        start = timezone.now() + timedelta(days=1)
+        for i in range(cls.ROWS):
+            resource = Resource.objects.create(name=f'Lab {i}', category='Lab', capacity=30)
+            slot = start + timedelta(hours=2 * i)
+            approved = Booking.objects.create(
+                user=cls.student, resource=resource, start_time=slot, end_time=slot + timedelta(hours=1)
+            )
+            approved.status = 'Approved'
+            approved.save()
+            Booking.objects.create(
+                user=cls.student,
+                resource=resource,
+                start_time=slot + timedelta(days=7),
+                end_time=slot + timedelta(days=7, hours=1),
+            )
+            Notification.objects.create(user=cls.student, booking=approved, message=f'Booking {i} approved')
+        cls.resource = resource
+        cls.booking = approved
+
+    def assertWithinBudget(self, user, url):
+        self.client.force_login(user)
+        # Budgets are for cold pages, not ones cached by an earlier request
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Query-Count', response)
+        return response
+
+    def test_student_pages(self):
+        for url in [
+            reverse('catalog'),
+            reverse('catalog') + '?search=lab',
+            reverse('resource_detail', args=[self.resource.pk]),
+            reverse('booking_detail', args=[self.booking.pk]),
+            reverse('my_bookings'),
+            reverse('notifications'),
+        ]:
+            with self.subTest(url=url):
+                self.assertWithinBudget(self.student, url)
+
+    def test_admin_pages(self):
+        for url in [
+            reverse('admin_dashboard'),
+            reverse('admin:resources_booking_changelist'),
+            reverse('admin:resources_notification_changelist'),
+        ]:
+            with self.subTest(url=url):
+                self.assertWithinBudget(self.admin, url)
+
+    async def test_async_requests_are_measured(self):
+        await self.async_client.aforce_login(self.student)
+        await sync_to_async(cache.clear)()
+        response = await self.async_client.get(reverse('notifications'))
+        self.assertGreater(response.query_count, 0)
+        with self.settings(QUERY_BUDGETS={'notifications': 0}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'notifications ran'):
+                await self.async_client.get(reverse('notifications'))
+
+    def test_posts_have_no_budget(self):
+        self.client.force_login(self.student)
+        with self.settings(QUERY_BUDGETS={'notifications': 0}):
+            response = self.client.post(reverse('notifications'), {'action': 'mark_all_read'})
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(response.query_count, 0)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:resources_booking_changelist')
+        self.client.get(url)
+        before = self.client.get(url).query_count
+        resource = Resource.objects.create(name='Extra Hall', category='Hall', capacity=100)
+        start = timezone.now() + timedelta(days=30)
+        for i in range(5):
+            Booking.objects.create(
+                user=self.admin,
+                resource=resource,
+                start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1),
+            )
+        self.assertEqual(self.client.get(url).query_count, before)
+
+
+class RecurringBookingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.lab = Resource.objects.create(name='Physics Lab', category='Lab', capacity=20)
+        cls.first_start = (timezone.now() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+
+    def post_series(self, **overrides):
+        data = {
+            'resource': self.lab.pk,
+            'start_time': self.first_start.strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (self.first_start + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            'frequency': 'WEEKLY',
+            'interval': 1,
+            'count': 15,
+        }
+        data.update(overrides)
+        self.client.force_login(self.student)
+        return self.client.post(reverse('create_series'), data)
+
+    def approve(self, start, end):
+        booking = Booking.objects.create(user=self.admin, resource=self.lab, start_time=start, end_time=end)
+        booking.status = 'Approved'
+        booking.save()
+        return booking
+
+    def test_creates_all_occurrences_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_series()
+        self.assertEqual(response.status_code, 302)
+        booking_inserts = [
+            q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "resources_booking"')
+        ]
+        overlap_checks = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and '"resources_booking"."status" = \'Approved\'' in q['sql']
+        ]
+        self.assertEqual(len(booking_inserts), 1)
+        self.assertEqual(len(overlap_checks), 1)
+
+        series = BookingSeries.objects.get()
+        starts = list(series.bookings.order_by('start_time').values_list('start_time', flat=True))
+        self.assertEqual(len(starts), 15)
+        self.assertEqual(starts[-1] - starts[0], timedelta(weeks=14))
+        self.assertEqual(series.bookings.filter(status='Pending').count(), 15)
+
+    def test_until_past_the_occurrence_limit_is_rejected(self):
+        first_day = timezone.localtime(self.first_start).date()
+        response = self.post_series(count='', until=first_day + timedelta(days=730))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('would have 105', response.context['form'].errors['until'][0])
+        self.assertFalse(BookingSeries.objects.exists())
+
+        last = first_day + timedelta(weeks=BookingSeries.MAX_OCCURRENCES - 1)
+        self.assertEqual(self.post_series(count='', until=last).status_code, 302)
+        self.assertEqual(Booking.objects.count(), BookingSeries.MAX_OCCURRENCES)
+
+    def test_conflicting_occurrence_rejects_whole_series(self):
+        clash = self.first_start + timedelta(weeks=6, hours=1)
+        self.approve(clash, clash + timedelta(hours=1))
+        response = self.post_series()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('clash', response.context['form'].non_field_errors()[0])
+        self.assertFalse(BookingSeries.objects.exists())
+
+    def test_touching_bookings_do_not_conflict(self):
+        end = self.first_start + timedelta(weeks=3, hours=2)
+        self.approve(end, end + timedelta(hours=1))
+        self.assertEqual(self.post_series().status_code, 302)
+
+    def test_approve_and_reject_series_in_one_operation(self):
+        self.post_series(count=5)
+        series = BookingSeries.objects.get()
+        self.assertEqual(series.approve(), 5)
+        self.assertEqual(series.bookings.filter(status='Approved').count(), 5)
+
+        self.post_series(count=3, start_time=(self.first_start + timedelta(hours=3)).strftime('%Y-%m-%dT%H:%M'),
+                         end_time=(self.first_start + timedelta(hours=4)).strftime('%Y-%m-%dT%H:%M'))
+        other = BookingSeries.objects.latest('created_at')
+        self.client.force_login(self.admin)
+        self.client.post(reverse('reject_series', args=[other.pk]), {'reason': 'Exams'})
+        self.assertEqual(other.bookings.filter(status='Rejected', rejection_reason='Exams').count(), 3)
+
+
+class PooledCapacityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', password='pass')
+        cls.laptops = Resource.objects.create(name='Laptop Pool', category='Equipment', capacity=30)
+        cls.hall = Resource.objects.create(name='Main Hall', category='Hall', capacity=300)
+        cls.start = timezone.now() + timedelta(days=1)
+
+    def book(self, resource, start_offset, hours, quantity=1):
+        start = self.start + timedelta(hours=start_offset)
+        booking = Booking.objects.create(
+            user=self.user,
+            resource=resource,
+            start_time=start,
+            end_time=start + timedelta(hours=hours),
+            quantity=quantity,
+        )
+        booking.status = 'Approved'
+        booking.save()
+        return booking
+
+    def test_pool_is_shared_up_to_capacity(self):
+        self.book(self.laptops, 0, 2, quantity=10)
+        self.book(self.laptops, 1, 2, quantity=15)
+        # Peak over hours 0-4 is 25 (hour 1-2), so 5 more fit but 6 do not
+        window = (self.start, self.start + timedelta(hours=4))
+        self.assertEqual(self.laptops.peak_usage(*window), 25)
+        self.assertTrue(self.laptops.is_available(*window, quantity=5))
+        self.assertFalse(self.laptops.is_available(*window, quantity=6))
+        # After the first loan returns, 15 are free
+        later = (self.start + timedelta(hours=2), self.start + timedelta(hours=3))
+        self.assertTrue(self.laptops.is_available(*later, quantity=15))
+
+    def test_over_capacity_approval_is_rejected(self):
+        self.book(self.laptops, 0, 2, quantity=20)
+        with self.assertRaises(ValidationError):
+            self.book(self.laptops, 1, 1, quantity=11)
+
+    def test_exclusive_resources_ignore_quantity(self):
+        self.book(self.hall, 0, 2)
+        self.assertFalse(self.hall.is_available(self.start, self.start + timedelta(hours=1)))
+        with self.assertRaises(ValidationError):
+            self.book(self.hall, 5, 1, quantity=2)
+
+    def test_blank_quantity_means_one(self):
+        self.client.force_login(self.user)
+        day = self.start + timedelta(days=1)
+
+        def window(hour):
+            return {
+                'start_time': (day + timedelta(hours=hour)).strftime('%Y-%m-%dT%H:%M'),
+                'end_time': (day + timedelta(hours=hour + 1)).strftime('%Y-%m-%dT%H:%M'),
+                'quantity': '',
+            }
+
+        for resource in (self.laptops, self.hall):
+            response = self.client.post(reverse('create_booking'), {'resource': resource.pk, **window(0)})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(Booking.objects.get(resource=resource).quantity, 1)
+
+            response = self.client.post(reverse('create_series'), {
+                'resource': resource.pk, **window(2), 'frequency': 'WEEKLY', 'interval': 1, 'count': 2,
+            })
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(BookingSeries.objects.get(resource=resource).quantity, 1)
+
+
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        cls.lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_catalog_served_from_cache_until_resources_change(self):
+        self.client.get(reverse('catalog'))
+        with self.assertNumQueries(2):
+            # session and user only
+            response = self.client.get(reverse('catalog'))
+        self.assertContains(response, 'Robotics Lab')
+
+        self.lab.name = 'Robotics Studio'
+        self.lab.save()
+        response = self.client.get(reverse('catalog'))
+        self.assertContains(response, 'Robotics Studio')
+        self.assertNotContains(response, 'Robotics Lab')
+
+    def test_approval_shows_up_on_detail_page_immediately(self):
+        url = reverse('resource_detail', args=[self.lab.pk])
+        self.client.get(url)
+        start = timezone.now() + timedelta(days=2)
+        booking = Booking.objects.create(
+            user=self.admin, resource=self.lab, start_time=start, end_time=start + timedelta(hours=1)
+        )
+        self.assertEqual(self.client.get(url).context['upcoming_bookings'], [])
+
+        self.client.get(reverse('approve_booking', args=[booking.pk]))
+        self.assertEqual(self.client.get(url).context['upcoming_bookings'], [booking])
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def pragmas(self, profile):
+        with tempfile.TemporaryDirectory() as directory:
+            connection = open_database(profile, os.path.join(directory, 'bench.sqlite3'))
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+                    cursor.execute('PRAGMA busy_timeout')
+                    busy_timeout = cursor.fetchone()[0]
+                max_age = connection.settings_dict['CONN_MAX_AGE']
+                return journal_mode, busy_timeout, connection.transaction_mode, max_age
+            finally:
+                connection.close()
+
+    def test_benchmark_connects_with_the_shipped_settings(self):
+        self.assertEqual(self.pragmas('development'), ('delete', 5000, None, 0))
+        self.assertEqual(self.pragmas('production'), ('wal', 20000, 'IMMEDIATE', settings.DB_CONN_MAX_AGE))
+
+    def test_multi_process_profiles_need_a_shared_cache(self):
+        with override_settings(DB_PROFILE='production'):
+            self.assertEqual([error.id for error in check_shared_cache()], ['resources.E002'])
+            with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+            }}):
+                self.assertEqual(check_shared_cache(), [])
+        self.assertEqual(check_shared_cache(), [])
+
+
+class SeedCampusTests(TestCase):
+    def test_seeded_approvals_never_overbook(self):
+        call_command('seed_campus', users=10, resources=8, bookings=400, days=3, stdout=StringIO())
+
+        self.assertEqual(Booking.objects.count(), 400)
+        for booking in Booking.objects.filter(status='Approved').select_related('resource'):
+            booking.resource.check_availability(
+                booking.start_time, booking.end_time, quantity=booking.quantity, exclude_booking=booking
+            )
+
+
+class NotificationStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        start = timezone.now() + timedelta(days=1)
+        cls.booking = Booking.objects.create(
+            user=cls.student, resource=lab, start_time=start, end_time=start + timedelta(hours=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.student, booking=self.booking, message='Approved!')
+
+    @staticmethod
+    def parse(chunk):
+        event, data = chunk.decode().strip().split('\n')
+        return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    async def test_stream_pushes_new_notifications_and_counts(self):
+        await self.async_client.aforce_login(self.student)
+        response = await self.async_client.get(reverse('notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+
+        self.assertEqual(self.parse(await anext(stream)), ('unread', {'count': 0}))
+        await sync_to_async(self.notify)()
+        self.assertEqual(self.parse(await anext(stream)), ('unread', {'count': 1}))
+        event, data = self.parse(await anext(stream))
+        self.assertEqual((event, data['message']), ('notification', 'Approved!'))
+        await stream.aclose()
+
+    def test_wsgi_gets_no_stream(self):
+        # self.client goes through Django's WSGI request handling
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+        self.assertNotContains(self.client.get(reverse('notifications')), 'EventSource')
+
+    async def test_asgi_pages_open_the_stream(self):
+        await self.async_client.aforce_login(self.student)
+        response = await self.async_client.get(reverse('notifications'))
+        self.assertContains(response, 'EventSource')
+
+    def test_async_notifications_page_marks_read(self):
+        self.notify()
+        notification = Notification.objects.get()
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('notifications')).context['unread_count'], 1)
+
+        self.client.post(reverse('notifications'), {'notification_id': notification.pk})
+        self.assertEqual(self.client.get(reverse('notifications')).context['unread_count'], 0)
+
+    def test_bulk_mark_read_up_to_seen_id_and_unread_filter(self):
+        for _ in range(3):
+            self.notify()
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('notifications'))
+        newest_id = response.context['newest_id']
+        self.notify()  # arrives after the page was rendered
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('notifications'), {'action': 'mark_all_read', 'up_to': newest_id})
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "resources_notification"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+
+        unread = self.client.get(reverse('notifications'), {'filter': 'unread'}).context['notifications']
+        self.assertEqual([n.pk for n in unread], [Notification.objects.latest('pk').pk])
+
+        self.client.post(reverse('notifications'), {'action': 'delete_read'})
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+
+    def test_mark_all_read_from_a_later_page_keeps_the_cutoff(self):
+        Notification.objects.bulk_create([
+            Notification(user=self.student, booking=self.booking, message=f'Update {i}') for i in range(30)
+        ])
+        NotificationCounter.adjust(self.student.pk, 30)
+        self.client.force_login(self.student)
+        first = self.client.get(reverse('notifications'))
+        next_url = first.context['notifications'].next_url
+        self.assertIn(f'seen={first.context["newest_id"]}', next_url)
+        second = self.client.get(reverse('notifications') + next_url)
+        self.assertTrue(second.context['notifications'].has_previous)
+        self.assertContains(second, f'name="up_to" value="{first.context["newest_id"]}"')
+        self.notify()  # arrives after page 2 was rendered
+
+        self.client.post(reverse('notifications'), {'action': 'mark_all_read', 'up_to': second.context['newest_id']})
+        self.assertEqual(list(Notification.objects.filter(is_read=False)), [Notification.objects.latest('pk')])
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+
+
+class NotificationCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.staff = User.objects.create_user('staff', password='pass')
+        lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        start = timezone.now() + timedelta(days=1)
+        cls.booking = Booking.objects.create(
+            user=cls.student, resource=lab, start_time=start, end_time=start + timedelta(hours=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def stored(self, user):
+        return NotificationCounter.objects.filter(user=user).values_list('unread_count', flat=True).first()
+
+    def test_adjust_increments_decrements_and_clamps_at_zero(self):
+        NotificationCounter.adjust(self.student.pk, 2)
+        self.assertEqual(self.stored(self.student), 2)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 2)
+
+        NotificationCounter.adjust(self.student.pk, -1)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+        NotificationCounter.adjust(self.student.pk, -5)
+        self.assertEqual(self.stored(self.student), 0)
+        # A user without a counter row never goes below zero either
+        NotificationCounter.adjust(self.staff.pk, -1)
+        self.assertEqual(self.stored(self.staff), 0)
+
+    def test_adjust_reaches_other_processes_through_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            # Another worker's view of the same cache directory
+            other_process = FileBasedCache(directory, {})
+            self.assertEqual(NotificationCounter.unread_for(self.student), 0)
+            self.assertEqual(other_process.get(NotificationCounter.cache_key(self.student.pk)), 0)
+            Notification.objects.create(user=self.student, booking=self.booking, message='Approved!')
+            self.assertIsNone(other_process.get(NotificationCounter.cache_key(self.student.pk)))
+            self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+
+    def test_adjust_many(self):
+        NotificationCounter.adjust(self.student.pk, 1)
+        NotificationCounter.adjust_many({self.student.pk: -3, self.staff.pk: 2})
+        self.assertEqual(self.stored(self.student), 0)
+        self.assertEqual(self.stored(self.staff), 2)
+        NotificationCounter.adjust_many({self.student.pk: 1, self.staff.pk: 1})
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+        self.assertEqual(NotificationCounter.unread_for(self.staff), 3)
+
+    def test_saving_existing_notification_tracks_is_read(self):
+        notification = Notification.objects.create(user=self.student, booking=self.booking, message='Approved!')
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+        notification.is_read = True
+        notification.save()
+        notification.save()
+        self.assertEqual(NotificationCounter.unread_for(self.student), 0)
+        notification.is_read = False
+        notification.save()
+        self.assertEqual(self.stored(self.student), 1)
+
+        admin_user = User.objects.create_user('admin', password='pass', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        self.client.post(
+            reverse('admin:resources_notification_change', args=[notification.pk]),
+            {'user': self.student.pk, 'booking': self.booking.pk, 'message': 'Approved!', 'is_read': 'on'},
+        )
+        self.assertTrue(Notification.objects.get(pk=notification.pk).is_read)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        for _ in range(3):
+            Notification.objects.create(user=self.student, booking=self.booking, message='Approved!')
+        NotificationCounter.objects.filter(user=self.student).update(unread_count=7)
+        Notification.objects.bulk_create([Notification(user=self.staff, booking=self.booking, message='New')])
+        self.assertIsNone(self.stored(self.staff))
+        self.assertEqual(NotificationCounter.unread_for(self.student), 7)
+
+        out = StringIO()
+        call_command('reconcile_notification_counts', dry_run=True, stdout=out)
+        self.assertIn('2 counter(s) would be repaired', out.getvalue())
+        self.assertEqual(self.stored(self.student), 7)
+
+        out = StringIO()
+        call_command('reconcile_notification_counts', batch_size=1, stdout=out)
+        self.assertIn('Checked 2 user(s); 2 counter(s) repaired', out.getvalue())
+        self.assertEqual(self.stored(self.student), 3)
+        self.assertEqual(self.stored(self.staff), 1)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 3)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.scope = Resource.objects.create(
+            name='Microscope', category='Equipment', capacity=4, description='Optical, 1000x'
+        )
+        cls.lab = Resource.objects.create(
+            name='Biology Lab', category='Lab', capacity=20, description='Benches and a microscope'
+        )
+
+    def setUp(self):
+        cache.clear()
+        if connection.vendor != 'sqlite':
+            self.skipTest('Exercises the SQLite FTS index.')
+
+    def fts_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid, name FROM resources_resource_fts ORDER BY rowid')
+            return cursor.fetchall()
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(list(search_resources('micro')), [self.scope, self.lab])
+        self.assertEqual(list(search_resources('micro', category='Lab')), [self.lab])
+        self.assertEqual(list(search_resources('micro', limit=1)), [self.scope])
+        self.assertEqual(list(search_resources('!!')), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.scope.name = 'Spectrometer'
+        self.scope.description = ''
+        self.scope.save()
+        self.assertEqual(list(search_resources('spectro')), [self.scope])
+        self.assertEqual(list(search_resources('micro')), [self.lab])
+
+        self.lab.delete()
+        self.assertEqual(self.fts_rows(), [(self.scope.pk, 'Spectrometer')])
+
+    def test_rebuild_command_restores_a_stale_index(self):
+        Resource.objects.filter(pk=self.lab.pk).update(name='Chemistry Lab')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM resources_resource_fts WHERE rowid = %s', [self.scope.pk])
+        self.assertEqual(list(search_resources('chem')), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Resource search index rebuilt.', out.getvalue())
+        self.assertEqual(list(search_resources('chem')), [self.lab])
+        self.assertEqual([pk for pk, _ in self.fts_rows()], [self.scope.pk, self.lab.pk])
+
+    def test_catalog_says_when_results_were_cut(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('catalog'), {'search': 'micro'})
+        self.assertNotContains(response, 'best matches')
+
+        Resource.objects.bulk_create([
+            Resource(name=f'Microphone {i}', category='Equipment', capacity=1)
+            for i in range(SEARCH_RESULT_LIMIT)
+        ])
+        # bulk_create skips the signals that index resources and bump the catalog version
+        rebuild_index()
+        cache.clear()
+        response = self.client.get(reverse('catalog'), {'search': 'micro'})
+        self.assertContains(response, f'Showing the {SEARCH_RESULT_LIMIT} best matches')
+        self.assertContains(response, 'href="/resource/', count=SEARCH_RESULT_LIMIT)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.lab = Resource.objects.create(name='Lab, North; Wing', category='Lab', capacity=20)
+        start = timezone.now() + timedelta(days=1)
+        for i, (user, status) in enumerate([
+            (cls.student, 'Approved'), (cls.student, 'Rejected'), (cls.admin, 'Approved'), (cls.admin, 'Pending'),
+        ]):
+            Booking.objects.create(
+                user=user,
+                resource=cls.lab,
+                start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1),
+                status=status,
+            )
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        return b''.join(response.streaming_content).decode()
+
+    def test_admin_csv_export_filters_by_status(self):
+        self.client.force_login(self.admin)
+        rows = self.content(self.client.get(reverse('export_bookings_csv'))).splitlines()
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(rows[0].startswith('id,user,resource'))
+        self.assertIn('"Lab, North; Wing"', rows[1])
+
+        rows = self.content(self.client.get(reverse('export_bookings_csv') + '?status=Approved')).splitlines()
+        self.assertEqual(len(rows), 3)
+
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('export_bookings_csv')).status_code, 302)
+
+    def test_my_bookings_ical_only_lists_own_live_bookings(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('my_bookings_ical'))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = self.content(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(r'SUMMARY:Lab\, North\; Wing', body)
+        self.assertIn('STATUS:CONFIRMED', body)
+
+    def test_resource_ical_lists_approved_bookings(self):
+        self.client.force_login(self.student)
+        body = self.content(self.client.get(reverse('resource_ical', args=[self.lab.pk])))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertNotIn('admin', body)
+
+    async def test_asgi_requests_stream_from_async_iterators(self):
+        await self.async_client.aforce_login(self.admin)
+        await sync_to_async(self.client.force_login)(self.admin)
+        for url in [reverse('export_bookings_csv'), reverse('resource_ical', args=[self.lab.pk])]:
+            sync_body = await sync_to_async(lambda: self.content(self.client.get(url)))()
+            response = await self.async_client.get(url)
+            # A sync iterator here would be read into memory whole before sending
+            self.assertTrue(response.is_async)
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+            self.assertEqual(body, sync_body)
+
+
+class UsageRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', is_staff=True, is_superuser=True)
+        cls.lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        cls.projectors = Resource.objects.create(name='Projectors', category='Equipment', capacity=10)
+        cls.start = (timezone.now() + timedelta(days=1)).replace(hour=10, minute=30, second=0, microsecond=0)
+
+    def book(self, resource, hours=1.75, quantity=1):
+        return Booking.objects.create(
+            user=self.admin,
+            resource=resource,
+            start_time=self.start,
+            end_time=self.start + timedelta(hours=hours),
+            quantity=quantity,
+        )
+
+    def minutes(self):
+        return list(UsageRollup.objects.order_by('resource', 'day', 'hour').values_list('resource', 'hour', 'booked_minutes'))
+
+    def test_approval_and_rejection_adjust_hourly_buckets(self):
+        booking = self.book(self.lab)
+        self.assertEqual(self.minutes(), [])
+
+        self.client.force_login(self.admin)
+        self.client.get(reverse('approve_booking', args=[booking.pk]))
+        self.assertEqual(self.minutes(), [(self.lab.pk, 10, 30), (self.lab.pk, 11, 60), (self.lab.pk, 12, 15)])
+
+        self.client.post(
+            reverse('admin:resources_booking_changelist'),
+            {'action': 'reject_bookings', '_selected_action': [booking.pk]},
+        )
+        self.assertEqual([minutes for _, _, minutes in self.minutes()], [0, 0, 0])
+
+    def test_admin_reject_leaves_closed_bookings_alone(self):
+        pending = self.book(self.lab)
+        closed = {}
+        for hours, status in ((3, 'Rejected'), (5, 'Cancelled')):
+            booking = self.book(self.projectors)
+            booking.start_time += timedelta(hours=hours)
+            booking.end_time += timedelta(hours=hours)
+            booking.status = status
+            booking.save()
+            closed[booking.pk] = status
+
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('admin:resources_booking_changelist'),
+            {'action': 'reject_bookings', '_selected_action': [pending.pk, *closed]},
+            follow=True,
+        )
+        self.assertContains(response, '1 booking(s) rejected.')
+        self.assertEqual(Booking.objects.get(pk=pending.pk).status, 'Rejected')
+        for pk, status in closed.items():
+            self.assertEqual(Booking.objects.get(pk=pk).status, status)
+        self.assertEqual(list(Notification.objects.values_list('booking', flat=True)), [pending.pk])
+
+    def test_admin_bulk_reject_queries_do_not_grow_with_batch(self):
+        students = [User.objects.create_user(f'student{i}') for i in range(4)]
+        NotificationCounter.objects.bulk_create(NotificationCounter(user=student) for student in students)
+        pks = [
+            Booking.objects.create(
+                user=students[i % 4],
+                resource=self.lab,
+                start_time=self.start + timedelta(hours=2 * i),
+                end_time=self.start + timedelta(hours=2 * i + 1),
+            ).pk
+            for i in range(20)
+        ]
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        model_admin = BookingAdmin(Booking, admin.site)
+        before = timezone.now()
+
+        # Lock and read, update, insert notifications, find and bump the unread
+        # counters, plus a SAVEPOINT/RELEASE pair for each of the 3 atomic blocks
+        with mock.patch.object(BookingAdmin, 'message_user'), self.assertNumQueries(11):
+            model_admin.reject_bookings(request, Booking.objects.filter(pk__in=pks))
+        rejected = Booking.objects.filter(pk__in=pks, status='Rejected', updated_at__gte=before)
+        self.assertEqual(rejected.count(), 20)
+        self.assertEqual(Notification.objects.filter(booking__in=pks).count(), 20)
+        for student in students:
+            self.assertEqual(NotificationCounter.unread_for(student), 5)
+
+    def test_pool_minutes_weighted_by_quantity_and_released_on_delete(self):
+        booking = self.book(self.projectors, hours=1, quantity=3)
+        booking.start_time = self.start.replace(minute=0)
+        booking.end_time = booking.start_time + timedelta(hours=1)
+        booking.status = 'Approved'
+        booking.save()
+        self.assertEqual(self.minutes(), [(self.projectors.pk, 10, 180)])
+
+        booking.delete()
+        self.assertEqual(self.minutes(), [(self.projectors.pk, 10, 0)])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for resource in (self.lab, self.projectors):
+            booking = self.book(resource, quantity=2 if resource.is_pooled else 1)
+            booking.status = 'Approved'
+            booking.save()
+        incremental = self.minutes()
+
+        call_command('rebuild_usage_rollups', stdout=StringIO())
+        self.assertEqual(self.minutes(), incremental)
+
+    def test_dashboard_reports_occupancy(self):
+        booking = self.book(self.lab)
+        booking.status = 'Approved'
+        booking.save()
+        # Move it into the reporting window, as time passing would
+        Booking.objects.filter(pk=booking.pk).update(
+            start_time=booking.start_time - timedelta(days=2), end_time=booking.end_time - timedelta(days=2)
+        )
+        call_command('rebuild_usage_rollups', stdout=StringIO())
+        self.client.force_login(self.admin)
+
+        utilization = self.client.get(reverse('admin_dashboard') + '?window=7').context['utilization']
+        self.assertEqual(utilization['days'], 7)
+        self.assertEqual(utilization['resources'][0]['resource'], self.lab)
+        self.assertAlmostEqual(utilization['resources'][0]['hours'], 1.75)
+
+
+class SlotFinderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.small = Resource.objects.create(name='Seminar Room', category='Hall', capacity=30)
+        cls.large = Resource.objects.create(name='Auditorium', category='Hall', capacity=300)
+        Resource.objects.create(name='Tiny Room', category='Hall', capacity=5)
+        cls.day = (timezone.now() + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+        # The seminar room is taken 8:00-10:30; the auditorium is free
+        Booking.objects.create(
+            user=cls.student,
+            resource=cls.small,
+            start_time=cls.day + timedelta(hours=8),
+            end_time=cls.day + timedelta(hours=10, minutes=30),
+            status='Approved',
+        )
+
+    def search(self, **params):
+        query = {
+            'category': 'Hall',
+            'min_capacity': 20,
+            'window_start': (self.day + timedelta(hours=6)).strftime('%Y-%m-%dT%H:%M'),
+            'window_end': (self.day + timedelta(hours=12)).strftime('%Y-%m-%dT%H:%M'),
+            'duration': 60,
+            'order': 'earliest',
+            **params,
+        }
+        return self.client.get(reverse('find_slots'), query).context['results']
+
+    def test_ranks_resources_by_earliest_free_slot_within_opening_hours(self):
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            results = self.search()
+        self.assertEqual(len([q for q in queries.captured_queries if 'resources_booking' in q['sql']]), 1)
+
+        self.assertEqual([result['resource'] for result in results], [self.large, self.small])
+        self.assertEqual(results[0]['slots'][0][0], self.day + timedelta(hours=8))
+        self.assertEqual(results[1]['slots'], [(self.day + timedelta(hours=10, minutes=30), self.day + timedelta(hours=11, minutes=30))])
+
+    def test_best_fit_prefers_smallest_sufficient_resource(self):
+        self.client.force_login(self.student)
+        results = self.search(order='best_fit')
+        self.assertEqual([result['resource'] for result in results], [self.small, self.large])
+
+    def test_slot_books_in_one_click(self):
+        self.client.force_login(self.student)
+        start, end = self.search()[1]['slots'][0]
+        self.client.post(reverse('create_booking'), {
+            'resource': self.small.pk,
+            'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+            'end_time': end.strftime('%Y-%m-%dT%H:%M'),
+            'quantity': 1,
+        })
+        self.assertTrue(Booking.objects.filter(resource=self.small, start_time=start, status='Pending').exists())
+
+
+class ExpirySweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        start = timezone.now() + timedelta(days=1)
+        cls.bookings = {}
+        for i, status in enumerate(['Pending', 'Pending', 'Approved', 'Pending']):
+            cls.bookings[i] = Booking.objects.create(
+                user=cls.student,
+                resource=cls.lab,
+                start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1),
+                status=status,
+            )
+        # Let time pass for all but the last one
+        Booking.objects.exclude(pk=cls.bookings[3].pk).update(start_time=F('start_time') - timedelta(days=2))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_pending_bookings_expire_with_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('expire_pending_bookings', stdout=StringIO())
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "resources_booking"')]
+        self.assertEqual(len(updates), 1)
+
+        statuses = dict(Booking.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[self.bookings[i].pk] for i in range(4)], ['Expired', 'Expired', 'Approved', 'Pending']
+        )
+        self.assertEqual(Notification.objects.filter(user=self.student).count(), 2)
+        self.assertEqual(NotificationCounter.unread_for(self.student), 2)
+
+    def test_only_the_bookings_it_expires_are_notified(self):
+        now = timezone.now()
+        # Expired earlier, but stamped with the very time this run will use
+        Booking.objects.filter(pk=self.bookings[1].pk).update(status='Expired', updated_at=now)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            call_command('expire_pending_bookings', stdout=StringIO())
+        self.assertEqual(list(Notification.objects.values_list('booking', flat=True)), [self.bookings[0].pk])
+
+    def test_prunes_only_old_read_notifications(self):
+        for is_read in (True, False):
+            Notification.objects.create(
+                user=self.student, booking=self.bookings[0], message='old', is_read=is_read
+            )
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=100))
+        Notification.objects.create(user=self.student, booking=self.bookings[0], message='new', is_read=True)
+
+        call_command('expire_pending_bookings', retention_days=90, batch_size=1, stdout=StringIO())
+        remaining = Notification.objects.exclude(message__contains='expired')
+        self.assertEqual(sorted(remaining.values_list('message', 'is_read')), [('new', True), ('old', False)])
+
+
+class ResourceImportTests(TestCase):
+    CSV = (
+        'code,name,category,description,capacity\n'
+        'ENG-201,Robotics Lab,Lab,Arduino kits,20\n'
+        'HALL-1,Main Hall,seminar hall,,300\n'
+        'BAD-1,Broken Row,Garage,,5\n'
+        'BAD-2,Tiny Room,Lab,,0\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+        Resource.objects.create(code='ENG-201', name='Old Lab', category='Lab', capacity=5)
+
+    def test_upserts_on_code_and_reports_bad_rows(self):
+        result = import_resources(StringIO(self.CSV), batch_size=1)
+
+        self.assertEqual((result.created, result.updated, result.error_count), (1, 1, 2))
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+        self.assertIn('Unknown category', result.errors[0][1])
+        lab = Resource.objects.get(code='ENG-201')
+        self.assertEqual((lab.name, lab.capacity), ('Robotics Lab', 20))
+        self.assertEqual(Resource.objects.get(code='HALL-1').category, 'Hall')
+        self.assertEqual(Resource.objects.count(), 2)
+        if connection.vendor == 'sqlite':
+            self.assertEqual(list(search_resources('robotics')), [lab])
+
+    def test_dry_run_saves_nothing(self):
+        result = import_resources(StringIO(self.CSV), dry_run=True)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(Resource.objects.get(code='ENG-201').name, 'Old Lab')
+        self.assertFalse(Resource.objects.filter(code='HALL-1').exists())
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            import_resources(StringIO('code,name\nX,Y\n'))
+
+    def test_admin_upload(self):
+        admin = User.objects.create_superuser('admin', password='pass')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('resources.csv', self.CSV.encode('utf-8-sig'), content_type='text/csv')
+
+        response = self.client.post(reverse('admin:resources_resource_import'), {'file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Unknown category')
+        self.assertTrue(Resource.objects.filter(code='HALL-1').exists())
+
+
+class WaitlistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='pass')
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.late = User.objects.create_user('late', password='pass')
+        cls.lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        cls.start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        cls.end = cls.start + timedelta(hours=1)
+
+    def setUp(self):
+        cache.clear()
+        self.booking = Booking.objects.create(
+            user=self.owner, resource=self.lab, start_time=self.start, end_time=self.end, status='Approved'
+        )
+
+    def _slot(self, resource=None, quantity=1):
+        return {
+            'resource': (resource or self.lab).pk,
+            'start_time': timezone.localtime(self.start).strftime('%Y-%m-%dT%H:%M'),
+            'end_time': timezone.localtime(self.end).strftime('%Y-%m-%dT%H:%M'),
+            'quantity': quantity,
+        }
+
+    def test_taken_slot_offers_and_joins_waitlist(self):
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('create_booking'), self._slot())
+        self.assertContains(response, 'Join the waitlist')
+
+        self.client.post(reverse('join_waitlist'), self._slot())
+        self.client.post(reverse('join_waitlist'), self._slot())
+        self.assertEqual(WaitlistEntry.objects.filter(user=self.student, status='Waiting').count(), 1)
+
+    def test_cancellation_promotes_oldest_waiting_entry(self):
+        first = WaitlistEntry.objects.create(
+            user=self.student, resource=self.lab, start_time=self.start, end_time=self.end
+        )
+        second = WaitlistEntry.objects.create(
+            user=self.late, resource=self.lab, start_time=self.start, end_time=self.end
+        )
+        self.client.force_login(self.owner)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('cancel_booking', args=[self.booking.pk]))
+        waitlist_reads = [q for q in queries.captured_queries if 'FROM "resources_waitlistentry"' in q['sql']]
+        self.assertEqual(len(waitlist_reads), 1)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, 'Cancelled')
+        self.assertEqual((first.status, first.booking.status, first.booking.user), ('Promoted', 'Pending', self.student))
+        self.assertEqual(second.status, 'Waiting')
+        self.assertTrue(Notification.objects.filter(user=self.student, booking=first.booking).exists())
+        self.assertEqual(NotificationCounter.unread_for(self.student), 1)
+
+    def test_freed_pool_items_promote_every_entry_that_fits(self):
+        pool = Resource.objects.create(name='Projectors', category='Equipment', capacity=3)
+        lent = Booking.objects.create(
+            user=self.owner, resource=pool, start_time=self.start, end_time=self.end, quantity=3, status='Approved'
+        )
+        entries = [
+            WaitlistEntry.objects.create(
+                user=self.student, resource=pool, start_time=self.start, end_time=self.end, quantity=quantity
+            )
+            for quantity in (2, 2, 1)
+        ]
+
+        lent.delete()
+
+        statuses = [WaitlistEntry.objects.get(pk=entry.pk).status for entry in entries]
+        self.assertEqual(statuses, ['Promoted', 'Waiting', 'Promoted'])
+
+    def test_moving_an_approved_booking_keeps_a_still_taken_entry_waiting(self):
+        entry = WaitlistEntry.objects.create(
+            user=self.student, resource=self.lab, start_time=self.start, end_time=self.end
+        )
+        self.booking.start_time += timedelta(minutes=30)
+        self.booking.save()
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'Waiting')
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('seed_admin', password='pass', is_staff=True)
+        cls.lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        cls.hall = Resource.objects.create(name='Main Hall', category='Hall', capacity=300)
+        start = timezone.now() + timedelta(days=1)
+        Booking.objects.create(user=cls.admin, resource=cls.lab, start_time=start, end_time=start + timedelta(hours=1))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_catalog_rerenders_only_changed_cards(self):
+        self.client.get(reverse('catalog'))
+        # A queryset update neither bumps the catalog nor touches updated_at
+        Resource.objects.filter(pk=self.hall.pk).update(name='Renamed Hall')
+        self.lab.name = 'Drone Lab'
+        self.lab.save()
+
+        response = self.client.get(reverse('catalog'))
+        self.assertContains(response, 'Drone Lab')
+        self.assertContains(response, 'Main Hall')
+
+    def test_dashboard_fragments_skip_queries_until_bookings_change(self):
+        url = reverse('admin_dashboard')
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(url)
+        self.assertLess(len(warm.captured_queries), len(cold.captured_queries))
+
+        start = timezone.now() + timedelta(days=2)
+        latecomer = User.objects.create_user('latecomer', password='pass')
+        Booking.objects.create(
+            user=latecomer, resource=self.hall, start_time=start, end_time=start + timedelta(hours=1)
+        )
+        self.assertContains(self.client.get(url), 'latecomer')
+
+    def test_benchmark_templates_command(self):
+        out = StringIO()
+        call_command('benchmark_templates', renders=2, stdout=out)
+        self.assertIn('admin_dashboard.html', out.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        start = timezone.now() + timedelta(days=1)
+        booking = Booking.objects.create(
+            user=cls.student, resource=lab, start_time=start, end_time=start + timedelta(hours=1)
+        )
+        Notification.objects.bulk_create([
+            Notification(user=cls.student, booking=booking, message=f'Update {i}') for i in range(8)
+        ])
+        # Three pairs share a timestamp, so only the id breaks the tie
+        base = timezone.now()
+        for i, notification in enumerate(Notification.objects.order_by('pk')):
+            Notification.objects.filter(pk=notification.pk).update(created_at=base + timedelta(seconds=i // 2))
+        cls.newest_first = list(Notification.objects.order_by('-created_at', '-pk'))
+
+    def page(self, query='', descending=True):
+        request = RequestFactory().get(f'/notifications/{query}')
+        return paginate_keyset(Notification.objects.all(), request, per_page=3, descending=descending)
+
+    def test_cursor_round_trip(self):
+        notification = self.newest_first[0]
+        for direction in (NEXT, PREVIOUS):
+            self.assertEqual(
+                decode_cursor(encode_cursor(direction, notification)),
+                (direction, notification.created_at, notification.pk),
+            )
+
+    def test_walks_tied_rows_forwards_and_back(self):
+        for descending, expected in ((True, self.newest_first), (False, self.newest_first[::-1])):
+            pages = [self.page(descending=descending)]
+            self.assertFalse(pages[0].has_previous)
+            while pages[-1].has_next:
+                pages.append(self.page(pages[-1].next_url, descending))
+            self.assertEqual([n for page in pages for n in page], expected)
+            self.assertEqual([len(page) for page in pages], [3, 3, 2])
+
+            back = [pages[-1]]
+            while back[-1].has_previous:
+                back.append(self.page(back[-1].previous_url, descending))
+            self.assertEqual([list(page) for page in back], [list(page) for page in pages[::-1]])
+
+    def test_labels_follow_the_ordering(self):
+        newest_first, oldest_first = self.page(), self.page(descending=False)
+        self.assertEqual((newest_first.previous_label, newest_first.next_label), ('Newer', 'Older'))
+        self.assertEqual((oldest_first.previous_label, oldest_first.next_label), ('Older', 'Newer'))
+
+    def test_invalid_cursors_start_from_the_first_page(self):
+        first = list(self.page())
+        bad_direction = base64.urlsafe_b64encode(b'x|2024-01-01T00:00:00|1').decode()
+        for token in ['garbage!', 'bm9wZQ', bad_direction, '']:
+            self.assertIsNone(decode_cursor(token))
+            self.assertEqual(list(self.page(f'?cursor={token}')), first)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    class SmallPaginator(EstimatedCountPaginator):
+        exact_below = 3
+        max_count = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        student = User.objects.create_user('student', password='pass')
+        lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        start = timezone.now() + timedelta(days=1)
+        for i in range(6):
+            Booking.objects.create(
+                user=student,
+                resource=lab,
+                start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1),
+                status='Approved' if i % 2 else 'Pending',
+            )
+
+    def test_unfiltered_count_comes_from_table_statistics(self):
+        paginator = self.SmallPaginator(Booking.objects.all(), 2)
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        self.assertEqual(count, estimate_rows(Booking))
+        self.assertGreaterEqual(count, 6)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+
+    def test_filtered_count_is_exact_up_to_the_cap(self):
+        self.assertEqual(self.SmallPaginator(Booking.objects.filter(status='Approved'), 2).count, 3)
+        self.assertEqual(self.SmallPaginator(Booking.objects.filter(resource__capacity=20), 2).count, 4)
+
+    def test_small_or_empty_tables_are_counted_exactly(self):
+        self.assertIsNone(estimate_rows(WaitlistEntry))
+        self.assertEqual(self.SmallPaginator(WaitlistEntry.objects.all(), 2).count, 0)
+
+        class LargeThreshold(self.SmallPaginator):
+            exact_below = 100
+            max_count = 100
+
+        Booking.objects.filter(status='Pending').delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(LargeThreshold(Booking.objects.all(), 2).count, 3)
+        self.assertTrue(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+
+    def test_booking_changelist_with_date_filter(self):
+        admin = User.objects.create_user('admin', password='pass', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:resources_booking_changelist'),
+            {'start_time__gte': timezone.localdate().isoformat(), 'status__exact': 'Approved'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+
+class BookingEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        cls.start = timezone.now() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, hours=0, status='Pending'):
+        return Booking.objects.create(
+            user=self.student,
+            resource=self.lab,
+            start_time=self.start + timedelta(hours=hours),
+            end_time=self.start + timedelta(hours=hours + 1),
+            status=status,
+        )
+
+    def history(self, booking):
+        return list(booking.events.order_by('id').values_list('previous', 'code', 'note'))
+
+    def test_review_views_record_each_status_change(self):
+        approved, rejected = self.book(), self.book(hours=2)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('approve_booking', args=[approved.pk]))
+        self.client.post(reverse('reject_booking', args=[rejected.pk]), {'reason': 'Maintenance'})
+
+        Code = BookingEvent.Code
+        self.assertEqual(self.history(approved), [(None, Code.PENDING, ''), (Code.PENDING, Code.APPROVED, '')])
+        self.assertEqual(
+            self.history(rejected), [(None, Code.PENDING, ''), (Code.PENDING, Code.REJECTED, 'Maintenance')]
+        )
+
+        response = self.client.get(reverse('booking_detail', args=[rejected.pk]))
+        self.assertContains(response, 'Maintenance')
+        self.assertEqual([event.code for event in response.context['history']], [Code.REJECTED, Code.PENDING])
+
+    def test_bulk_update_records_one_event_per_row(self):
+        bookings = [self.book(hours=2 * i) for i in range(3)]
+        Booking.objects.filter(pk__in=[b.pk for b in bookings[:2]]).update(status='Expired')
+        Booking.objects.filter(pk=bookings[2].pk).update(status='Pending', quantity=2)
+
+        self.assertEqual(BookingEvent.objects.filter(code=BookingEvent.Code.EXPIRED).count(), 2)
+        self.assertEqual(len(self.history(bookings[2])), 1)
+
+    def test_history_outlives_the_booking(self):
+        booking = self.book(status='Approved')
+        booking_id = booking.pk
+        booking.delete()
+        codes = list(
+            BookingEvent.objects.filter(booking_id=booking_id).order_by('id').values_list('previous', 'code')
+        )
+        self.assertEqual(codes, [(None, BookingEvent.Code.APPROVED), (BookingEvent.Code.APPROVED, BookingEvent.Code.DELETED)])
+
+    def test_events_cannot_be_changed(self):
+        event = self.book().events.get()
+        event.note = 'tampered'
+        with self.assertRaises(ValueError):
+            event.save()
+        with self.assertRaises(ValueError):
+            event.delete()
+
+    def test_resource_timeline_pages_by_id(self):
+        for i in range(5):
+            self.book(hours=2 * i)
+        first, before = BookingEvent.timeline(resource=self.lab, limit=3)
+        rest, last = BookingEvent.timeline(resource=self.lab, before=before, limit=3)
+        ids = [event.id for event in first + rest]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(last)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('resource_history', args=[self.lab.pk]), {'before': before})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['events']), rest)
+
+
+class BookingTriggerTests(TestCase):
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('The booking history triggers exist on SQLite and PostgreSQL only.')
+
+    def test_check_passes_with_the_migrated_triggers(self):
+        self.assertEqual(check_triggers(databases=['default']), [])
+
+    def test_check_reports_a_dropped_trigger(self):
+        # What SQLite does silently when a migration rebuilds resources_booking
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER resources_booking_event_update' + (
+                ' ON resources_booking' if connection.vendor == 'postgresql' else ''
+            ))
+        errors = check_triggers(databases=['default'])
+        self.assertEqual([error.id for error in errors], ['resources.E001'])
+        self.assertIn('resources_booking_event_update', errors[0].msg)
+
+    def test_check_reports_triggers_built_from_other_status_codes(self):
+        with mock.patch.dict(BookingEvent.STATUS_CODES, {'Expired': BookingEvent.Code.CANCELLED}):
+            self.assertEqual([error.id for error in check_triggers(databases=['default'])], ['resources.E001'])
+
+
+class AvailabilityPropertyTests(TestCase):
+    """
+    Random booking sets checked against a brute-force oracle.
+
+    Times are whole steps on a 15-minute grid, so bookings often touch or
+    share endpoints, and the oracle can simply probe every step. Each case
+    is seeded by its number; a failing subTest names the seed to replay.
+    """
+
+    STEP = timedelta(minutes=15)
+    CASES = 300
+    DB_CASES = 25
+    POOL_CAPACITY = 4
+    STATUSES = ['Approved'] * 4 + ['Pending', 'Rejected', 'Expired', 'Cancelled']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='pass')
+        cls.origin = (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def random_bookings(self, rng, horizon, count):
+        """``(start, end, status, quantity)`` tuples in grid steps."""
+        bookings = []
+        for _ in range(count):
+            start = rng.randrange(horizon)
+            bookings.append((start, start + rng.randint(1, 12), rng.choice(self.STATUSES), rng.randint(1, 2)))
+        return bookings
+
+    def random_window(self, rng, horizon):
+        start = rng.randrange(horizon)
+        return start, start + rng.randint(1, 8)
+
+    # The oracle: no sorting, no sweeping, just every step
+
+    def approved(self, bookings):
+        return [b for b in bookings if b[2] == 'Approved']
+
+    def oracle_load(self, bookings, step):
+        return sum(b[3] for b in self.approved(bookings) if b[0] <= step < b[1])
+
+    def oracle_peak(self, bookings, start, end):
+        return max(self.oracle_load(bookings, step) for step in range(start, end))
+
+    def oracle_busy_steps(self, bookings, limit=0):
+        return {
+            step for b in bookings for step in range(b[0], b[1])
+            if self.oracle_load(bookings, step) > limit
+        }
+
+    def steps(self, intervals):
+        return {step for start, end in intervals for step in range(start, end)}
+
+    def at(self, step):
+        return self.origin + self.STEP * step
+
+    # Pure interval helpers
+
+    def test_merge_intervals(self):
+        for seed in range(self.CASES):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                intervals = [(b[0], b[1]) for b in self.random_bookings(rng, 40, rng.randint(0, 15))]
+                merged = merge_intervals(intervals)
+                self.assertEqual(self.steps(merged), self.steps(intervals))
+                for (_, end), (start, _) in zip(merged, merged[1:]):
+                    self.assertLess(end, start)
+
+    def test_find_conflicts(self):
+        for seed in range(self.CASES):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                busy = [(b[0], b[1]) for b in self.random_bookings(rng, 40, rng.randint(0, 15))]
+                requested = [self.random_window(rng, 40) for _ in range(10)]
+                found = [interval for interval, _ in find_conflicts(requested, merge_intervals(busy))]
+                expected = [r for r in requested if self.steps([r]) & self.steps(busy)]
+                self.assertEqual(found, expected)
+
+    def test_usage_profile(self):
+        for seed in range(self.CASES):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                bookings = self.random_bookings(rng, 40, rng.randint(0, 20))
+                profile = UsageProfile([(b[0], b[1], b[3]) for b in self.approved(bookings)])
+                for _ in range(10):
+                    start, end = self.random_window(rng, 40)
+                    self.assertEqual(profile.peak(start, end), self.oracle_peak(bookings, start, end))
+                limit = rng.randint(0, 3)
+                self.assertEqual(
+                    self.steps(profile.busy_intervals(limit)),
+                    self.oracle_busy_steps(self.approved(bookings), limit),
+                )
+
+    def test_free_gaps(self):
+        for seed in range(self.CASES):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                busy = [(b[0], b[1]) for b in self.random_bookings(rng, 40, rng.randint(0, 10))]
+                start, end = sorted(rng.sample(range(50), 2))
+                duration = rng.randint(1, 6)
+                # Maximal free runs of steps in [start, end), kept if long enough
+                runs = []
+                taken = self.steps(busy)
+                for step in range(start, end):
+                    if step in taken:
+                        continue
+                    if runs and runs[-1][1] == step:
+                        runs[-1][1] = step + 1
+                    else:
+                        runs.append([step, step + 1])
+                expected = [(a, b) for a, b in runs if b - a >= duration]
+                self.assertEqual(free_gaps(merge_intervals(busy), start, end, duration), expected)
+
+    # The database queries behind the booking forms
+
+    def create_bookings(self, rng, resource, horizon, count):
+        bookings = self.random_bookings(rng, horizon, count)
+        if not resource.is_pooled:
+            bookings = [(start, end, status, 1) for start, end, status, _ in bookings]
+        rows = Booking.objects.bulk_create([
+            Booking(
+                user=self.student, resource=resource, start_time=self.at(start), end_time=self.at(end),
+                status=status, quantity=quantity,
+            )
+            for start, end, status, quantity in bookings
+        ])
+        return bookings, rows
+
+    def raises(self, resource, window, quantity):
+        try:
+            resource.check_availability(*window, quantity=quantity)
+        except ValidationError:
+            return True
+        return False
+
+    def test_resource_checks_match_oracle(self):
+        for seed in range(self.DB_CASES):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                lab = Resource.objects.create(name=f'Lab {seed}', category='Lab', capacity=20)
+                pool = Resource.objects.create(name=f'Pool {seed}', category='Equipment', capacity=self.POOL_CAPACITY)
+                lab_bookings, _ = self.create_bookings(rng, lab, 60, rng.randint(0, 12))
+                pool_bookings, pool_rows = self.create_bookings(rng, pool, 60, rng.randint(0, 25))
+                for _ in range(8):
+                    start, end = self.random_window(rng, 60)
+                    window = (self.at(start), self.at(end))
+
+                    free = not self.steps([(start, end)]) & self.steps(
+                        [(b[0], b[1]) for b in self.approved(lab_bookings)]
+                    )
+                    self.assertEqual(lab.is_available(*window), free)
+                    self.assertEqual(self.raises(lab, window, 1), not free)
+
+                    peak = self.oracle_peak(pool_bookings, start, end)
+                    self.assertEqual(pool.peak_usage(*window), peak)
+                    quantity = rng.randint(1, self.POOL_CAPACITY)
+                    self.assertEqual(pool.is_available(*window, quantity=quantity), peak + quantity <= self.POOL_CAPACITY)
+                    self.assertEqual(self.raises(pool, window, quantity), peak + quantity > self.POOL_CAPACITY)
+
+                    # Re-checking an existing booking leaves it out
+                    if pool_rows:
+                        index = rng.randrange(len(pool_rows))
+                        others = pool_bookings[:index] + pool_bookings[index + 1:]
+                        self.assertEqual(
+                            pool.peak_usage(*window, exclude_booking=pool_rows[index]),
+                            self.oracle_peak(others, start, end),
+                        )
+
+    def test_series_conflicts_match_oracle(self):
+        day = 24 * 4
+        for seed in range(self.DB_CASES):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                resource = Resource.objects.create(
+                    name=f'Resource {seed}', category=rng.choice(['Lab', 'Equipment']), capacity=self.POOL_CAPACITY
+                )
+                bookings, _ = self.create_bookings(rng, resource, 4 * day, rng.randint(5, 60))
+                start, end = self.random_window(rng, day)
+                series = BookingSeries(
+                    user=self.student,
+                    resource=resource,
+                    start_time=self.at(start),
+                    end_time=self.at(end),
+                    quantity=rng.randint(1, self.POOL_CAPACITY) if resource.is_pooled else 1,
+                    frequency='DAILY',
+                    count=4,
+                )
+                occurrences = series.occurrences()
+                expected = [
+                    (first, last) for first, last in occurrences
+                    if self.oracle_peak(
+                        bookings, (first - self.origin) // self.STEP, (last - self.origin) // self.STEP
+                    ) + series.quantity > (self.POOL_CAPACITY if resource.is_pooled else 1)
+                ]
+                self.assertEqual(series.find_conflicts(occurrences), expected)
+
+    def test_overlap_query_is_an_index_range_scan(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Reads the SQLite query plan.')
+        lab = Resource.objects.create(name='Robotics Lab', category='Lab', capacity=20)
+        sql, params = lab.approved_overlapping(self.origin, self.at(4)).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('booking_overlap_idx (resource_id=? AND status=? AND end_time>?)', plan)
+
+    def test_benchmark_agrees_with_oracle_and_scales(self):
+        out = StringIO()
+        call_command('benchmark_availability', sizes=[10, 2000], checks=50, stdout=out)
+        for series in ('history', 'schedule'):
+            self.assertRegex(out.getvalue(), rf'{series} +2000 Equipment')
+
+    def test_benchmark_fails_past_the_growth_limit(self):
+        # No measurement can be 0x the baseline, so this always trips the gate
+        with self.assertRaisesMessage(CommandError, 'slower at 200 bookings than at 10'):
+            call_command('benchmark_availability', sizes=[10, 200], checks=5, max_growth=0, stdout=StringIO())
@@ -0,0 +1,202 @@
+"""
+Database triggers that write the ``BookingEvent`` log.
+
+The SQL is generated from ``BookingEvent.STATUS_CODES``, so the codes the
+triggers store cannot drift from the model. Migration 0013 installs the
+triggers. SQLite silently drops a table's triggers whenever a migration
+rebuilds that table, and most AlterField/RemoveField operations on
+``resources_booking`` do. Such a migration must end with
+``RunPython(install_triggers, uninstall_triggers)``. The ``resources.E001``
+system check (tagged ``database``, so ``migrate`` and the test runner run it)
+reports missing or outdated triggers once every migration is applied.
+"""
+import re
+
+from django.core import checks
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+TABLE = 'resources_booking'
+TRIGGERS = ['resources_booking_event_insert', 'resources_booking_event_update', 'resources_booking_event_delete']
+FUNCTION = 'resources_booking_event'
+INSTALLED_BY = ('resources', '0013_booking_event')
+
+COLUMNS = 'booking_id, resource_id, code, previous, note, created_at'
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _codes():
+    from .models import BookingEvent
+    return BookingEvent.STATUS_CODES, BookingEvent.Code.DELETED
+
+
+def status_code(column):
+    """SQL mapping a ``Booking.status`` column to its event code (0 for an unknown status)."""
+    codes, _ = _codes()
+    whens = ' '.join(f"WHEN '{status}' THEN {int(code)}" for status, code in codes.items())
+    return f'CASE {column} {whens} ELSE 0 END'
+
+
+def _note(row):
+    return f"CASE WHEN {row}.status = 'Rejected' THEN {row}.rejection_reason ELSE '' END"
+
+
+def backfill_sql():
+    """One event per existing booking, for a log started on a table that already has rows."""
+    return f"""
+    INSERT INTO resources_bookingevent ({COLUMNS})
+    SELECT id, resource_id, {status_code('status')}, NULL, {_note(TABLE)}, updated_at
+    FROM {TABLE} ORDER BY id
+    """
+
+
+def _sqlite_triggers():
+    _, deleted = _codes()
+    return {
+        'resources_booking_event_insert': f"""
+            CREATE TRIGGER resources_booking_event_insert AFTER INSERT ON {TABLE}
+            BEGIN
+                INSERT INTO resources_bookingevent ({COLUMNS})
+                VALUES (NEW.id, NEW.resource_id, {status_code('NEW.status')}, NULL, {_note('NEW')}, {SQLITE_NOW});
+            END
+        """,
+        'resources_booking_event_update': f"""
+            CREATE TRIGGER resources_booking_event_update AFTER UPDATE OF status ON {TABLE}
+            WHEN NEW.status IS NOT OLD.status
+            BEGIN
+                INSERT INTO resources_bookingevent ({COLUMNS})
+                VALUES (NEW.id, NEW.resource_id, {status_code('NEW.status')}, {status_code('OLD.status')},
+                        {_note('NEW')}, {SQLITE_NOW});
+            END
+        """,
+        'resources_booking_event_delete': f"""
+            CREATE TRIGGER resources_booking_event_delete AFTER DELETE ON {TABLE}
+            BEGIN
+                INSERT INTO resources_bookingevent ({COLUMNS})
+                VALUES (OLD.id, OLD.resource_id, {int(deleted)}, {status_code('OLD.status')}, '', {SQLITE_NOW});
+            END
+        """,
+    }
+
+
+def _postgresql_function_body():
+    _, deleted = _codes()
+    return f"""
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO resources_bookingevent ({COLUMNS})
+            VALUES (NEW.id, NEW.resource_id, {status_code('NEW.status')}, NULL, {_note('NEW')}, now());
+        ELSIF TG_OP = 'UPDATE' THEN
+            INSERT INTO resources_bookingevent ({COLUMNS})
+            VALUES (NEW.id, NEW.resource_id, {status_code('NEW.status')}, {status_code('OLD.status')},
+                    {_note('NEW')}, now());
+        ELSE
+            INSERT INTO resources_bookingevent ({COLUMNS})
+            VALUES (OLD.id, OLD.resource_id, {int(deleted)}, {status_code('OLD.status')}, '', now());
+        END IF;
+        RETURN NULL;
+    END
+    """
+
+
+def _postgresql_statements():
+    return [
+        f'CREATE OR REPLACE FUNCTION {FUNCTION}() RETURNS trigger AS $${_postgresql_function_body()}$$ '
+        f'LANGUAGE plpgsql',
+        f"""
+        CREATE TRIGGER resources_booking_event_insert AFTER INSERT ON {TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {FUNCTION}()
+        """,
+        f"""
+        CREATE TRIGGER resources_booking_event_update AFTER UPDATE OF status ON {TABLE}
+        FOR EACH ROW WHEN (NEW.status IS DISTINCT FROM OLD.status) EXECUTE FUNCTION {FUNCTION}()
+        """,
+        f"""
+        CREATE TRIGGER resources_booking_event_delete AFTER DELETE ON {TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {FUNCTION}()
+        """,
+    ]
+
+
+def _drop_statements(vendor):
+    if vendor == 'sqlite':
+        return [f'DROP TRIGGER IF EXISTS {name}' for name in TRIGGERS]
+    if vendor == 'postgresql':
+        return [f'DROP TRIGGER IF EXISTS {name} ON {TABLE}' for name in TRIGGERS] + [
+            f'DROP FUNCTION IF EXISTS {FUNCTION}()'
+        ]
+    return []
+
+
+def install_triggers(apps, schema_editor):
+    """(Re)create the triggers; a ``RunPython`` forward function."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = list(_sqlite_triggers().values())
+    elif vendor == 'postgresql':
+        statements = _postgresql_statements()
+    else:
+        return
+    for statement in _drop_statements(vendor) + statements:
+        schema_editor.execute(statement)
+
+
+def uninstall_triggers(apps, schema_editor):
+    for statement in _drop_statements(schema_editor.connection.vendor):
+        schema_editor.execute(statement)
+
+
+def _normalize(sql):
+    return re.sub(r'\s+', ' ', sql or '').strip()
+
+
+def trigger_problems(connection):
+    """Names of triggers (or the trigger function) that are missing or differ from the generated SQL."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [TABLE])
+            installed = {name: _normalize(sql) for name, sql in cursor.fetchall()}
+            return [
+                name for name, sql in _sqlite_triggers().items()
+                if installed.get(name) != _normalize(sql)
+            ]
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT tgname FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal', [TABLE]
+            )
+            installed = {row[0] for row in cursor.fetchall()}
+            cursor.execute('SELECT prosrc FROM pg_proc WHERE proname = %s', [FUNCTION])
+            row = cursor.fetchone()
+            problems = [name for name in TRIGGERS if name not in installed]
+            if not row or _normalize(row[0]) != _normalize(_postgresql_function_body()):
+                problems.append(f'{FUNCTION}()')
+            return problems
+    return []
+
+
+@checks.register(checks.Tags.database)
+def check_triggers(databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            continue
+        executor = MigrationExecutor(connection)
+        # Nothing to check before 0013 has installed them, or while migrations
+        # are pending (one of them may be the one that reinstalls them)
+        if INSTALLED_BY not in executor.loader.applied_migrations:
+            continue
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            continue
+        problems = trigger_problems(connection)
+        if problems:
+            errors.append(checks.Error(
+                f"Booking history triggers are missing or outdated on database '{alias}': "
+                f"{', '.join(problems)}. Booking status changes are not being logged.",
+                hint='A migration that rebuilt resources_booking or changed BookingEvent.STATUS_CODES must '
+                     'end with RunPython(resources.triggers.install_triggers, '
+                     'resources.triggers.uninstall_triggers).',
+                id='resources.E001',
+            ))
+    return errors
@@ -5,10 +5,22 @@ urlpatterns = [
     path('', views.resource_catalog, name='catalog'),
     path('resource/<int:pk>/', views.resource_detail, name='resource_detail'),
     path('booking/create/', views.create_booking, name='create_booking'),
+    path('booking/recurring/', views.create_series, name='create_series'),
+    path('booking/find-slot/', views.find_free_slots, name='find_slots'),
     path('booking/<int:pk>/', views.booking_detail, name='booking_detail'),
+    path('booking/<int:pk>/cancel/', views.cancel_booking, name='cancel_booking'),
+    path('waitlist/join/', views.join_waitlist, name='join_waitlist'),
+    path('waitlist/<int:pk>/leave/', views.leave_waitlist, name='leave_waitlist'),
+    path('resource/<int:pk>/calendar.ics', views.resource_ical, name='resource_ical'),
     path('my-bookings/', views.my_bookings, name='my_bookings'),
+    path('my-bookings/calendar.ics', views.my_bookings_ical, name='my_bookings_ical'),
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('dashboard/export/bookings.csv', views.export_bookings_csv, name='export_bookings_csv'),
+    path('dashboard/resource/<int:pk>/history/', views.resource_history, name='resource_history'),
     path('dashboard/booking/<int:pk>/approve/', views.approve_booking, name='approve_booking'),
     path('dashboard/booking/<int:pk>/reject/', views.reject_booking, name='reject_booking'),
+    path('dashboard/series/<int:pk>/approve/', views.approve_series, name='approve_series'),
+    path('dashboard/series/<int:pk>/reject/', views.reject_series, name='reject_series'),
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
 ]
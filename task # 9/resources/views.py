@@ -1,11 +1,30 @@
+import asyncio
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_POST
 from django import forms
-from .models import Resource, Booking, Notification
-from .forms import BookingForm, ResourceFilterForm
+from django.core.exceptions import ValidationError
+from . import analytics, events
+from .cache import BOOKINGS, CATALOG, amake_key, get_version, make_key, render_fragments, resource_namespace
+from .exports import stream_csv, stream_ical
+from .models import Resource, Booking, BookingEvent, BookingSeries, Notification, NotificationCounter, WaitlistEntry
+from .forms import BookingForm, BookingSeriesForm, ResourceFilterForm, SlotFinderForm, WaitlistForm
+from .pagination import apaginate_keyset, paginate_keyset
+from .search import SEARCH_RESULT_LIMIT, search_resources
+from .slots import find_slots
 
 
 def is_admin(user):
@@ -13,42 +32,119 @@ def is_admin(user):
     return user.is_staff or user.is_superuser
 
 
+async def _auser(request):
+    """
+    Load the user in an async view and share it with the sync templates.
+    
+    ``request.auser()`` and ``request.user`` cache separately, so without this
+    context processors would load the user a second time.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
 @login_required
-def resource_catalog(request):
+async def resource_catalog(request):
     """Display searchable catalog of resources."""
+    await _auser(request)
     form = ResourceFilterForm(request.GET)
-    resources = Resource.objects.all()
+    category = search = ''
     
     if form.is_valid():
-        category = form.cleaned_data.get('category')
-        search = form.cleaned_data.get('search')
-        
-        if category:
-            resources = resources.filter(category=category)
-        
-        if search:
-            resources = resources.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+        category = form.cleaned_data.get('category') or ''
+        search = (form.cleaned_data.get('search') or '').strip().lower()
+    
+    # Results and rendered cards are cached per filter combination under the
+    # catalog version, which any Resource change bumps. After a bump each
+    # card is still reused from its own fragment unless that resource changed.
+    cards_key = await amake_key(CATALOG, 'cards', category, search)
+    resource_cards = await cache.aget(cards_key)
+    if resource_cards is None:
+        results_key = await amake_key(CATALOG, 'results', category, search)
+        results = await cache.aget(results_key)
+        if results is None:
+            results = await _catalog_results(category, search)
+            await cache.aset(results_key, results, settings.CATALOG_CACHE_TIMEOUT)
+        resource_cards = await sync_to_async(_render_cards)(*results)
+        await cache.aset(cards_key, resource_cards, settings.CATALOG_CACHE_TIMEOUT)
     
     context = {
-        'resources': resources,
+        'resource_cards': resource_cards,
         'form': form,
     }
-    return render(request, 'resources/catalog.html', context)
+    # Templates and context processors are sync code
+    return await sync_to_async(render)(request, 'resources/catalog.html', context)
+
+
+def _render_cards(resources, truncated=False):
+    cards = render_fragments(
+        'resources/includes/resource_card.html',
+        'resource',
+        resources,
+        version=lambda resource: f'{resource.pk}:{resource.updated_at.timestamp()}',
+        timeout=settings.CATALOG_CACHE_TIMEOUT,
+    )
+    return render_to_string(
+        'resources/includes/resource_cards.html',
+        {'cards': cards, 'truncated': truncated, 'limit': SEARCH_RESULT_LIMIT},
+    )
+
+
+async def _catalog_results(category, search):
+    """The resources to list, and whether a search matched more than it lists."""
+    if search:
+        # Ranked full-text search, best matches first; the FTS lookup is raw SQL.
+        # One result past the cap tells the page there are more.
+        resources = await sync_to_async(search_resources)(
+            search, category=category, limit=SEARCH_RESULT_LIMIT + 1
+        )
+        resources = [resource async for resource in resources]
+        return resources[:SEARCH_RESULT_LIMIT], len(resources) > SEARCH_RESULT_LIMIT
+    resources = Resource.objects.all()
+    if category:
+        resources = resources.filter(category=category)
+    return [resource async for resource in resources], False
+
+
+def _resource_detail_data(pk):
+    """
+    The resource, its next approved bookings and its booking total.
+    
+    Cached under the resource's version, which booking changes bump. The
+    entry also expires when the first upcoming booking starts, since it then
+    drops off the list.
+    """
+    key = make_key(resource_namespace(pk), 'detail')
+    detail = cache.get(key)
+    if detail is None:
+        resource = get_object_or_404(Resource, pk=pk)
+        now = timezone.now()
+        
+        # Get upcoming approved bookings for this resource
+        upcoming_bookings = list(Booking.objects.filter(
+            resource=resource,
+            status='Approved',
+            start_time__gte=now
+        ).select_related('user').order_by('start_time')[:10])
+        
+        detail = {
+            'resource': resource,
+            'upcoming_bookings': upcoming_bookings,
+            'total_bookings': resource.bookings.count(),
+        }
+        timeout = settings.CATALOG_CACHE_TIMEOUT
+        if upcoming_bookings:
+            seconds_to_first = (upcoming_bookings[0].start_time - now).total_seconds()
+            timeout = max(1, min(timeout, math.ceil(seconds_to_first)))
+        cache.set(key, detail, timeout)
+    return detail
 
 
 @login_required
 def resource_detail(request, pk):
     """Display resource details and booking form."""
-    resource = get_object_or_404(Resource, pk=pk)
-    
-    # Get upcoming approved bookings for this resource
-    upcoming_bookings = Booking.objects.filter(
-        resource=resource,
-        status='Approved',
-        start_time__gte=timezone.now()
-    ).order_by('start_time')[:10]
+    detail = _resource_detail_data(pk)
+    resource = detail['resource']
     
     if request.method == 'POST':
         form = BookingForm(request.POST, user=request.user)
@@ -76,7 +172,8 @@ def resource_detail(request, pk):
     context = {
         'resource': resource,
         'form': form,
-        'upcoming_bookings': upcoming_bookings,
+        'upcoming_bookings': detail['upcoming_bookings'],
+        'total_bookings': detail['total_bookings'],
     }
     return render(request, 'resources/resource_detail.html', context)
 
@@ -111,43 +208,222 @@ def create_booking(request):
     return render(request, 'resources/create_booking.html', context)
 
 
+@login_required
+def find_free_slots(request):
+    """Search every resource of a category for free slots and offer them for one-click booking."""
+    results = None
+    form = SlotFinderForm(request.GET or None)
+    if form.is_valid():
+        data = form.cleaned_data
+        results = find_slots(
+            data['category'],
+            data['min_capacity'],
+            data['window_start'],
+            data['window_end'],
+            data['duration'],
+            order=data['order'],
+        )
+    
+    context = {
+        'form': form,
+        'results': results,
+    }
+    return render(request, 'resources/find_slots.html', context)
+
+
+@login_required
+def create_series(request):
+    """Create a recurring booking series."""
+    if request.method == 'POST':
+        form = BookingSeriesForm(request.POST, user=request.user)
+        if form.is_valid():
+            series = form.save()
+            first_booking = series.bookings.order_by('start_time').first()
+            occurrences = series.bookings.count()
+            Notification.objects.create(
+                user=request.user,
+                booking=first_booking,
+                message=f'Your recurring booking request for {series.resource.name} '
+                        f'({occurrences} occurrences) has been submitted and is pending approval.'
+            )
+            messages.success(
+                request,
+                f'Recurring booking submitted: {occurrences} occurrences are pending approval.'
+            )
+            return redirect('booking_detail', pk=first_booking.pk)
+    else:
+        form = BookingSeriesForm(user=request.user)
+    
+    context = {
+        'form': form,
+    }
+    return render(request, 'resources/create_series.html', context)
+
+
 @login_required
 def booking_detail(request, pk):
     """Display booking details."""
-    booking = get_object_or_404(Booking, pk=pk)
+    booking = get_object_or_404(Booking.objects.select_related('user', 'resource'), pk=pk)
     
     # Ensure user can only view their own bookings (unless admin)
     if not is_admin(request.user) and booking.user != request.user:
         messages.error(request, 'You do not have permission to view this booking.')
         return redirect('my_bookings')
     
+    history, _ = BookingEvent.timeline(booking=booking, limit=20)
     context = {
         'booking': booking,
+        'history': history,
     }
     return render(request, 'resources/booking_detail.html', context)
 
 
+@login_required
+@require_POST
+def cancel_booking(request, pk):
+    """Cancel one of the user's own upcoming bookings, offering the slot to the waitlist."""
+    booking = get_object_or_404(Booking.objects.select_related('resource'), pk=pk, user=request.user)
+    
+    if not booking.is_cancellable:
+        messages.error(request, 'Only upcoming pending or approved bookings can be cancelled.')
+        return redirect('booking_detail', pk=booking.pk)
+    
+    booking.status = 'Cancelled'
+    booking.save()
+    messages.success(request, 'Booking cancelled.')
+    return redirect('my_bookings')
+
+
+@login_required
+@require_POST
+def join_waitlist(request):
+    """Queue a request for a taken slot; it becomes a booking if the slot frees up."""
+    form = WaitlistForm(request.POST, user=request.user)
+    if form.is_valid():
+        entry = form.save()
+        messages.success(
+            request,
+            f'You are on the waitlist for {entry.resource.name}. We will notify you if the slot frees up.'
+        )
+        return redirect('my_bookings')
+    
+    messages.error(request, ' '.join(message for errors in form.errors.values() for message in errors))
+    resource = form.cleaned_data.get('resource')
+    if resource:
+        return redirect('resource_detail', pk=resource.pk)
+    return redirect('create_booking')
+
+
+@login_required
+@require_POST
+def leave_waitlist(request, pk):
+    """Withdraw one of the user's waitlist entries."""
+    WaitlistEntry.objects.filter(pk=pk, user=request.user, status='Waiting').update(status='Withdrawn')
+    messages.success(request, 'You have left the waitlist.')
+    return redirect('my_bookings')
+
+
 @login_required
 def my_bookings(request):
-    """Display user's bookings."""
-    bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
+    """Display user's bookings and the slots they are waitlisted for."""
+    bookings = paginate_keyset(
+        Booking.objects.filter(user=request.user).select_related('resource'), request
+    )
+    waitlist = WaitlistEntry.objects.filter(
+        user=request.user, status='Waiting', start_time__gt=timezone.now()
+    ).select_related('resource')
     
     context = {
         'bookings': bookings,
+        'waitlist': waitlist,
     }
     return render(request, 'resources/my_bookings.html', context)
 
 
+@login_required
+def my_bookings_ical(request):
+    """Download the user's pending and approved bookings as an iCalendar file."""
+    bookings = Booking.objects.filter(user=request.user, status__in=['Pending', 'Approved'])
+    return stream_ical(request, bookings, 'my-bookings.ics', f'{request.user.username} - campus bookings')
+
+
+@login_required
+def resource_ical(request, pk):
+    """Download a resource's approved bookings as an iCalendar file."""
+    resource = get_object_or_404(Resource, pk=pk)
+    bookings = Booking.objects.filter(resource=resource, status='Approved')
+    return stream_ical(request, bookings, f'resource-{resource.pk}.ics', resource.name)
+
+
+@login_required
+@user_passes_test(is_admin)
+def resource_history(request, pk):
+    """Every booking status change of a resource, newest first, paged by event id."""
+    resource = get_object_or_404(Resource, pk=pk)
+    before = request.GET.get('before', '')
+    events, next_before = BookingEvent.timeline(
+        resource=resource, before=int(before) if before.isdigit() else None
+    )
+    
+    context = {
+        'resource': resource,
+        'events': events,
+        'next_before': next_before,
+    }
+    return render(request, 'resources/resource_history.html', context)
+
+
+@login_required
+@user_passes_test(is_admin)
+def export_bookings_csv(request):
+    """Stream all bookings as CSV, optionally filtered by ?status= and a ?from=/?to= start date range."""
+    bookings = Booking.objects.all()
+    status = request.GET.get('status')
+    if status in dict(Booking.STATUS_CHOICES):
+        bookings = bookings.filter(status=status)
+    try:
+        date_from = parse_date(request.GET.get('from', ''))
+        date_to = parse_date(request.GET.get('to', ''))
+    except ValueError:
+        date_from = date_to = None
+    if date_from:
+        bookings = bookings.filter(start_time__date__gte=date_from)
+    if date_to:
+        bookings = bookings.filter(start_time__date__lte=date_to)
+    return stream_csv(request, bookings, f'bookings-{timezone.localdate():%Y%m%d}.csv')
+
+
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
     """Admin dashboard for managing bookings."""
-    pending_bookings = Booking.objects.filter(status='Pending').order_by('created_at')
-    recent_bookings = Booking.objects.all().order_by('-created_at')[:20]
+    # The tables and the utilization section are cached template fragments
+    # keyed by the booking and catalog versions. Their data is loaded lazily,
+    # so a fragment cache hit runs no queries for it at all.
+    pending_bookings = SimpleLazyObject(lambda: paginate_keyset(
+        # Oldest requests first, paged so a backlog never renders in one go
+        Booking.objects.filter(status='Pending').select_related('user', 'resource'),
+        request,
+        descending=False,
+    ))
+    recent_bookings = Booking.objects.select_related('user', 'resource').order_by('-created_at')[:20]
+    
+    try:
+        window = int(request.GET.get('window', analytics.DEFAULT_WINDOW))
+    except ValueError:
+        window = analytics.DEFAULT_WINDOW
+    if window not in analytics.WINDOWS:
+        window = analytics.DEFAULT_WINDOW
     
     context = {
         'pending_bookings': pending_bookings,
         'recent_bookings': recent_bookings,
+        'utilization': SimpleLazyObject(lambda: analytics.utilization(window)),
+        'window': window,
+        'windows': analytics.WINDOWS,
+        'fragment_version': f'{get_version(BOOKINGS)}.{get_version(CATALOG)}',
+        'fragment_timeout': settings.DASHBOARD_CACHE_TIMEOUT,
+        'today': timezone.localdate(),
     }
     return render(request, 'resources/admin_dashboard.html', context)
 
@@ -156,7 +432,7 @@ def admin_dashboard(request):
 @user_passes_test(is_admin)
 def approve_booking(request, pk):
     """Approve a booking."""
-    booking = get_object_or_404(Booking, pk=pk)
+    booking = get_object_or_404(Booking.objects.select_related('user', 'resource'), pk=pk)
     
     if booking.status != 'Pending':
         messages.error(request, 'Only pending bookings can be approved.')
@@ -185,7 +461,7 @@ def approve_booking(request, pk):
 @user_passes_test(is_admin)
 def reject_booking(request, pk):
     """Reject a booking."""
-    booking = get_object_or_404(Booking, pk=pk)
+    booking = get_object_or_404(Booking.objects.select_related('user', 'resource'), pk=pk)
     
     if booking.status != 'Pending':
         messages.error(request, 'Only pending bookings can be rejected.')
@@ -214,22 +490,132 @@ def reject_booking(request, pk):
 
 
 @login_required
-def notifications(request):
-    """Display user notifications."""
-    notifications_list = Notification.objects.filter(user=request.user).order_by('-created_at')
-    unread_count = notifications_list.filter(is_read=False).count()
+@user_passes_test(is_admin)
+def approve_series(request, pk):
+    """Approve every pending occurrence of a recurring booking at once."""
+    series = get_object_or_404(BookingSeries.objects.select_related('resource'), pk=pk)
+    
+    try:
+        approved = series.approve()
+    except ValidationError as e:
+        messages.error(request, f'Error approving series: {" ".join(e.messages)}')
+    else:
+        if approved:
+            messages.success(request, f'{approved} booking(s) in the series approved.')
+        else:
+            messages.error(request, 'This series has no pending bookings.')
+    
+    return redirect('admin_dashboard')
+
+
+@login_required
+@user_passes_test(is_admin)
+def reject_series(request, pk):
+    """Reject every pending occurrence of a recurring booking at once."""
+    series = get_object_or_404(BookingSeries.objects.select_related('user', 'resource'), pk=pk)
+    pending = series.bookings.filter(status='Pending').order_by('start_time')
+    first_pending = pending.first()
+    
+    if first_pending is None:
+        messages.error(request, 'This series has no pending bookings.')
+        return redirect('admin_dashboard')
+    
+    if request.method == 'POST':
+        rejected = series.reject(request.POST.get('reason', ''))
+        messages.success(request, f'{rejected} booking(s) in the series rejected.')
+        return redirect('admin_dashboard')
+    
+    context = {
+        'booking': first_pending,
+        'series': series,
+        'pending_count': pending.count(),
+    }
+    return render(request, 'resources/reject_booking.html', context)
+
+
+@login_required
+async def notifications(request):
+    """Display user notifications, optionally unread only, and apply bulk read/delete actions."""
+    user = await _auser(request)
     
-    # Mark as read when viewing
     if request.method == 'POST':
-        notification_id = request.POST.get('notification_id')
-        if notification_id:
-            notification = get_object_or_404(Notification, pk=notification_id, user=request.user)
-            notification.is_read = True
-            notification.save()
-            return redirect('notifications')
+        action = request.POST.get('action', 'mark_read')
+        if action == 'mark_all_read':
+            up_to = request.POST.get('up_to', '')
+            updated = await sync_to_async(Notification.mark_read_for)(
+                user.pk, up_to_id=int(up_to) if up_to.isdigit() else None
+            )
+            messages.success(request, f'Marked {updated} notification(s) as read.')
+        elif action == 'delete_read':
+            deleted = await sync_to_async(Notification.delete_read_for)(user.pk)
+            messages.success(request, f'Deleted {deleted} read notification(s).')
+        elif request.POST.get('notification_id', '').isdigit():
+            await sync_to_async(Notification.mark_read_for)(user.pk, pks=[int(request.POST['notification_id'])])
+        return redirect(request.get_full_path())
     
+    unread_only = request.GET.get('filter') == 'unread'
+    notifications = Notification.objects.filter(user=user)
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
+    notifications_list = await apaginate_keyset(notifications.select_related('booking__resource'), request)
+    # "Mark all as read" stops at the newest notification the user has seen,
+    # so anything arriving later stays unread. The first page starts with it
+    # and its pager links pass it on as ?seen=.
+    seen = request.GET.get('seen', '')
+    if not notifications_list.has_previous:
+        newest_id = notifications_list.object_list[0].pk if notifications_list else None
+    elif seen.isdigit():
+        newest_id = int(seen)
+    else:
+        newest_id = await Notification.objects.filter(user=user).order_by('-pk').values_list(
+            'pk', flat=True
+        ).afirst()
+    if newest_id is not None:
+        notifications_list.keep_params(seen=newest_id)
     context = {
         'notifications': notifications_list,
-        'unread_count': unread_count,
+        'unread_count': await NotificationCounter.aunread_for(user),
+        'unread_only': unread_only,
+        'newest_id': newest_id,
     }
-    return render(request, 'resources/notifications.html', context)
+    return await sync_to_async(render)(request, 'resources/notifications.html', context)
+
+
+@login_required
+async def notification_stream(request):
+    """
+    Server-sent events with the user's new notifications and unread count.
+
+    The stream never ends, and under WSGI Django reads an async iterator to
+    the end before sending anything, so WSGI requests get 204 No Content
+    instead (EventSource does not reconnect after a 204).
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await _auser(request)
+    response = StreamingHttpResponse(_notification_events(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def _notification_events(user):
+    async with events.subscribe(events.user_channel(user.pk)) as subscription:
+        yield _sse('unread', {'count': await NotificationCounter.aunread_for(user)})
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscription.get(), settings.NOTIFICATION_STREAM_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if message['type'] == 'unread':
+                yield _sse('unread', {'count': await NotificationCounter.aunread_for(user)})
+            else:
+                yield _sse(message['type'], message)
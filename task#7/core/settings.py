@@ -131,3 +131,15 @@ STATIC_URL = "static/"
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Home timeline
+# Posts by accounts with at least this many followers are pulled into
+# followers' feeds at read time instead of being copied to each of them
+TIMELINE_FANOUT_LIMIT = 10000
+# Followers whose timelines the fan-out worker fills per statement
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Posts per page of the home feed and profile, comments per page of a post
+FEED_PAGE_SIZE = 20
+COMMENTS_PAGE_SIZE = 20
+# Newest comments shown under each post in a feed
+COMMENTS_PREVIEW = 3
@@ -4,6 +4,7 @@ from .models import UserProfile, Follow, Post, Comment, Like
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'followers_count', 'following_count')
+    readonly_fields = ('followers_count', 'following_count')
     search_fields = ('user__username',)
 
 @admin.register(Follow)
@@ -14,6 +15,7 @@ class FollowAdmin(admin.ModelAdmin):
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('owner', 'created_at', 'likes_count', 'comments_count')
+    readonly_fields = ('likes_count', 'comments_count')
     search_fields = ('owner__user__username', 'message')
     date_hierarchy = 'created_at'
 
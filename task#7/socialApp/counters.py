@@ -0,0 +1,94 @@
+"""
+Denormalized counters and their reconciliation.
+
+The views move ``Post.likes_count``/``comments_count`` and
+``UserProfile.followers_count``/``following_count`` with ``F()`` updates in
+the same transaction as the row they count, and count down with
+``decreased`` so a counter that already drifted low stops at zero. Removing
+an account cascades to its likes, comments and follows behind the views'
+back, so ``release`` (run on ``UserProfile`` pre_delete) takes them off the
+other rows' counters first. Anything else that goes around the views (admin
+deletes, raw SQL) leaves a counter off; ``reconcile`` recounts the rows a
+batch at a time and fixes the ones that drifted.
+"""
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Like, Post, UserProfile
+
+
+# (model, counter field, counted model, its foreign key to the model)
+COUNTERS = [
+    (Post, 'likes_count', Like, 'post'),
+    (Post, 'comments_count', Comment, 'post'),
+    (UserProfile, 'followers_count', Follow, 'following'),
+    (UserProfile, 'following_count', Follow, 'follower'),
+]
+
+
+def true_count(counted, foreign_key):
+    """Correlated subquery counting ``counted`` rows that point at the outer row."""
+    counts = (
+        counted.objects.filter(**{foreign_key: OuterRef('pk')})
+        .order_by()
+        .values(foreign_key)
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def decreased(field, by=1):
+    """``field - by``, stopping at zero instead of failing the column's ``>= 0`` check."""
+    return Case(When(**{f'{field}__lt': by}, then=Value(0)), default=F(field) - by)
+
+
+def release(profile):
+    """Take ``profile``'s likes, comments and follows off the counters of the rows they point at."""
+    likes = Like.objects.filter(liked_by=profile).values('post')
+    Post.objects.filter(pk__in=likes).exclude(owner=profile).update(likes_count=decreased('likes_count'))
+
+    comments = Comment.objects.filter(made_by=profile)
+    per_post = (
+        comments.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+    )
+    Post.objects.filter(pk__in=comments.values('post')).exclude(owner=profile).update(
+        comments_count=decreased('comments_count', Subquery(per_post))
+    )
+
+    following = Follow.objects.filter(follower=profile).values('following')
+    UserProfile.objects.filter(pk__in=following).update(followers_count=decreased('followers_count'))
+    followers = Follow.objects.filter(following=profile).values('follower')
+    UserProfile.objects.filter(pk__in=followers).update(following_count=decreased('following_count'))
+
+
+def reconcile(batch_size=1000, dry_run=False):
+    """
+    Recount every counter and fix the ones that drifted.
+
+    Rows are walked in primary key order, ``batch_size`` per query. Drifted
+    rows are fixed with one UPDATE per batch that recounts as it writes, so
+    a like or follow landing meanwhile is not overwritten. Returns
+    ``{'Post.likes_count': rows_fixed, ...}``; with ``dry_run`` nothing is
+    written and the rows that would be fixed are counted.
+    """
+    fixed = {}
+    for model, field, counted, foreign_key in COUNTERS:
+        drifted_total = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .annotate(actual=true_count(counted, foreign_key))
+                .values_list('pk', field, 'actual')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            drifted = [pk for pk, stored, actual in rows if stored != actual]
+            if drifted and not dry_run:
+                model.objects.filter(pk__in=drifted).update(**{field: true_count(counted, foreign_key)})
+            drifted_total += len(drifted)
+        fixed[f'{model.__name__}.{field}'] = drifted_total
+    return fixed
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from socialApp.timeline import fan_out
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy newly published posts into their authors' followers' home timelines. "
+        "Run it from cron or keep it running with --interval; until it runs, followers "
+        "do not see new posts from accounts they follow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TIMELINE_FANOUT_BATCH_SIZE,
+            help=f"Followers written per statement (default: {settings.TIMELINE_FANOUT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Poll for new posts every this many seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            written = fan_out(batch_size=options["batch_size"])
+            if written or not options["interval"]:
+                self.stdout.write(f"Wrote {written} timeline entries.")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
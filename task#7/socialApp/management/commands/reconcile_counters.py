@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from socialApp.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount likes, comments and follows and repair drifted counter columns "
+        "(Post.likes_count/comments_count, UserProfile.followers_count/following_count)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows recounted per query (default: 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted counters.",
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile(batch_size=options["batch_size"], dry_run=options["dry_run"])
+        verb = "would fix" if options["dry_run"] else "fixed"
+        for counter, rows in fixed.items():
+            self.stdout.write(f"{counter}: {verb} {rows} row(s)")
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_timelines(apps, schema_editor):
+    """Give every existing post an entry in its author's and followers' timelines."""
+    Follow = apps.get_model('socialApp', 'Follow')
+    Post = apps.get_model('socialApp', 'Post')
+    TimelineEntry = apps.get_model('socialApp', 'TimelineEntry')
+    followers = {}
+    for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id'):
+        followers.setdefault(following_id, []).append(follower_id)
+    entries = []
+    for post_id, owner_id, created_at in Post.objects.values_list('id', 'owner_id', 'created_at').iterator():
+        for profile_id in [owner_id, *followers.get(owner_id, [])]:
+            entries.append(TimelineEntry(profile_id=profile_id, post_id=post_id, created_at=created_at))
+        if len(entries) >= 1000:
+            TimelineEntry.objects.bulk_create(entries)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialApp', '0002_alter_comment_options_alter_post_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanoutTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cursor', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', 'follower'], name='follow_following_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['owner', 'created_at'], name='post_owner_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='fanouttask',
+            name='post',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fanout_task', to='socialApp.post'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='socialApp.post'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='profile',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='socialApp.userprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['profile', 'created_at', 'post'], name='timeline_profile_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('profile', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# (model, counter field, counted model, its foreign key to the model)
+COUNTERS = [
+    ('Post', 'like_count', 'Like', 'post'),
+    ('Post', 'comment_count', 'Comment', 'post'),
+    ('UserProfile', 'follower_count', 'Follow', 'following'),
+    ('UserProfile', 'following_count', 'Follow', 'follower'),
+]
+
+
+def backfill_counters(apps, schema_editor):
+    for model_name, field, counted_name, foreign_key in COUNTERS:
+        counted = apps.get_model('socialApp', counted_name)
+        counts = (
+            counted.objects.filter(**{foreign_key: OuterRef('pk')})
+            .order_by()
+            .values(foreign_key)
+            .annotate(n=Count('pk'))
+            .values('n')
+        )
+        apps.get_model('socialApp', model_name).objects.update(**{field: Coalesce(Subquery(counts), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialApp', '0004_paging_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
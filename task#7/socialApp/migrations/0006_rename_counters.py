@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialApp', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='post',
+            old_name='comment_count',
+            new_name='comments_count',
+        ),
+        migrations.RenameField(
+            model_name='post',
+            old_name='like_count',
+            new_name='likes_count',
+        ),
+        migrations.RenameField(
+            model_name='userprofile',
+            old_name='follower_count',
+            new_name='followers_count',
+        ),
+    ]
@@ -1,25 +1,26 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.core.exceptions import ValidationError
 
+from .pagination import encode_cursor
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Set once the account has TIMELINE_FANOUT_LIMIT followers: its posts are
+    # no longer copied into followers' timelines but pulled in when they read
+    fanout_on_read = models.BooleanField(default=False)
+    # Kept in step by the follow views; reconcile_counters repairs any drift
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.user.username
 
-    @property
-    def followers_count(self):
-        return self.followers.count()
-
-    @property
-    def following_count(self):
-        return self.following.count()
-
 
 class Follow(models.Model):
     follower = models.ForeignKey(
@@ -41,6 +42,10 @@ class Follow(models.Model):
                 name="unique_follow"
             )
         ]
+        indexes = [
+            # Fan-out walks an account's followers in follower order
+            models.Index(fields=["following", "follower"], name="follow_following_idx"),
+        ]
 
     def clean(self):
         if self.follower == self.following:
@@ -54,6 +59,29 @@ class Follow(models.Model):
         return f"{self.follower} follows {self.following}"
 
 
+class PostQuerySet(models.QuerySet):
+    def with_like_state(self, user=None):
+        """Annotate ``liked_by_me``: whether ``user`` likes each post."""
+        if user is not None and user.is_authenticated:
+            liked_by_me = Exists(Like.objects.filter(post=OuterRef('pk'), liked_by__user=user))
+        else:
+            liked_by_me = Value(False)
+        return self.annotate(liked_by_me=liked_by_me)
+
+    def for_feed(self, user=None):
+        """
+        Posts ready to render in a feed: like state, owners and comments in two queries.
+
+        Only the newest ``COMMENTS_PREVIEW`` comments of each post are
+        prefetched, as ``recent_comments``; older ones are paged in through
+        ``post_comments``.
+        """
+        comments = Comment.objects.select_related('made_by__user').order_by('-created_at', '-id')
+        return self.with_like_state(user).select_related('owner__user').prefetch_related(
+            Prefetch('comments', queryset=comments[:settings.COMMENTS_PREVIEW], to_attr='recent_comments')
+        )
+
+
 class Post(models.Model):
     owner = models.ForeignKey(
         UserProfile,
@@ -63,20 +91,25 @@ class Post(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Kept in step by the like and comment views; reconcile_counters repairs any drift
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Profile pages and read-time pulls, paged on (created_at, id)
+            models.Index(fields=['owner', 'created_at', 'id'], name='post_owner_created_idx'),
+        ]
 
     def __str__(self):
         return f"Post by {self.owner} - {self.created_at}"
 
     @property
-    def likes_count(self):
-        return self.likes.count()
-
-    @property
-    def comments_count(self):
-        return self.comments.count()
+    def cursor(self):
+        return encode_cursor(self.created_at, self.pk)
 
 
 class Comment(models.Model):
@@ -96,10 +129,17 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.made_by} on {self.post}"
 
+    @property
+    def cursor(self):
+        return encode_cursor(self.created_at, self.pk)
+
 
 class Like(models.Model):
     post = models.ForeignKey(
@@ -125,3 +165,52 @@ class Like(models.Model):
 
     def __str__(self):
         return f"{self.liked_by} likes {self.post}"
+
+
+class TimelineEntry(models.Model):
+    """A post in one follower's home timeline, copied there when it was published."""
+    profile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    # Copied from the post, so a timeline page is one range scan of the index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['profile', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['profile', 'created_at', 'post'], name='timeline_profile_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post} in {self.profile}'s timeline"
+
+
+class FanoutTask(models.Model):
+    """
+    A post still being copied to its author's followers.
+
+    ``cursor`` is the highest follower profile id done so far, so a worker
+    can stop after any batch and the next one carries on from there.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="fanout_task"
+    )
+    cursor = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Fan-out of {self.post} (after follower {self.cursor})"
@@ -0,0 +1,48 @@
+"""
+Keyset ("cursor") pagination on ``(created_at, id)``, newest first.
+
+A page starts strictly after the last row of the previous one, so reading
+page 1000 costs the same index range scan as page one, and rows published
+meanwhile do not shift what the next page holds. Cursors are
+``<microseconds since the epoch>-<id>``, safe to put in a URL as is.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(created_at, pk):
+    return f'{(created_at - EPOCH) // timedelta(microseconds=1)}-{pk}'
+
+
+def decode_cursor(value):
+    """``(created_at, pk)`` from a cursor, or None when it is missing or malformed."""
+    try:
+        micros, pk = (value or '').split('-')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
+
+def older_than(cursor, id_field='id'):
+    """
+    Filter for rows that sort after ``cursor`` in ``-created_at, -id`` order.
+
+    Written as ``created_at <= t AND (created_at < t OR id < pk)`` so the
+    database can bound the index range scan on ``created_at``.
+    """
+    created_at, pk = cursor
+    return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(**{f'{id_field}__lt': pk}))
+
+
+def keyset_page(queryset, cursor=None, size=20):
+    """Return ``(rows, next_cursor)``; ``next_cursor`` is None on the last page."""
+    if cursor is not None:
+        queryset = queryset.filter(older_than(cursor))
+    rows = list(queryset.order_by('-created_at', '-id')[:size + 1])
+    if len(rows) > size:
+        return rows[:size], encode_cursor(rows[size - 1].created_at, rows[size - 1].pk)
+    return rows, None
@@ -1,3 +1,325 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .counters import reconcile
+from .models import Comment, FanoutTask, Follow, Like, Post, TimelineEntry, UserProfile
+from .pagination import decode_cursor, encode_cursor
+from .timeline import fan_out, home_feed
+
+
+class FeedQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='pass')
+        cls.bob = User.objects.create_user('bob', password='pass')
+
+    def add_post(self, owner, likers=(), commenters=()):
+        post = Post.objects.create(owner=owner.userprofile, message=f'Hello from {owner.username}')
+        for user in likers:
+            Like.objects.create(post=post, liked_by=user.userprofile)
+        for user in commenters:
+            Comment.objects.create(post=post, made_by=user.userprofile, message=f'Hi {owner.username}')
+        Post.objects.filter(pk=post.pk).update(likes_count=len(likers), comments_count=len(commenters))
+        return post
+
+    def feed_queries(self):
+        fan_out()
+        self.client.force_login(self.alice)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_liked_by_me(self):
+        liked = self.add_post(self.bob, likers=[self.alice, self.bob], commenters=[self.alice, self.bob, self.bob])
+        self.add_post(self.alice, likers=[self.bob])
+
+        posts = {post.pk: post for post in Post.objects.for_feed(self.alice)}
+        self.assertEqual(len(posts), 2)
+        for post in posts.values():
+            self.assertEqual(post.liked_by_me, post.pk == liked.pk)
+        self.assertFalse(any(post.liked_by_me for post in Post.objects.with_like_state(None)))
+
+    def test_feed_renders_in_fixed_number_of_queries(self):
+        Follow.objects.create(follower=self.alice.userprofile, following=self.bob.userprofile)
+        self.add_post(self.bob, likers=[self.alice], commenters=[self.bob])
+        baseline = self.feed_queries()
+
+        for i in range(10):
+            user = User.objects.create_user(f'user{i}', password='pass')
+            Follow.objects.create(follower=self.alice.userprofile, following=user.userprofile)
+            self.add_post(user, likers=[self.alice, user], commenters=[self.bob, user])
+            self.add_post(self.alice, commenters=[user])
+        self.assertEqual(self.feed_queries(), baseline)
+        # Session, user, profile, timeline ids, pulled ids, posts with
+        # like state and owners, comments with authors
+        self.assertEqual(baseline, 7)
+
+    def test_feed_shows_like_state(self):
+        Follow.objects.create(follower=self.alice.userprofile, following=self.bob.userprofile)
+        self.add_post(self.bob, likers=[self.alice])
+        self.add_post(self.bob)
+        fan_out()
+        self.client.force_login(self.alice)
+        content = self.client.get(reverse('index')).content.decode()
+        self.assertEqual(content.count('❤️ 1'), 1)
+        self.assertEqual(content.count('🤍 0'), 1)
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='pass')
+        cls.followers = [User.objects.create_user(f'follower{i}', password='pass') for i in range(5)]
+        cls.stranger = User.objects.create_user('stranger', password='pass')
+        for user in cls.followers:
+            Follow.objects.create(follower=user.userprofile, following=cls.author.userprofile)
+        # Follows made through the ORM skip the views' counter updates
+        reconcile()
+        cls.author.userprofile.refresh_from_db()
+
+    def post(self, user, message='Hello'):
+        return Post.objects.create(owner=user.userprofile, message=message)
+
+    def feed(self, user):
+        posts, _ = home_feed(user.userprofile)
+        return posts
+
+    def test_new_post_is_fanned_out_in_batches(self):
+        post = self.post(self.author)
+        self.assertEqual(self.feed(self.author), [post])
+        self.assertEqual(self.feed(self.followers[0]), [])
+
+        self.assertEqual(fan_out(batch_size=2, max_batches=1), 2)
+        task = FanoutTask.objects.get(post=post)
+        self.assertEqual(task.cursor, self.followers[1].userprofile.pk)
+
+        self.assertEqual(fan_out(batch_size=2), 3)
+        self.assertFalse(FanoutTask.objects.exists())
+        for user in self.followers:
+            self.assertEqual(self.feed(user), [post])
+        self.assertEqual(self.feed(self.stranger), [])
+
+    def test_timeline_read_is_an_index_range_scan(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Reads the SQLite query plan.')
+        entries = TimelineEntry.objects.filter(profile=self.author.userprofile).order_by('-created_at', '-post_id')
+        sql, params = entries.values_list('created_at', 'post_id')[:50].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING COVERING INDEX timeline_profile_created_idx (profile_id=?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=5)
+    def test_high_follower_accounts_are_pulled_at_read_time(self):
+        reader = self.followers[0]
+        friend = self.stranger
+        Follow.objects.create(follower=reader.userprofile, following=friend.userprofile)
+        older = self.post(friend, 'older')
+        famous = self.post(self.author, 'famous')
+        newer = self.post(friend, 'newer')
+        fan_out()
+
+        self.author.userprofile.refresh_from_db()
+        self.assertTrue(self.author.userprofile.fanout_on_read)
+        self.assertFalse(TimelineEntry.objects.filter(post=famous).exclude(profile=self.author.userprofile).exists())
+        self.assertEqual(self.feed(reader), [newer, famous, older])
+        self.assertEqual(self.feed(friend), [newer, older])
+
+    def test_feed_views_need_a_login_and_make_missing_profiles(self):
+        for name in ['index', 'feed_page']:
+            response = self.client.get(reverse(name))
+            self.assertRedirects(response, f"{reverse('login')}?next={reverse(name)}", fetch_redirect_response=False)
+
+        self.client.force_login(self.stranger)
+        UserProfile.objects.filter(user=self.stranger).delete()
+        self.assertEqual(self.client.get(reverse('index')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('feed_page')).json()['next'], None)
+        self.assertTrue(UserProfile.objects.filter(user=self.stranger).exists())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        post = self.post(self.stranger)
+        follow = Follow.objects.create(follower=self.author.userprofile, following=self.stranger.userprofile)
+        self.assertEqual(self.feed(self.author), [post])
+        follow.delete()
+        self.assertEqual(self.feed(self.author), [])
+
+
+@override_settings(FEED_PAGE_SIZE=4, COMMENTS_PAGE_SIZE=4, COMMENTS_PREVIEW=2)
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user('reader', password='pass')
+        cls.author = User.objects.create_user('author', password='pass')
+        Follow.objects.create(follower=cls.reader.userprofile, following=cls.author.userprofile)
+        cls.posts = [Post.objects.create(owner=cls.author.userprofile, message=f'Post {i}') for i in range(10)]
+        fan_out()
+        # Ties on created_at must still page by id
+        tied = timezone.now()
+        Post.objects.filter(pk__in=[p.pk for p in cls.posts[3:7]]).update(created_at=tied)
+        TimelineEntry.objects.filter(post__in=cls.posts[3:7]).update(created_at=tied)
+        cls.newest_first = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def walk(self, url):
+        """Follow a JSON endpoint's cursors to the end; returns the pages' html and query counts."""
+        pages = []
+        before = ''
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                page = self.client.get(url, {'before': before} if before else {}).json()
+            pages.append((page['html'], len(queries)))
+            if not page['next']:
+                return pages
+            before = page['next']
+
+    def test_cursor_round_trip(self):
+        post = self.posts[0]
+        self.assertEqual(decode_cursor(encode_cursor(post.created_at, post.pk)), (post.created_at, post.pk))
+        for value in [None, '', 'abc', '1-2-3', '12-x']:
+            self.assertIsNone(decode_cursor(value))
+
+    def test_home_feed_pages_cover_every_post_once(self):
+        ids = []
+        cursor = None
+        while True:
+            posts, next_cursor = home_feed(self.reader.userprofile, cursor)
+            ids += [post.pk for post in posts]
+            if next_cursor is None:
+                break
+            cursor = decode_cursor(next_cursor)
+        self.assertEqual(ids, self.newest_first)
+
+    def test_feed_endpoint_pages_in_constant_queries(self):
+        pages = self.walk(reverse('feed_page'))
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(html.count('Post ') for html, _ in pages), 10)
+        self.assertEqual(len({count for _, count in pages}), 1)
+
+    def test_profile_pages(self):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(len(response.context['posts']), 4)
+        self.assertIsNotNone(response.context['next_cursor'])
+        pages = self.walk(reverse('profile_posts'))
+        self.assertEqual(sum(html.count('Post ') for html, _ in pages), 10)
+
+    def test_profile_posts_makes_missing_profile(self):
+        UserProfile.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.client.get(reverse('profile_posts')).json()['next'], None)
+        self.assertTrue(UserProfile.objects.filter(user=self.reader).exists())
+
+    def test_comments_preview_and_older_pages(self):
+        post = Post.objects.get(pk=self.newest_first[0])
+        comments = [
+            Comment.objects.create(post=post, made_by=self.reader.userprofile, message=f'Comment {i}')
+            for i in range(7)
+        ]
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        posts, _ = home_feed(self.reader.userprofile)
+        preview = posts[0].recent_comments
+        self.assertEqual([c.pk for c in preview], [comments[6].pk, comments[5].pk])
+        self.assertEqual(posts[0].comments_count, 7)
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, f'?before={preview[1].cursor}')
+        pages = self.walk(reverse('post_comments', args=[post.pk]) + f'?before={preview[1].cursor}')
+        html = ''.join(html for html, _ in pages)
+        self.assertEqual([f'Comment {i}' in html for i in range(7)], [True] * 5 + [False] * 2)
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='pass')
+        cls.bob = User.objects.create_user('bob', password='pass')
+        cls.post = Post.objects.create(owner=cls.bob.userprofile, message='Hello')
+
+    def setUp(self):
+        self.client.force_login(self.alice)
+
+    def counts(self):
+        self.post.refresh_from_db()
+        alice, bob = UserProfile.objects.filter(user__in=[self.alice, self.bob]).order_by('user__username')
+        return {
+            'likes': self.post.likes_count,
+            'comments': self.post.comments_count,
+            'alice_following': alice.following_count,
+            'bob_followers': bob.followers_count,
+        }
+
+    def test_views_keep_counters_in_step(self):
+        url = reverse('toggle_like', args=[self.post.pk])
+        response = self.client.post(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'liked': True, 'count': 1})
+        self.client.post(url)
+        self.assertEqual(self.counts()['likes'], 0)
+        self.client.post(url)
+
+        for message in ['one', 'two']:
+            self.client.post(reverse('create_comment', args=[self.post.pk]), {'message': message})
+        comment = Comment.objects.filter(post=self.post).first()
+        self.client.get(reverse('delete_comment', args=[comment.pk]))
+        self.client.get(reverse('delete_comment', args=[comment.pk]))
+
+        profile = self.bob.userprofile
+        self.client.get(reverse('follow_user', args=[profile.pk]))
+        self.client.get(reverse('follow_user', args=[profile.pk]))
+        self.assertEqual(self.counts(), {'likes': 1, 'comments': 1, 'alice_following': 1, 'bob_followers': 1})
+        self.client.get(reverse('unfollow_user', args=[profile.pk]))
+        self.client.get(reverse('unfollow_user', args=[profile.pk]))
+        self.assertEqual(self.counts()['bob_followers'], 0)
+        self.assertEqual(reconcile(dry_run=True), dict.fromkeys(reconcile(dry_run=True), 0))
+
+    def test_decrements_stop_at_zero(self):
+        Like.objects.create(post=self.post, liked_by=self.alice.userprofile)
+        Post.objects.update(likes_count=0)
+        self.client.post(reverse('toggle_like', args=[self.post.pk]))
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.counts()['likes'], 0)
+
+    def test_deleting_an_account_releases_its_counts(self):
+        carol = User.objects.create_user('carol', password='pass')
+        alice, bob = self.alice.userprofile, self.bob.userprofile
+        Like.objects.create(post=self.post, liked_by=alice)
+        Like.objects.create(post=self.post, liked_by=carol.userprofile)
+        for made_by in (alice, alice, carol.userprofile):
+            Comment.objects.create(post=self.post, made_by=made_by, message='Hi')
+        Follow.objects.create(follower=alice, following=bob)
+        Follow.objects.create(follower=bob, following=alice)
+        reconcile()
+
+        self.alice.delete()
+        self.post.refresh_from_db()
+        bob.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+        self.assertEqual((bob.followers_count, bob.following_count), (0, 0))
+        self.assertEqual(reconcile(dry_run=True), dict.fromkeys(reconcile(dry_run=True), 0))
+
+    def test_reconcile_counters_repairs_drift_in_batches(self):
+        Like.objects.create(post=self.post, liked_by=self.alice.userprofile)
+        Follow.objects.create(follower=self.alice.userprofile, following=self.bob.userprofile)
+        for i in range(3):
+            Post.objects.create(owner=self.alice.userprofile, message=f'Post {i}')
+        Post.objects.update(comments_count=5)
+
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn('Post.comments_count: would fix 4 row(s)', out.getvalue())
+        self.assertEqual(self.counts()['comments'], 5)
+
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=2, stdout=out)
+        self.assertIn('Post.likes_count: fixed 1 row(s)', out.getvalue())
+        self.assertIn('UserProfile.followers_count: fixed 1 row(s)', out.getvalue())
+        self.assertEqual(self.counts(), {'likes': 1, 'comments': 0, 'alice_following': 1, 'bob_followers': 1})
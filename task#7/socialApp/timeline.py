@@ -0,0 +1,134 @@
+"""
+Home timelines, materialized on write.
+
+Publishing a post queues a ``FanoutTask``; the ``fanout_timelines`` worker
+then copies the post into each follower's ``TimelineEntry`` rows, a batch of
+followers per statement. Reading a home feed is one range scan of the
+``(profile, created_at, post)`` index.
+
+Accounts with ``TIMELINE_FANOUT_LIMIT`` followers or more are not fanned out
+(one post would mean that many rows). Their followers pull those posts at
+read time instead, from the ``(owner, created_at, id)`` index on posts.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import FanoutTask, Follow, Post, TimelineEntry, UserProfile
+from .pagination import encode_cursor, older_than
+
+
+# Recent posts copied into a timeline when its owner follows someone
+FOLLOW_BACKFILL = 20
+
+
+def publish(post):
+    """
+    Put a new post in its author's own timeline and queue it for their followers.
+
+    Called when the post is created; the followers' copies are made later by
+    ``fan_out``.
+    """
+    TimelineEntry.objects.create(profile_id=post.owner_id, post=post, created_at=post.created_at)
+    owner = post.owner
+    if not owner.fanout_on_read:
+        if owner.followers_count < settings.TIMELINE_FANOUT_LIMIT:
+            FanoutTask.objects.create(post=post)
+            return
+        # Sticky: the posts it already fanned out stay where they are, and
+        # everything from now on is pulled
+        UserProfile.objects.filter(pk=owner.pk).update(fanout_on_read=True)
+        owner.fanout_on_read = True
+
+
+def fan_out(batch_size=None, max_batches=None):
+    """
+    Work through queued fan-out tasks, oldest first. Returns the entries written.
+
+    Each batch is its own transaction: it writes up to ``batch_size``
+    followers' entries, then advances the task's cursor (or deletes the task
+    once every follower has the post). ``max_batches`` bounds one call.
+    """
+    batch_size = batch_size or settings.TIMELINE_FANOUT_BATCH_SIZE
+    written = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            task = (
+                FanoutTask.objects.select_for_update(skip_locked=True)
+                .select_related('post')
+                .order_by('id')
+                .first()
+            )
+            if task is None:
+                break
+            followers = list(
+                Follow.objects.filter(following_id=task.post.owner_id, follower_id__gt=task.cursor)
+                .order_by('follower_id')
+                .values_list('follower_id', flat=True)[:batch_size]
+            )
+            TimelineEntry.objects.bulk_create(
+                [
+                    TimelineEntry(profile_id=follower_id, post_id=task.post_id, created_at=task.post.created_at)
+                    for follower_id in followers
+                ],
+                ignore_conflicts=True,
+            )
+            written += len(followers)
+            if len(followers) < batch_size:
+                task.delete()
+            else:
+                task.cursor = followers[-1]
+                task.save(update_fields=['cursor'])
+        batches += 1
+    return written
+
+
+def follow_started(follow):
+    """Backfill the new follower's timeline with the account's recent posts."""
+    if follow.following.fanout_on_read:
+        return
+    posts = (
+        Post.objects.filter(owner_id=follow.following_id)
+        .order_by('-created_at')
+        .values_list('id', 'created_at')[:FOLLOW_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(profile_id=follow.follower_id, post_id=post_id, created_at=created_at)
+            for post_id, created_at in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def follow_ended(follow):
+    """Take the account's posts back out of the former follower's timeline."""
+    TimelineEntry.objects.filter(profile_id=follow.follower_id, post__owner_id=follow.following_id).delete()
+
+
+def home_feed(profile, cursor=None, limit=None):
+    """
+    A page of ``profile``'s home feed as ``(posts, next_cursor)``, newest first.
+
+    ``cursor`` is a decoded cursor from the previous page. Post ids come
+    from the profile's timeline entries and, for followed accounts that are
+    read on pull, from their posts; each source is one index range scan
+    starting at the cursor. The page's posts are then loaded with
+    ``Post.objects.for_feed``.
+    """
+    limit = limit or settings.FEED_PAGE_SIZE
+    entries = TimelineEntry.objects.filter(profile=profile)
+    pulled = Post.objects.filter(
+        owner__in=Follow.objects.filter(follower=profile, following__fanout_on_read=True).values('following')
+    )
+    if cursor is not None:
+        entries = entries.filter(older_than(cursor, id_field='post_id'))
+        pulled = pulled.filter(older_than(cursor))
+    candidates = list(entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit + 1])
+    candidates += pulled.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit + 1]
+    candidates = sorted(set(candidates), reverse=True)
+
+    next_cursor = encode_cursor(*candidates[limit - 1]) if len(candidates) > limit else None
+    ids = [post_id for _, post_id in candidates[:limit]]
+    posts = list(Post.objects.for_feed(profile.user).filter(pk__in=ids).order_by('-created_at', '-id'))
+    return posts, next_cursor
@@ -1,4 +1,8 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
@@ -7,13 +11,37 @@ from django.contrib.auth.decorators import login_required
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from django.contrib import messages
+from .counters import decreased
 from .models import UserProfile, Post, Comment, Like, Follow
+from .pagination import decode_cursor, keyset_page
+from .timeline import home_feed
+
+
+def json_page(request, template_name, context, next_cursor):
+    """One page for infinite scroll: the rendered rows and the cursor of the next page."""
+    return JsonResponse({
+        'html': render_to_string(template_name, context, request),
+        'next': next_cursor,
+    })
+
+
+def feed(request):
+    # The join saves home_feed a query for user_profile.user
+    user_profile, created = UserProfile.objects.select_related('user').get_or_create(user=request.user)
+    return home_feed(user_profile, decode_cursor(request.GET.get('before')))
 
 
 # Create your views here.
+@login_required(login_url='login')
 def index(request):
-    posts = Post.objects.all()
-    return render(request, 'socialApp/index.html', {'posts': posts})
+    posts, next_cursor = feed(request)
+    return render(request, 'socialApp/index.html', {'posts': posts, 'next_cursor': next_cursor})
+
+
+@login_required(login_url='login')
+def feed_page(request):
+    posts, next_cursor = feed(request)
+    return json_page(request, 'socialApp/includes/posts.html', {'posts': posts}, next_cursor)
 
 
 class UserLoginView(LoginView):
@@ -47,11 +75,34 @@ class UserSignupView(CreateView):
         return context
 
 
+def profile_page(request, user_profile):
+    posts = Post.objects.with_like_state(request.user).filter(owner=user_profile).select_related('owner__user')
+    return keyset_page(posts, decode_cursor(request.GET.get('before')), settings.FEED_PAGE_SIZE)
+
+
 @login_required(login_url='login')
 def profile(request):
     user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-    posts = Post.objects.filter(owner=user_profile)
-    return render(request, 'socialApp/profile.html', {'user_profile': user_profile, 'posts': posts})
+    posts, next_cursor = profile_page(request, user_profile)
+    return render(request, 'socialApp/profile.html', {
+        'user_profile': user_profile,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required(login_url='login')
+def profile_posts(request):
+    user_profile, created = UserProfile.objects.get_or_create(user=request.user)
+    posts, next_cursor = profile_page(request, user_profile)
+    return json_page(request, 'socialApp/includes/profile_posts.html', {'posts': posts}, next_cursor)
+
+
+@login_required(login_url='login')
+def post_comments(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related('made_by__user')
+    comments, next_cursor = keyset_page(comments, decode_cursor(request.GET.get('before')), settings.COMMENTS_PAGE_SIZE)
+    return json_page(request, 'socialApp/includes/comments.html', {'comments': comments}, next_cursor)
 
 
 @login_required(login_url='login')
@@ -84,7 +135,9 @@ def create_comment(request, post_id):
         message = request.POST.get('message', '').strip()
         if message:
             user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-            Comment.objects.create(post=post, made_by=user_profile, message=message)
+            with transaction.atomic():
+                Comment.objects.create(post=post, made_by=user_profile, message=message)
+                Post.objects.filter(pk=post.pk).update(comments_count=F('comments_count') + 1)
             messages.success(request, 'Comment added!')
         return redirect('index')
     return redirect('index')
@@ -93,11 +146,13 @@ def create_comment(request, post_id):
 @login_required(login_url='login')
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)
-    post_id = comment.post.id
     if comment.made_by.user != request.user:
         messages.error(request, 'You can only delete your own comments!')
         return redirect('index')
-    comment.delete()
+    with transaction.atomic():
+        # Only the request that actually deleted the row moves the counter
+        if Comment.objects.filter(pk=comment.pk).delete()[0]:
+            Post.objects.filter(pk=comment.post_id).update(comments_count=decreased('comments_count'))
     messages.success(request, 'Comment deleted!')
     return redirect('index')
 
@@ -106,16 +161,25 @@ def delete_comment(request, comment_id):
 def toggle_like(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-    like = Like.objects.filter(post=post, liked_by=user_profile).first()
     
-    if like:
-        like.delete()
-        liked = False
-    else:
-        Like.objects.create(post=post, liked_by=user_profile)
-        liked = True
+    # The counter moves only when a Like row really was deleted or inserted,
+    # so double clicks and concurrent toggles cannot skew it
+    with transaction.atomic():
+        if Like.objects.filter(post=post, liked_by=user_profile).delete()[0]:
+            liked = False
+            Post.objects.filter(pk=post.pk).update(likes_count=decreased('likes_count'))
+        else:
+            liked = True
+            try:
+                with transaction.atomic():
+                    Like.objects.create(post=post, liked_by=user_profile)
+            except IntegrityError:
+                pass
+            else:
+                Post.objects.filter(pk=post.pk).update(likes_count=F('likes_count') + 1)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        post.refresh_from_db(fields=['likes_count'])
         return JsonResponse({'liked': liked, 'count': post.likes_count})
     return redirect('index')
 
@@ -129,9 +193,14 @@ def follow_user(request, profile_id):
         messages.error(request, 'You cannot follow yourself!')
         return redirect('index')
     
-    follow = Follow.objects.filter(follower=user_profile, following=target_profile).first()
-    if not follow:
-        Follow.objects.create(follower=user_profile, following=target_profile)
+    try:
+        with transaction.atomic():
+            Follow.objects.create(follower=user_profile, following=target_profile)
+            UserProfile.objects.filter(pk=user_profile.pk).update(following_count=F('following_count') + 1)
+            UserProfile.objects.filter(pk=target_profile.pk).update(followers_count=F('followers_count') + 1)
+    except IntegrityError:
+        pass  # Already following
+    else:
         messages.success(request, f'You followed {target_profile.user.username}!')
     
     return redirect('index')
@@ -142,9 +211,12 @@ def unfollow_user(request, profile_id):
     target_profile = get_object_or_404(UserProfile, id=profile_id)
     user_profile, created = UserProfile.objects.get_or_create(user=request.user)
     
-    follow = Follow.objects.filter(follower=user_profile, following=target_profile).first()
-    if follow:
-        follow.delete()
+    with transaction.atomic():
+        unfollowed = Follow.objects.filter(follower=user_profile, following=target_profile).delete()[0]
+        if unfollowed:
+            UserProfile.objects.filter(pk=user_profile.pk).update(following_count=decreased('following_count'))
+            UserProfile.objects.filter(pk=target_profile.pk).update(followers_count=decreased('followers_count'))
+    if unfollowed:
         messages.success(request, f'You unfollowed {target_profile.user.username}!')
     
     return redirect('index')